@@ -1,19 +1,41 @@
 from jwt import decode, InvalidTokenError
 from django.conf import settings
+from django.core.exceptions import ValidationError
 from rest_framework import authentication
 from rest_framework.exceptions import AuthenticationFailed
 from .models import User
+from .utils.user_cache import aget_cached_user, get_cached_user
+
+AUTH_ERRORS = (InvalidTokenError, KeyError, ValueError, ValidationError, User.DoesNotExist)
+
 
 class JWTAuthentication(authentication.BaseAuthentication):
     def authenticate(self, request):
-        auth_header = request.META.get('HTTP_AUTHORIZATION')
-        if not auth_header or not auth_header.startswith('Bearer '):
+        token = self.get_token(request)
+        if token is None:
             return None
+        try:
+            payload = decode(token, settings.SECRET_KEY, algorithms=['HS256'])
+            user = get_cached_user(payload['user_id'], payload.get('ver', 0))
+            return (user, token)
+        except AUTH_ERRORS:
+            raise AuthenticationFailed('Invalid token')
 
-        token = auth_header.split(' ')[1]
+    async def aauthenticate(self, request):
+        # Same checks for the ASGI views; takes a plain Django request.
+        token = self.get_token(request)
+        if token is None:
+            return None
         try:
             payload = decode(token, settings.SECRET_KEY, algorithms=['HS256'])
-            user = User.objects.get(id=payload['user_id'])
+            user = await aget_cached_user(payload['user_id'], payload.get('ver', 0))
             return (user, token)
-        except (InvalidTokenError, User.DoesNotExist):
-            raise AuthenticationFailed('Invalid token')
\ No newline at end of file
+        except AUTH_ERRORS:
+            raise AuthenticationFailed('Invalid token')
+
+    @staticmethod
+    def get_token(request):
+        auth_header = request.META.get('HTTP_AUTHORIZATION')
+        if not auth_header or not auth_header.startswith('Bearer '):
+            return None
+        return auth_header.split(' ')[1]
@@ -0,0 +1,15 @@
+from django.conf import settings
+from django.core.checks import Error, Tags, register
+
+FAST2SMS_PROVIDER = 'api.utils.sms_service.Fast2SMSProvider'
+
+
+@register(Tags.security, deploy=True)
+def check_sms_key(app_configs, **kwargs):
+    if getattr(settings, 'SMS_PROVIDER', FAST2SMS_PROVIDER) == FAST2SMS_PROVIDER and not settings.FAST2SMS_API_KEY:
+        return [Error(
+            "FAST2SMS_API_KEY is not set, so OTPs cannot be sent.",
+            hint="Set FAST2SMS_API_KEY, or SMS_PROVIDER to another provider.",
+            id='api.E001',
+        )]
+    return []
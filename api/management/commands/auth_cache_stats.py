@@ -0,0 +1,12 @@
+import json
+
+from django.core.management.base import BaseCommand
+
+from api.utils.user_cache import cache_stats
+
+
+class Command(BaseCommand):
+    help = "Show hit/miss counters of the JWT user cache."
+
+    def handle(self, *args, **options):
+        self.stdout.write(json.dumps(cache_stats(), indent=2))
@@ -17,6 +17,7 @@ class User(AbstractBaseUser):
     email = models.EmailField(blank=True, null=True)
     is_active = models.BooleanField(default=True)
     last_login = models.DateTimeField(null=True)
+    token_version = models.PositiveIntegerField(default=0)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
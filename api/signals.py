@@ -0,0 +1,10 @@
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+from .models import User
+from .utils.user_cache import invalidate_user
+
+
+@receiver(post_save, sender=User)
+def invalidate_cached_user(sender, instance, **kwargs):
+    invalidate_user(instance)
@@ -1,3 +1,267 @@
-from django.test import TestCase
+from asgiref.sync import async_to_sync
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.test import AsyncClient, TestCase, override_settings
+from rest_framework.test import APIClient
 
-# Create your tests here.
+from payrole.instrumentation import histograms
+from .checks import check_sms_key
+from .models import User
+from .utils.auth import generate_token
+from .utils.otp_store import LIMITS, MAX_VERIFY_ATTEMPTS
+from .utils.sms_service import (
+    CircuitBreaker, FakeSMSProvider, Fast2SMSProvider, SMSDispatcher, SMSError, SMSProvider
+)
+from .utils.user_cache import get_cached_user, user_cache_key
+
+
+class JWTUserCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create(phone_number='+919000000001', full_name='Employer')
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {generate_token(self.user)}')
+
+    def test_user_loaded_from_db_only_on_miss(self):
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/auth/profile/')
+        self.assertEqual(response.status_code, 200)
+        with self.assertNumQueries(0):
+            response = self.client.get('/api/auth/profile/')
+        self.assertEqual(response.data['full_name'], 'Employer')
+
+    def test_cache_leaves_out_the_password_hash(self):
+        self.user.set_password('s3cret-pass')
+        self.user.save()
+        cached = get_cached_user(self.user.pk, self.user.token_version)
+        cached = get_cached_user(self.user.pk, self.user.token_version)
+        self.assertNotIn('password', cache.get(user_cache_key(self.user.pk, self.user.token_version)))
+        self.assertIn('password', cached.get_deferred_fields())
+        self.assertTrue(cached.check_password('s3cret-pass'))
+
+    def test_profile_update_invalidates_cache(self):
+        self.client.get('/api/auth/profile/')
+        self.client.post('/api/auth/complete-profile/', {'full_name': 'Renamed'}, format='json')
+        response = self.client.get('/api/auth/profile/')
+        self.assertEqual(response.data['full_name'], 'Renamed')
+
+    def test_bumping_token_version_revokes_tokens(self):
+        self.client.get('/api/auth/profile/')
+        self.user.token_version += 1
+        self.user.save()
+        response = self.client.get('/api/auth/profile/')
+        self.assertEqual(response.status_code, 403)
+
+
+class FlakyProvider(SMSProvider):
+    def __init__(self, failures):
+        self.failures = failures
+        self.sent = []
+
+    def send_otp(self, phone, otp):
+        if self.failures:
+            self.failures -= 1
+            raise SMSError('gateway timeout')
+        self.sent.append((phone, otp))
+        return 200
+
+
+class SMSDispatchTests(TestCase):
+    def test_request_otp_queues_sms(self):
+        FakeSMSProvider.outbox.clear()
+        response = APIClient().post('/api/auth/request-otp/', {'phone_number': '+919000000009'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(FakeSMSProvider.outbox[-1][0], '+919000000009')
+
+    def test_retries_with_backoff_then_succeeds(self):
+        provider = FlakyProvider(failures=2)
+        dispatcher = SMSDispatcher(provider, retries=3, backoff=0)
+        self.assertTrue(dispatcher.deliver('+919000000009', '123456'))
+        self.assertEqual(provider.sent, [('+919000000009', '123456')])
+
+    def test_circuit_opens_after_repeated_failures(self):
+        provider = FlakyProvider(failures=100)
+        breaker = CircuitBreaker(threshold=3, reset_timeout=60)
+        dispatcher = SMSDispatcher(provider, retries=2, backoff=0, breaker=breaker)
+        dispatcher.deliver('+919000000009', '1')
+        dispatcher.deliver('+919000000009', '2')
+        remaining = provider.failures
+        self.assertFalse(dispatcher.deliver('+919000000009', '3'))
+        self.assertEqual(provider.failures, remaining)
+
+    @override_settings(FAST2SMS_API_KEY='test-key')
+    def test_providers_take_the_key_from_settings(self):
+        with self.assertRaises(TypeError):
+            SMSProvider()
+        self.assertEqual(Fast2SMSProvider().session.headers['authorization'], 'test-key')
+
+    @override_settings(FAST2SMS_API_KEY='', SMS_PROVIDER='api.utils.sms_service.Fast2SMSProvider')
+    def test_missing_key_is_reported_by_deploy_checks(self):
+        with self.assertRaises(ImproperlyConfigured):
+            Fast2SMSProvider()
+        self.assertEqual([error.id for error in check_sms_key(None)], ['api.E001'])
+        with self.settings(SMS_PROVIDER='api.utils.sms_service.FakeSMSProvider'):
+            self.assertEqual(check_sms_key(None), [])
+
+
+class OTPFlowTests(TestCase):
+    phone = '+919000000009'
+
+    def setUp(self):
+        cache.clear()
+        FakeSMSProvider.outbox.clear()
+        self.client = APIClient()
+
+    def request_otp(self, phone=None, ip='10.0.0.1'):
+        return self.client.post(
+            '/api/auth/request-otp/', {'phone_number': phone or self.phone}, format='json', REMOTE_ADDR=ip
+        )
+
+    def verify(self, otp, ip='10.0.0.1'):
+        return self.client.post(
+            '/api/auth/verify-otp/', {'phone_number': self.phone, 'otp': otp}, format='json', REMOTE_ADDR=ip
+        )
+
+    def test_issue_and_verify_once(self):
+        self.request_otp()
+        otp = FakeSMSProvider.outbox[-1][1]
+        response = self.verify(otp)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('token', response.data)
+        self.assertEqual(self.verify(otp).status_code, 400)
+
+    def test_wrong_guesses_lock_the_otp(self):
+        self.request_otp()
+        otp = FakeSMSProvider.outbox[-1][1]
+        wrong = '000000' if otp != '000000' else '111111'
+        for attempts_left in range(MAX_VERIFY_ATTEMPTS - 1, 0, -1):
+            self.assertEqual(self.verify(wrong).data['attempts_left'], attempts_left)
+        self.assertIn('Request a new OTP', self.verify(wrong).data['error'])
+        self.assertEqual(self.verify(otp).status_code, 400)
+
+    def test_send_limits_per_phone_and_ip(self):
+        for _ in range(LIMITS['send_phone']):
+            self.assertEqual(self.request_otp().status_code, 200)
+        response = self.request_otp()
+        self.assertEqual(response.status_code, 429)
+        self.assertTrue(int(response['Retry-After']) > 0)
+
+        for i in range(LIMITS['send_ip'] - LIMITS['send_phone']):
+            self.assertEqual(self.request_otp(phone=f'+91800000{i:04d}').status_code, 200)
+        self.assertEqual(self.request_otp(phone='+918999999999').status_code, 429)
+        self.assertEqual(self.request_otp(phone='+918999999999', ip='10.0.0.2').status_code, 200)
+
+    def test_forwarded_for_cannot_reset_ip_limits(self):
+        def request_otp(phone, forwarded):
+            return self.client.post(
+                '/api/auth/request-otp/', {'phone_number': phone}, format='json',
+                REMOTE_ADDR='10.0.0.1', HTTP_X_FORWARDED_FOR=forwarded
+            )
+
+        for i in range(LIMITS['send_ip']):
+            self.assertEqual(request_otp(f'+91800000{i:04d}', f'203.0.113.{i}').status_code, 200)
+        self.assertEqual(request_otp('+918999999999', '203.0.113.250').status_code, 429)
+
+        # Behind one trusted proxy only the entry it appended counts.
+        with self.settings(OTP_TRUST_X_FORWARDED_FOR=True, OTP_TRUSTED_PROXY_HOPS=1):
+            for i in range(LIMITS['send_ip']):
+                forwarded = f'198.51.100.{i}, 192.0.2.7'
+                self.assertEqual(request_otp(f'+91810000{i:04d}', forwarded).status_code, 200)
+            self.assertEqual(request_otp('+918199999999', '198.51.100.250, 192.0.2.7').status_code, 429)
+            self.assertEqual(request_otp('+918199999999', '192.0.2.8').status_code, 200)
+
+
+@override_settings(PERF_SERVER_TIMING=True)
+class InstrumentationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        histograms.reset()
+        self.user = User.objects.create(phone_number='+919000000001', full_name='Employer')
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {generate_token(self.user)}')
+
+    def test_server_timing_breaks_down_the_request(self):
+        timing = self.client.get('/api/auth/profile/')['Server-Timing']
+        self.assertIn('db;dur=', timing)
+        self.assertIn('desc="1 queries"', timing)
+        self.assertIn('cache;dur=', timing)
+        self.assertIn('render;dur=', timing)
+        self.assertIn('total;dur=', timing)
+        # The user now comes from the cache.
+        self.assertNotIn('db;', self.client.get('/api/auth/profile/')['Server-Timing'])
+
+    @override_settings(PERF_SLOW_QUERY_MS=0, PERF_SLOW_REQUEST_MS=0)
+    def test_slow_requests_and_queries_are_logged(self):
+        with self.assertLogs('payrole.performance', level='WARNING') as logs:
+            self.client.get('/api/auth/profile/')
+        self.assertTrue(any('Slow query in authentication:profile' in line for line in logs.output))
+        self.assertTrue(any('Slow request GET /api/auth/profile/' in line for line in logs.output))
+
+    @override_settings(PERF_METRICS_TOKEN='secret')
+    def test_metrics_endpoint(self):
+        self.client.get('/api/auth/profile/')
+        self.client.get('/api/auth/profile/')
+        self.assertEqual(APIClient().get('/metrics/').status_code, 403)
+        for wrong in ('Bearer secreT', 'Bearer secret2', 'Bearer sécret'):
+            self.assertEqual(APIClient().get('/metrics/', HTTP_AUTHORIZATION=wrong).status_code, 403)
+        with self.settings(PERF_METRICS_TOKEN=''):
+            self.assertEqual(APIClient().get('/metrics/', HTTP_AUTHORIZATION='Bearer ').status_code, 403)
+        body = APIClient().get('/metrics/', HTTP_AUTHORIZATION='Bearer secret').content.decode()
+        self.assertIn(
+            'payrole_request_duration_seconds_count{view="authentication:profile",method="GET"} 2', body
+        )
+        self.assertIn('component="cache"', body)
+
+
+@override_settings(ROOT_URLCONF='payrole.asgi_urls', PERF_SERVER_TIMING=True)
+class AsyncViewTests(TestCase):
+    phone = '+919000000009'
+
+    def setUp(self):
+        cache.clear()
+        FakeSMSProvider.outbox.clear()
+        self.user = User.objects.create(phone_number='+919000000001', full_name='Employer')
+        self.auth = {'Authorization': f'Bearer {generate_token(self.user)}'}
+
+    def request(self, method, path, data=None, **headers):
+        client = AsyncClient()
+        if data is None:
+            return async_to_sync(getattr(client, method))(path, headers=headers)
+        return async_to_sync(getattr(client, method))(path, data, content_type='application/json', headers=headers)
+
+    def test_profile_and_async_timing(self):
+        response = self.request('get', '/api/auth/profile/', **self.auth)
+        self.assertEqual(response.json(), {
+            'id': str(self.user.id), 'phone_number': self.user.phone_number, 'full_name': 'Employer', 'email': None
+        })
+        self.assertEqual(response['Allow'], 'GET, HEAD, OPTIONS')
+        # Queries run on a worker thread and are still attributed to the request.
+        self.assertIn('desc="1 queries"', response['Server-Timing'])
+        self.assertIn('cache;dur=', response['Server-Timing'])
+        self.assertNotIn('db;', self.request('get', '/api/auth/profile/', **self.auth)['Server-Timing'])
+
+    def test_auth_errors_come_from_drf(self):
+        self.assertEqual(
+            self.request('get', '/api/auth/profile/').json(),
+            {'detail': 'Authentication credentials were not provided.'}
+        )
+        response = self.request('get', '/api/auth/profile/', Authorization='Bearer nonsense')
+        self.assertEqual(response.status_code, 403)
+        self.assertEqual(response.json(), {'detail': 'Invalid token'})
+
+    def test_otp_flow(self):
+        response = self.request('post', '/api/auth/request-otp/', {'phone_number': self.phone})
+        self.assertEqual(response.json(), {'message': 'OTP sent successfully'})
+        otp = FakeSMSProvider.outbox[-1][1]
+        wrong = '000000' if otp != '000000' else '111111'
+        response = self.request('post', '/api/auth/verify-otp/', {'phone_number': self.phone, 'otp': wrong})
+        self.assertEqual(response.json(), {'error': 'Invalid OTP', 'attempts_left': MAX_VERIFY_ATTEMPTS - 1})
+
+        response = self.request('post', '/api/auth/verify-otp/', {'phone_number': self.phone, 'otp': otp})
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.json()['is_profile_complete'])
+        self.assertTrue(User.objects.filter(phone_number=self.phone, last_login__isnull=False).exists())
+
+        # Validation errors are the DRF view's.
+        response = self.request('post', '/api/auth/verify-otp/', {'phone_number': self.phone})
+        self.assertEqual(response.json(), {'otp': ['This field is required.']})
@@ -0,0 +1,89 @@
+# async_views.py
+import json
+
+from asgiref.sync import sync_to_async
+from django.http import HttpResponse
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework.exceptions import APIException, AuthenticationFailed
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+
+from ..authentication import JWTAuthentication
+
+
+class Fallback(Exception):
+    # The request is outside what the async view covers.
+    pass
+
+
+class AsyncAPIView(View):
+    # Native async twin of a DRF view, routed under ASGI only (see
+    # payrole/asgi_urls.py). Handlers cover the common JSON request and
+    # answer exactly as the DRF view would; everything else (errors, other
+    # methods, the browsable API) raises Fallback and is served by the DRF
+    # view on a worker thread.
+    fallback_view = None
+    fallback_actions = None
+    fallback = None
+    allow = 'GET, HEAD, OPTIONS'
+    permission_required = True
+    renderer = JSONRenderer()
+    authenticator = JWTAuthentication()
+
+    @classmethod
+    def as_view(cls, **initkwargs):
+        if cls.fallback_actions:
+            fallback = cls.fallback_view.as_view(cls.fallback_actions)
+        else:
+            fallback = cls.fallback_view.as_view()
+        return csrf_exempt(super().as_view(fallback=fallback, **initkwargs))
+
+    async def dispatch(self, request, *args, **kwargs):
+        handler = getattr(self, request.method.lower(), None) if request.method != 'OPTIONS' else None
+        try:
+            if handler is None or 'format' in request.GET or 'text/html' in request.headers.get('Accept', ''):
+                raise Fallback
+            drf_request = await self.initialize(request)
+            return await handler(drf_request, *args, **kwargs)
+        except (Fallback, APIException):
+            # Handlers raise before any side effect, so the DRF view can
+            # redo the request and shape the error itself.
+            return await sync_to_async(self.fallback)(request, *args, **kwargs)
+
+    async def initialize(self, request):
+        # DRF reports bad and missing credentials itself.
+        try:
+            auth = await self.authenticator.aauthenticate(request)
+        except AuthenticationFailed:
+            raise Fallback
+        if auth is None and self.permission_required:
+            raise Fallback
+        drf_request = Request(request)
+        if auth is not None:
+            drf_request.user, drf_request.auth = auth
+        return drf_request
+
+    def json_body(self, request):
+        if request.content_type != 'application/json':
+            raise Fallback
+        try:
+            return json.loads(request.body)
+        except ValueError:
+            raise Fallback
+
+    def render(self, data, status=200, headers=None):
+        response = HttpResponse(self.renderer.render(data), content_type='application/json', status=status)
+        for key, value in (headers or {}).items():
+            response[key] = value
+        return self.finalize(response)
+
+    def not_modified(self):
+        response = HttpResponse(status=304)
+        del response['Content-Type']
+        return self.finalize(response)
+
+    def finalize(self, response):
+        response['Vary'] = 'Accept'
+        response['Allow'] = self.allow
+        return response
@@ -7,6 +7,7 @@ def generate_token(user):
     payload = {
         'user_id': str(user.id),
         'phone_number': user.phone_number,
+        'ver': user.token_version,
         'exp': datetime.utcnow() + timedelta(days=1)
     }
     return encode(payload, settings.SECRET_KEY, algorithm='HS256')
@@ -0,0 +1,181 @@
+# otp_store.py
+import math
+import time
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache, caches
+from django_redis.cache import RedisCache
+
+from payrole.instrumentation import track
+
+OTP_TTL = 600  # 10 minutes
+MAX_VERIFY_ATTEMPTS = 5
+WINDOW = 3600
+LIMITS = {
+    'send_phone': 5,    # OTP sends per phone per window
+    'send_ip': 20,      # OTP sends per client IP per window
+    'verify_ip': 30,    # Verify attempts per client IP per window
+}
+
+# Both scripts run atomically on the Redis server: one round trip for the
+# rate-limit checks, the window updates and the OTP read/write.
+ISSUE_SCRIPT = """
+local now, window = tonumber(ARGV[1]), tonumber(ARGV[4])
+local retry = 0
+for i, key in ipairs({KEYS[2], KEYS[3]}) do
+    local limit = tonumber(ARGV[4 + i])
+    redis.call('ZREMRANGEBYSCORE', key, 0, now - window)
+    if redis.call('ZCARD', key) >= limit then
+        local oldest = redis.call('ZRANGE', key, 0, 0, 'WITHSCORES')
+        retry = math.max(retry, tonumber(oldest[2]) + window - now)
+    end
+end
+if retry > 0 then
+    return {0, retry}
+end
+for i, key in ipairs({KEYS[2], KEYS[3]}) do
+    redis.call('ZADD', key, now, ARGV[7])
+    redis.call('PEXPIRE', key, window)
+end
+redis.call('DEL', KEYS[1])
+redis.call('HSET', KEYS[1], 'code', ARGV[2], 'attempts', 0)
+redis.call('EXPIRE', KEYS[1], ARGV[3])
+return {1, 0}
+"""
+
+VERIFY_SCRIPT = """
+local now, window = tonumber(ARGV[1]), tonumber(ARGV[5])
+redis.call('ZREMRANGEBYSCORE', KEYS[2], 0, now - window)
+if redis.call('ZCARD', KEYS[2]) >= tonumber(ARGV[4]) then
+    local oldest = redis.call('ZRANGE', KEYS[2], 0, 0, 'WITHSCORES')
+    return {-1, tonumber(oldest[2]) + window - now}
+end
+redis.call('ZADD', KEYS[2], now, ARGV[6])
+redis.call('PEXPIRE', KEYS[2], window)
+local code = redis.call('HGET', KEYS[1], 'code')
+if not code then
+    return {0, 0}
+end
+local attempts = redis.call('HINCRBY', KEYS[1], 'attempts', 1)
+if code == ARGV[2] then
+    redis.call('DEL', KEYS[1])
+    return {1, 0}
+end
+if attempts >= tonumber(ARGV[3]) then
+    redis.call('DEL', KEYS[1])
+    return {-2, 0}
+end
+return {2, tonumber(ARGV[3]) - attempts}
+"""
+
+VERIFY_RESULTS = {1: 'ok', 0: 'expired', 2: 'invalid', -1: 'limited', -2: 'locked'}
+
+
+def otp_key(phone):
+    return f'otp:{phone}'
+
+
+def window_key(kind, value):
+    return f'otp-window:{kind}:{value}'
+
+
+def _now_ms():
+    return int(time.time() * 1000)
+
+
+class RedisOTPStore:
+    def __init__(self, client):
+        self.issue_script = client.register_script(ISSUE_SCRIPT)
+        self.verify_script = client.register_script(VERIFY_SCRIPT)
+
+    def issue(self, phone, otp, ip):
+        # Returns (allowed, retry_after_seconds).
+        with track('cache'):
+            allowed, retry = self.issue_script(
+                keys=[otp_key(phone), window_key('send_phone', phone), window_key('send_ip', ip)],
+                args=[_now_ms(), otp, OTP_TTL, WINDOW * 1000, LIMITS['send_phone'], LIMITS['send_ip'], uuid.uuid4().hex]
+            )
+        return bool(allowed), math.ceil(int(retry) / 1000)
+
+    def verify(self, phone, otp, ip):
+        # Returns (result, detail): detail is the retry delay in seconds for
+        # 'limited' and the attempts left for 'invalid'.
+        with track('cache'):
+            code, detail = self.verify_script(
+                keys=[otp_key(phone), window_key('verify_ip', ip)],
+                args=[_now_ms(), otp, MAX_VERIFY_ATTEMPTS, LIMITS['verify_ip'], WINDOW * 1000, uuid.uuid4().hex]
+            )
+        result = VERIFY_RESULTS[int(code)]
+        detail = int(detail)
+        return result, math.ceil(detail / 1000) if result == 'limited' else detail
+
+
+class CacheOTPStore:
+    # Same semantics on the plain cache API, for the local-memory cache used
+    # in tests and development. Not atomic across processes.
+    def _hit(self, kind, value, limit, now, record):
+        key = window_key(kind, value)
+        hits = [t for t in cache.get(key, []) if t > now - WINDOW * 1000]
+        if len(hits) >= limit:
+            return math.ceil((hits[0] + WINDOW * 1000 - now) / 1000)
+        if record:
+            cache.set(key, hits + [now], timeout=WINDOW)
+        return 0
+
+    def issue(self, phone, otp, ip):
+        now = _now_ms()
+        retry = max(
+            self._hit('send_phone', phone, LIMITS['send_phone'], now, record=False),
+            self._hit('send_ip', ip, LIMITS['send_ip'], now, record=False),
+        )
+        if retry:
+            return False, retry
+        self._hit('send_phone', phone, LIMITS['send_phone'], now, record=True)
+        self._hit('send_ip', ip, LIMITS['send_ip'], now, record=True)
+        cache.set(otp_key(phone), {'code': otp, 'attempts': 0}, timeout=OTP_TTL)
+        return True, 0
+
+    def verify(self, phone, otp, ip):
+        retry = self._hit('verify_ip', ip, LIMITS['verify_ip'], _now_ms(), record=True)
+        if retry:
+            return 'limited', retry
+        stored = cache.get(otp_key(phone))
+        if not stored:
+            return 'expired', 0
+        stored['attempts'] += 1
+        if stored['code'] == otp:
+            cache.delete(otp_key(phone))
+            return 'ok', 0
+        if stored['attempts'] >= MAX_VERIFY_ATTEMPTS:
+            cache.delete(otp_key(phone))
+            return 'locked', 0
+        cache.set(otp_key(phone), stored, timeout=OTP_TTL)
+        return 'invalid', MAX_VERIFY_ATTEMPTS - stored['attempts']
+
+
+_store = None
+
+
+def get_otp_store():
+    global _store
+    if _store is None:
+        if isinstance(caches['default'], RedisCache):
+            from django_redis import get_redis_connection
+            _store = RedisOTPStore(get_redis_connection('default'))
+        else:
+            _store = CacheOTPStore()
+    return _store
+
+
+def get_client_ip(request):
+    # Behind OTP_TRUSTED_PROXY_HOPS proxies, the client is the address the
+    # outermost of them appended to X-Forwarded-For, that many entries from
+    # the right; anything further left was sent by the client itself.
+    if getattr(settings, 'OTP_TRUST_X_FORWARDED_FOR', False):
+        hops = max(getattr(settings, 'OTP_TRUSTED_PROXY_HOPS', 1), 1)
+        forwarded = [entry.strip() for entry in request.META.get('HTTP_X_FORWARDED_FOR', '').split(',')]
+        forwarded = [entry for entry in forwarded if entry]
+        if len(forwarded) >= hops:
+            return forwarded[-hops]
+    return request.META.get('REMOTE_ADDR', '')
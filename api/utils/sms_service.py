@@ -1,16 +1,185 @@
+import abc
+import logging
+import queue
+import threading
+import time
+
 import requests
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.utils.module_loading import import_string
+from requests.adapters import HTTPAdapter
+
+from payrole.instrumentation import track
+
+logger = logging.getLogger(__name__)
 
 url = "https://www.fast2sms.com/dev/bulkV2"
 
 headers = {
-    'authorization': "3kgPbxThiuEaSorMpF8c5W6YAClwyRLG9BQtUVqXIenD2sN4Jd9GRps4KJdneM1biV7TthOQ08kZDFgC",
     'Content-Type': "application/x-www-form-urlencoded",
     'Cache-Control': "no-cache",
     }
 
+
+class SMSError(Exception):
+    pass
+
+
+class SMSProvider(abc.ABC):
+    @abc.abstractmethod
+    def send_otp(self, phone, otp):
+        pass
+
+
+class Fast2SMSProvider(SMSProvider):
+    # One keep-alive session per process; connections are pooled and reused
+    # across sends instead of a new TCP/TLS handshake each time.
+    timeout = (3.05, 10)
+
+    def __init__(self):
+        if not getattr(settings, 'FAST2SMS_API_KEY', ''):
+            raise ImproperlyConfigured("FAST2SMS_API_KEY must be set to send OTPs through Fast2SMS")
+        self.session = requests.Session()
+        self.session.headers.update(headers)
+        self.session.headers['authorization'] = settings.FAST2SMS_API_KEY
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=10)
+        self.session.mount('https://', adapter)
+
+    def send_otp(self, phone, otp):
+        payload = f"variables_values={otp}&route=otp&numbers={phone}&sender_id=PYROLE"
+        try:
+            response = self.session.post(url, data=payload, timeout=self.timeout)
+        except requests.RequestException as e:
+            raise SMSError(str(e)) from e
+        if response.status_code >= 400:
+            raise SMSError(f"Gateway returned {response.status_code}: {response.text[:200]}")
+        return response.status_code
+
+
+class FakeSMSProvider(SMSProvider):
+    # Records messages instead of sending them; used by tests and local dev.
+    outbox = []
+
+    def send_otp(self, phone, otp):
+        self.outbox.append((phone, otp))
+        return 200
+
+
+class CircuitBreaker:
+    # Opens after `threshold` consecutive failures and rejects sends until
+    # `reset_timeout` seconds pass, then lets one trial send through.
+    def __init__(self, threshold=5, reset_timeout=30):
+        self.threshold = threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self.lock = threading.Lock()
+
+    def allow(self):
+        with self.lock:
+            if self.opened_at is None:
+                return True
+            if time.monotonic() - self.opened_at >= self.reset_timeout:
+                self.opened_at = None
+                self.failures = self.threshold - 1  # Half-open: one failure reopens
+                return True
+            return False
+
+    def record_success(self):
+        with self.lock:
+            self.failures = 0
+            self.opened_at = None
+
+    def record_failure(self):
+        with self.lock:
+            self.failures += 1
+            if self.failures >= self.threshold:
+                self.opened_at = time.monotonic()
+
+
+class SMSDispatcher:
+    def __init__(self, provider, workers=2, retries=3, backoff=0.5, breaker=None):
+        self.provider = provider
+        self.retries = retries
+        self.backoff = backoff
+        self.breaker = breaker or CircuitBreaker()
+        self.queue = queue.Queue()
+        self.workers = workers
+        self.threads = []
+        self.lock = threading.Lock()
+
+    def _start(self):
+        with self.lock:
+            if self.threads:
+                return
+            for i in range(self.workers):
+                thread = threading.Thread(target=self._work, name=f'sms-dispatch-{i}', daemon=True)
+                thread.start()
+                self.threads.append(thread)
+
+    def _work(self):
+        while True:
+            phone, otp = self.queue.get()
+            try:
+                self.deliver(phone, otp)
+            finally:
+                self.queue.task_done()
+
+    def deliver(self, phone, otp):
+        for attempt in range(self.retries):
+            if not self.breaker.allow():
+                logger.error("SMS provider circuit open; dropping OTP for %s", phone)
+                return False
+            try:
+                self.provider.send_otp(phone, otp)
+            except SMSError as e:
+                self.breaker.record_failure()
+                logger.warning("SMS to %s failed (attempt %s/%s): %s", phone, attempt + 1, self.retries, e)
+                if attempt + 1 < self.retries:
+                    time.sleep(self.backoff * 2 ** attempt)
+            else:
+                self.breaker.record_success()
+                return True
+        logger.error("Giving up on OTP SMS to %s", phone)
+        return False
+
+    def submit(self, phone, otp):
+        self._start()
+        self.queue.put((phone, otp))
+
+
+_dispatcher = None
+_dispatcher_lock = threading.Lock()
+
+
+def get_dispatcher():
+    global _dispatcher
+    with _dispatcher_lock:
+        if _dispatcher is None:
+            provider = import_string(getattr(settings, 'SMS_PROVIDER', 'api.utils.sms_service.Fast2SMSProvider'))()
+            _dispatcher = SMSDispatcher(provider, workers=getattr(settings, 'SMS_DISPATCH_THREADS', 2))
+        return _dispatcher
+
+
+def queue_otp_sms(phone, otp):
+    # Returns immediately; the send, retries and backoff happen on the
+    # dispatcher's worker threads. SMS_DISPATCH_SYNC sends inline instead.
+    dispatcher = get_dispatcher()
+    with track('sms'):
+        if getattr(settings, 'SMS_DISPATCH_SYNC', False):
+            return dispatcher.deliver(phone, otp)
+        dispatcher.submit(phone, otp)
+    return True
+
+
+async def aqueue_otp_sms(phone, otp):
+    # Queueing never blocks, so only an inline send leaves the event loop.
+    if getattr(settings, 'SMS_DISPATCH_SYNC', False):
+        return await sync_to_async(queue_otp_sms, thread_sensitive=False)(phone, otp)
+    return queue_otp_sms(phone, otp)
+
+
 def send_sms(phone, otp: int):
-    payload = f"variables_values={otp}&route=otp&numbers={phone}&sender_id=PYROLE"
-    print(payload)
-    response = requests.request("POST", url, data=payload, headers=headers)
-    print(response.text)
-    return response.status_code
\ No newline at end of file
+    return get_dispatcher().provider.send_otp(phone, otp)
@@ -0,0 +1,117 @@
+# user_cache.py
+import threading
+
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+
+from ..models import User
+
+USER_CACHE_TIMEOUT = 300
+STATS_FLUSH_EVERY = 100
+HITS_KEY = 'auth:user-cache:hits'
+MISSES_KEY = 'auth:user-cache:misses'
+
+_lock = threading.Lock()
+_pending = {HITS_KEY: 0, MISSES_KEY: 0}
+
+
+def user_cache_key(user_id, token_version):
+    return f'auth:user:{user_id}:v{token_version}'
+
+
+def _count(key):
+    pending = _record(key)
+    if pending:
+        flush_stats(pending)
+
+
+async def _acount(key):
+    pending = _record(key)
+    if pending:
+        await sync_to_async(flush_stats)(pending)
+
+
+def _record(key):
+    # Counters are batched in-process and flushed to the cache every
+    # STATS_FLUSH_EVERY events, so stats cost no extra round trip per request.
+    # Returns the batch once it is due for a flush.
+    with _lock:
+        _pending[key] += 1
+        if sum(_pending.values()) < STATS_FLUSH_EVERY:
+            return None
+        pending = dict(_pending)
+        for k in _pending:
+            _pending[k] = 0
+    return pending
+
+
+def flush_stats(pending=None):
+    if pending is None:
+        with _lock:
+            pending = dict(_pending)
+            for k in _pending:
+                _pending[k] = 0
+    for key, value in pending.items():
+        if value:
+            cache.add(key, 0, timeout=None)
+            cache.incr(key, value)
+
+
+def cache_stats():
+    flush_stats()
+    totals = cache.get_many([HITS_KEY, MISSES_KEY])
+    hits = totals.get(HITS_KEY, 0)
+    misses = totals.get(MISSES_KEY, 0)
+    return {
+        'hits': hits,
+        'misses': misses,
+        'hit_ratio': round(hits / (hits + misses), 4) if hits + misses else None,
+    }
+
+
+# The password hash never goes into the cache; cached users load it lazily
+# as a deferred field in the rare case it is needed.
+SNAPSHOT_FIELDS = [field.attname for field in User._meta.concrete_fields if field.attname != 'password']
+
+
+def snapshot(user):
+    return {name: getattr(user, name) for name in SNAPSHOT_FIELDS}
+
+
+def from_snapshot(data):
+    return User.from_db('default', SNAPSHOT_FIELDS, [data[name] for name in SNAPSHOT_FIELDS])
+
+
+def get_cached_user(user_id, token_version):
+    # Returns the user for a token, loading it from the DB only on a miss.
+    # Raises User.DoesNotExist for unknown users or revoked token versions.
+    key = user_cache_key(user_id, token_version)
+    data = cache.get(key)
+    if data is not None:
+        _count(HITS_KEY)
+        return from_snapshot(data)
+
+    _count(MISSES_KEY)
+    user = User.objects.get(id=user_id, token_version=token_version)
+    cache.set(key, snapshot(user), timeout=USER_CACHE_TIMEOUT)
+    return user
+
+
+async def aget_cached_user(user_id, token_version):
+    key = user_cache_key(user_id, token_version)
+    data = await cache.aget(key)
+    if data is not None:
+        await _acount(HITS_KEY)
+        return from_snapshot(data)
+
+    await _acount(MISSES_KEY)
+    user = await User.objects.aget(id=user_id, token_version=token_version)
+    await cache.aset(key, snapshot(user), timeout=USER_CACHE_TIMEOUT)
+    return user
+
+
+def invalidate_user(user):
+    # Also drop the previous version so bumping token_version revokes
+    # tokens immediately rather than after the cache timeout.
+    versions = {user.token_version, max(user.token_version - 1, 0)}
+    cache.delete_many([user_cache_key(user.pk, version) for version in versions])
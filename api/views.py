@@ -1,9 +1,9 @@
 import requests
+from asgiref.sync import sync_to_async
 from rest_framework import status
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
-from django.core.cache import cache
 from django.utils import timezone
 import random
 
@@ -15,8 +15,40 @@ from .serializers import (
     TokenResponseSerializer
 )
 from .models import User
+from .utils.async_views import AsyncAPIView, Fallback
 from .utils.auth import generate_token
-from .utils.sms_service import send_sms
+from .utils.otp_store import get_client_ip, get_otp_store
+from .utils.sms_service import aqueue_otp_sms, queue_otp_sms
+
+
+def new_otp():
+    return ''.join([str(random.randint(0, 9)) for _ in range(6)])
+
+
+def rate_limited(error, retry_after):
+    # (body, status, headers), shared by the DRF and async views.
+    return {'error': error}, status.HTTP_429_TOO_MANY_REQUESTS, {'Retry-After': str(retry_after)}
+
+
+def verify_failure(result, detail):
+    if result == 'limited':
+        return rate_limited('Too many attempts. Try again later.', detail)
+    body = {'error': 'Invalid OTP'}
+    if result == 'invalid':
+        body['attempts_left'] = detail
+    elif result == 'locked':
+        body['error'] = 'Too many invalid attempts. Request a new OTP.'
+    return body, status.HTTP_400_BAD_REQUEST, None
+
+
+def token_response(user, is_new_user):
+    token = generate_token(user)
+    response_serializer = TokenResponseSerializer(data={
+        'token': token,
+        'is_profile_complete': not is_new_user
+    })
+    response_serializer.is_valid()
+    return response_serializer.data
 
 
 class RequestOTPView(APIView):
@@ -26,11 +58,13 @@ class RequestOTPView(APIView):
             return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
         phone = serializer.validated_data['phone_number']
-        otp = ''.join([str(random.randint(0, 9)) for _ in range(6)])
-        cache.set(f'otp:{phone}', otp, timeout=600)  # 10 minutes
+        otp = new_otp()
+        allowed, retry_after = get_otp_store().issue(phone, otp, get_client_ip(request))
+        if not allowed:
+            body, code, headers = rate_limited('Too many OTP requests. Try again later.', retry_after)
+            return Response(body, status=code, headers=headers)
 
-        send_sms(phone, otp)
-        print(f"OTP for {phone}: {otp}")
+        queue_otp_sms(phone, otp)
 
         return Response({'message': 'OTP sent successfully'})
 
@@ -44,12 +78,10 @@ class VerifyOTPView(APIView):
         phone = serializer.validated_data['phone_number']
         otp = serializer.validated_data['otp']
 
-        stored_otp = cache.get(f'otp:{phone}')
-        if not stored_otp or stored_otp != otp:
-            return Response(
-                {'error': 'Invalid OTP'},
-                status=status.HTTP_400_BAD_REQUEST
-            )
+        result, detail = get_otp_store().verify(phone, otp, get_client_ip(request))
+        if result != 'ok':
+            body, code, headers = verify_failure(result, detail)
+            return Response(body, status=code, headers=headers)
 
         user = User.objects.filter(phone_number=phone).first()
         is_new_user = user is None
@@ -60,16 +92,7 @@ class VerifyOTPView(APIView):
         user.last_login = timezone.now()
         user.save()
 
-        cache.delete(f'otp:{phone}')
-        token = generate_token(user)
-        print(token)
-
-        response_serializer = TokenResponseSerializer(data={
-            'token': token,
-            'is_profile_complete': not is_new_user
-        })
-        response_serializer.is_valid()
-        return Response(response_serializer.data)
+        return Response(token_response(user, is_new_user))
 
 
 class CompleteProfileView(APIView):
@@ -105,3 +128,66 @@ class RandomUser(APIView):
     def get(self, request):
         response = requests.get("https://randomuser.me/api/")
         return Response(response.json())
+
+
+# Native async twins of the hottest endpoints, routed under ASGI only. The
+# OTP store runs its Redis script through one sync_to_async call:
+# django-redis has no async client.
+
+class AsyncRequestOTPView(AsyncAPIView):
+    fallback_view = RequestOTPView
+    allow = 'POST, OPTIONS'
+    permission_required = False
+
+    async def post(self, request):
+        serializer = PhoneNumberSerializer(data=self.json_body(request._request))
+        if not serializer.is_valid():
+            raise Fallback
+
+        phone = serializer.validated_data['phone_number']
+        otp = new_otp()
+        allowed, retry_after = await sync_to_async(get_otp_store().issue)(phone, otp, get_client_ip(request))
+        if not allowed:
+            body, code, headers = rate_limited('Too many OTP requests. Try again later.', retry_after)
+            return self.render(body, status=code, headers=headers)
+
+        await aqueue_otp_sms(phone, otp)
+
+        return self.render({'message': 'OTP sent successfully'})
+
+
+class AsyncVerifyOTPView(AsyncAPIView):
+    fallback_view = VerifyOTPView
+    allow = 'POST, OPTIONS'
+    permission_required = False
+
+    async def post(self, request):
+        serializer = OTPVerifySerializer(data=self.json_body(request._request))
+        if not serializer.is_valid():
+            raise Fallback
+
+        phone = serializer.validated_data['phone_number']
+        otp = serializer.validated_data['otp']
+
+        result, detail = await sync_to_async(get_otp_store().verify)(phone, otp, get_client_ip(request))
+        if result != 'ok':
+            body, code, headers = verify_failure(result, detail)
+            return self.render(body, status=code, headers=headers)
+
+        user = await User.objects.filter(phone_number=phone).afirst()
+        is_new_user = user is None
+
+        if is_new_user:
+            user = await User.objects.acreate(phone_number=phone)
+
+        user.last_login = timezone.now()
+        await user.asave()
+
+        return self.render(token_response(user, is_new_user))
+
+
+class AsyncUserProfileView(AsyncAPIView):
+    fallback_view = UserProfileView
+
+    async def get(self, request):
+        return self.render(UserProfileSerializer(request.user).data)
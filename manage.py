@@ -6,7 +6,8 @@ import sys
 
 def main():
     """Run administrative tasks."""
-    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'payrole.settings')
+    test = len(sys.argv) > 1 and sys.argv[1] == 'test'
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'payrole.settings_test' if test else 'payrole.settings')
     try:
         from django.core.management import execute_from_command_line
     except ImportError as exc:
@@ -11,6 +11,7 @@ import os
 
 from django.core.asgi import get_asgi_application
 
-os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'payrole.settings')
+# Routes the hottest endpoints to their native async views.
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'payrole.settings_asgi')
 
 application = get_asgi_application()
@@ -0,0 +1,16 @@
+# ASGI URLconf: native async views for the hottest endpoints, ahead of the
+# same routes as under WSGI. Selected by payrole/settings_asgi.py.
+from django.urls import path
+
+from api import views as api_views
+from workers import views as worker_views
+from .urls import urlpatterns as wsgi_urlpatterns
+
+urlpatterns = [
+    path('api/auth/request-otp/', api_views.AsyncRequestOTPView.as_view()),
+    path('api/auth/verify-otp/', api_views.AsyncVerifyOTPView.as_view()),
+    path('api/auth/profile/', api_views.AsyncUserProfileView.as_view()),
+    path('api/worker/assignments/', worker_views.AsyncAssignmentListView.as_view()),
+    path('api/worker/attendance/', worker_views.AsyncAttendanceListView.as_view()),
+    path('api/worker/payments/', worker_views.AsyncPaymentListView.as_view()),
+] + wsgi_urlpatterns
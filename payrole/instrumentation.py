@@ -0,0 +1,272 @@
+# instrumentation.py
+import contextlib
+import contextvars
+import hmac
+import logging
+import threading
+import time
+from collections import defaultdict
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.signals import request_started
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.http import HttpResponse, HttpResponseForbidden
+from django_redis.cache import RedisCache
+
+logger = logging.getLogger('payrole.performance')
+
+# Seconds; Prometheus' default latency buckets.
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_current = contextvars.ContextVar('request_stats', default=None)
+
+
+class RequestStats:
+    def __init__(self, request):
+        self.request = request
+        self.durations = defaultdict(float)
+        self.counts = defaultdict(int)
+        self._active = set()
+
+    @property
+    def view_name(self):
+        match = getattr(self.request, 'resolver_match', None)
+        return match.view_name if match else 'unmatched'
+
+    def add(self, kind, seconds, count=1):
+        self.durations[kind] += seconds
+        self.counts[kind] += count
+
+    @contextlib.contextmanager
+    def track(self, kind):
+        # Nested calls of the same kind (a cache get_many built from gets)
+        # count once.
+        if kind in self._active:
+            yield
+            return
+        self._active.add(kind)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._active.discard(kind)
+            self.add(kind, time.perf_counter() - start)
+
+
+def track(kind):
+    # Times a block against the current request, if there is one.
+    stats = _current.get()
+    return stats.track(kind) if stats is not None else contextlib.nullcontext()
+
+
+class Histograms:
+    # Per-endpoint request metrics, aggregated in this process.
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.endpoints = {}
+
+    def observe(self, key, total, stats):
+        with self.lock:
+            entry = self.endpoints.get(key)
+            if entry is None:
+                entry = self.endpoints[key] = {
+                    'buckets': [0] * len(BUCKETS), 'count': 0, 'sum': 0.0,
+                    'durations': defaultdict(float), 'counts': defaultdict(int),
+                }
+            for i, bound in enumerate(BUCKETS):
+                if total <= bound:
+                    entry['buckets'][i] += 1
+            entry['count'] += 1
+            entry['sum'] += total
+            for kind, seconds in stats.durations.items():
+                entry['durations'][kind] += seconds
+                entry['counts'][kind] += stats.counts[kind]
+
+    def reset(self):
+        with self.lock:
+            self.endpoints.clear()
+
+    def render(self):
+        lines = [
+            '# HELP payrole_request_duration_seconds Request latency by view.',
+            '# TYPE payrole_request_duration_seconds histogram',
+        ]
+        totals = []
+        with self.lock:
+            for (view, method), entry in sorted(self.endpoints.items()):
+                labels = f'view="{view}",method="{method}"'
+                for bound, count in zip(BUCKETS, entry['buckets']):
+                    lines.append(f'payrole_request_duration_seconds_bucket{{{labels},le="{bound}"}} {count}')
+                lines.append(f'payrole_request_duration_seconds_bucket{{{labels},le="+Inf"}} {entry["count"]}')
+                lines.append(f'payrole_request_duration_seconds_sum{{{labels}}} {entry["sum"]:.6f}')
+                lines.append(f'payrole_request_duration_seconds_count{{{labels}}} {entry["count"]}')
+                for kind in sorted(entry['durations']):
+                    totals.append((kind, labels, entry['durations'][kind], entry['counts'][kind]))
+        lines += [
+            '# HELP payrole_request_component_seconds_total Time spent in db, cache, render and sms.',
+            '# TYPE payrole_request_component_seconds_total counter',
+        ]
+        lines += [f'payrole_request_component_seconds_total{{{labels},component="{kind}"}} {seconds:.6f}'
+                  for kind, labels, seconds, _ in totals]
+        lines += [
+            '# HELP payrole_request_component_calls_total Queries, cache calls, renders and sms sends.',
+            '# TYPE payrole_request_component_calls_total counter',
+        ]
+        lines += [f'payrole_request_component_calls_total{{{labels},component="{kind}"}} {count}'
+                  for kind, labels, _, count in totals]
+        return '\n'.join(lines) + '\n'
+
+
+histograms = Histograms()
+
+
+class PerformanceMiddleware:
+    # Times each request's database queries (see time_query), cache calls,
+    # template/DRF rendering and SMS sends, under WSGI and ASGI. Adds a
+    # Server-Timing header, logs slow requests and queries, and feeds the
+    # per-endpoint histograms served by metrics_view.
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        stats = RequestStats(request)
+        token = _current.set(stats)
+        start = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.finish(request, response, stats, time.perf_counter() - start)
+
+    async def __acall__(self, request):
+        stats = RequestStats(request)
+        token = _current.set(stats)
+        start = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.finish(request, response, stats, time.perf_counter() - start)
+
+    def finish(self, request, response, stats, total):
+        histograms.observe((stats.view_name, request.method), total, stats)
+        if getattr(settings, 'PERF_SERVER_TIMING', settings.DEBUG):
+            response['Server-Timing'] = self.server_timing(stats, total)
+        if total * 1000 >= getattr(settings, 'PERF_SLOW_REQUEST_MS', 500):
+            logger.warning(
+                "Slow request %s %s (%s): %.1fms, %d queries in %.1fms, %d cache calls in %.1fms, render %.1fms",
+                request.method, request.path, stats.view_name, total * 1000,
+                stats.counts['db'], stats.durations['db'] * 1000,
+                stats.counts['cache'], stats.durations['cache'] * 1000,
+                stats.durations['render'] * 1000
+            )
+        return response
+
+    def process_template_response(self, request, response):
+        # Runs just before the response is rendered (this middleware is
+        # first, so its hook is called last); the callback runs just after.
+        stats = _current.get()
+        if stats is not None:
+            start = time.perf_counter()
+            response.add_post_render_callback(lambda r: stats.add('render', time.perf_counter() - start))
+        return response
+
+    @staticmethod
+    def server_timing(stats, total):
+        parts = []
+        for kind, label in (('db', 'queries'), ('cache', 'calls'), ('render', None), ('sms', None)):
+            if stats.counts[kind]:
+                desc = f';desc="{stats.counts[kind]} {label}"' if label else ''
+                parts.append(f'{kind};dur={stats.durations[kind] * 1000:.1f}{desc}')
+        # View code, serializers and everything else not measured above.
+        app = total - sum(stats.durations.values())
+        parts.append(f'app;dur={max(app, 0) * 1000:.1f}')
+        parts.append(f'total;dur={total * 1000:.1f}')
+        return ', '.join(parts)
+
+
+def time_query(execute, sql, params, many, context):
+    stats = _current.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        elapsed = time.perf_counter() - start
+        stats.add('db', elapsed)
+        if elapsed * 1000 >= getattr(settings, 'PERF_SLOW_QUERY_MS', 100):
+            logger.warning(
+                "Slow query in %s: %.1fms: %s", stats.view_name, elapsed * 1000, sql[:1000]
+            )
+
+
+def install_query_timer(connection, **kwargs):
+    # Connections are per thread and async views query from a worker
+    # thread, so the timer stays installed on every connection and finds
+    # the request through the context. First in the list, so it outlives
+    # execute_wrapper() blocks, which pop the last wrapper.
+    if time_query not in connection.execute_wrappers:
+        connection.execute_wrappers.insert(0, time_query)
+
+
+def install_query_timers(**kwargs):
+    # request_started runs on the thread that will run the request's
+    # queries, under WSGI and ASGI alike.
+    for connection in connections.all(initialized_only=True):
+        install_query_timer(connection)
+
+
+connection_created.connect(install_query_timer, dispatch_uid='payrole.instrumentation.query_timer')
+request_started.connect(install_query_timers, dispatch_uid='payrole.instrumentation.query_timers')
+
+
+CACHE_METHODS = (
+    'get', 'set', 'add', 'delete', 'get_many', 'set_many', 'delete_many',
+    'incr', 'decr', 'has_key', 'touch', 'get_or_set', 'clear',
+)
+
+
+def _timed(name):
+    def method(self, *args, **kwargs):
+        with track('cache'):
+            return getattr(super(InstrumentedCacheMixin, self), name)(*args, **kwargs)
+    method.__name__ = name
+    return method
+
+
+class InstrumentedCacheMixin:
+    # Counts and times cache round trips for PerformanceMiddleware.
+    pass
+
+
+for _name in CACHE_METHODS:
+    setattr(InstrumentedCacheMixin, _name, _timed(_name))
+
+
+class InstrumentedRedisCache(InstrumentedCacheMixin, RedisCache):
+    pass
+
+
+class InstrumentedLocMemCache(InstrumentedCacheMixin, LocMemCache):
+    pass
+
+
+def metrics_view(request):
+    # Prometheus text format. Each worker process keeps its own counters.
+    token = getattr(settings, 'PERF_METRICS_TOKEN', '')
+    supplied = request.headers.get('Authorization', '').encode()
+    if not token or not hmac.compare_digest(supplied, f'Bearer {token}'.encode()):
+        return HttpResponseForbidden()
+    return HttpResponse(histograms.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -45,8 +45,9 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'payrole.instrumentation.PerformanceMiddleware',
     'django.middleware.security.SecurityMiddleware',
-    'whitenoise.middleware.WhiteNoiseMiddleware',
+    'payrole.middleware.StaticFilesMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -123,6 +124,9 @@ USE_TZ = True
 
 STATIC_URL = 'static/'
 
+MEDIA_URL = 'media/'
+MEDIA_ROOT = BASE_DIR / 'media'
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.1/ref/settings/#default-auto-field
 
@@ -134,7 +138,7 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 if config("ENVIRONMENT", cast=str, default="local") == "production":
     CACHES = {
         "default": {
-            "BACKEND": "django_redis.cache.RedisCache",
+            "BACKEND": "payrole.instrumentation.InstrumentedRedisCache",
             "LOCATION": config("REDIS_URL"),
             "OPTIONS": {
                 "CLIENT_CLASS": "django_redis.client.DefaultClient",
@@ -144,7 +148,7 @@ if config("ENVIRONMENT", cast=str, default="local") == "production":
 else:
     CACHES = {
         "default": {
-            "BACKEND": "django_redis.cache.RedisCache",
+            "BACKEND": "payrole.instrumentation.InstrumentedRedisCache",
             "LOCATION": "redis://127.0.0.1:6379/1",
             "OPTIONS": {
                 "CLIENT_CLASS": "django_redis.client.DefaultClient",
@@ -152,6 +156,47 @@ else:
         }
     }
 
+# The test suite runs with payrole/settings_test.py on top of these.
+
+# Worker photos are resized in a background thread pool.
+WORKER_PHOTO_ASYNC = True
+WORKER_PHOTO_THREADS = config("WORKER_PHOTO_THREADS", cast=int, default=2)
+
+# OTP SMS are queued to background threads. Fast2SMS needs FAST2SMS_API_KEY
+# (`check --deploy` reports it missing); set SMS_PROVIDER to
+# api.utils.sms_service.FakeSMSProvider for local dev.
+SMS_PROVIDER = config("SMS_PROVIDER", default='api.utils.sms_service.Fast2SMSProvider')
+FAST2SMS_API_KEY = config("FAST2SMS_API_KEY", default='')
+SMS_DISPATCH_SYNC = False
+SMS_DISPATCH_THREADS = config("SMS_DISPATCH_THREADS", cast=int, default=2)
+
+# Delta sync skips rows younger than the settle window, which may still be
+# uncommitted, and keeps deletion tombstones this many days. Rows committed
+# later than the window are restamped on commit; the window must also cover
+# clock skew between app servers.
+SYNC_SETTLE_SECONDS = config("SYNC_SETTLE_SECONDS", cast=int, default=2)
+SYNC_TOMBSTONE_DAYS = config("SYNC_TOMBSTONE_DAYS", cast=int, default=30)
+
+# Seconds a cached list response lives (0 disables the cache). Entries are
+# keyed by collection version, so writes never serve stale lists; the TTL
+# only bounds how long orphaned versions take space.
+RESPONSE_CACHE_TTL = config("RESPONSE_CACHE_TTL", cast=int, default=300)
+
+# Per-request timing (payrole/instrumentation.py): Server-Timing header
+# (on in DEBUG), slow request / query logs and the /metrics/ endpoint, which
+# requires `Authorization: Bearer <PERF_METRICS_TOKEN>` and is disabled
+# while no token is set.
+PERF_SERVER_TIMING = config("PERF_SERVER_TIMING", cast=bool, default=DEBUG)
+PERF_SLOW_REQUEST_MS = config("PERF_SLOW_REQUEST_MS", cast=int, default=500)
+PERF_SLOW_QUERY_MS = config("PERF_SLOW_QUERY_MS", cast=int, default=100)
+PERF_METRICS_TOKEN = config("PERF_METRICS_TOKEN", default='')
+
+# OTP rate limits key on REMOTE_ADDR. Behind reverse proxies, enable this and
+# set the number of proxies that append to X-Forwarded-For; the client IP is
+# then the entry the outermost proxy appended.
+OTP_TRUST_X_FORWARDED_FOR = config("OTP_TRUST_X_FORWARDED_FOR", cast=bool, default=False)
+OTP_TRUSTED_PROXY_HOPS = config("OTP_TRUSTED_PROXY_HOPS", cast=int, default=1)
+
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
         'api.authentication.JWTAuthentication',  # Update this path
@@ -0,0 +1,5 @@
+# ASGI server settings: the same as payrole.settings, with the URLconf that
+# routes the hottest endpoints to their native async views.
+from .settings import *  # noqa: F401,F403
+
+ROOT_URLCONF = 'payrole.asgi_urls'
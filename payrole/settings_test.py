@@ -0,0 +1,15 @@
+# Test suite settings: no Redis or SMS gateway, background work inline,
+# and no settle window or response cache unless a test turns them on.
+from .settings import *  # noqa: F401,F403
+
+CACHES = {
+    "default": {
+        "BACKEND": "payrole.instrumentation.InstrumentedLocMemCache",
+    }
+}
+
+WORKER_PHOTO_ASYNC = False
+SMS_PROVIDER = 'api.utils.sms_service.FakeSMSProvider'
+SMS_DISPATCH_SYNC = True
+SYNC_SETTLE_SECONDS = 0
+RESPONSE_CACHE_TTL = 0
@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from workers.utils.payroll import parse_month
+from workers.utils.rollups import BATCH_SIZE, archive_months, default_cutoff
+
+
+class Command(BaseCommand):
+    help = (
+        "Move attendance of closed months into monthly rollups. Rows with "
+        "check-in/out times or notes stay in the attendance table."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--before', help='Archive months before this one (YYYY-MM)')
+        parser.add_argument(
+            '--keep-months', type=int, default=3,
+            help='Without --before, leave this many months before the current one live'
+        )
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE, help='Assignments per transaction')
+
+    def handle(self, *args, **options):
+        try:
+            before = parse_month(options['before'])[0] if options['before'] else default_cutoff(options['keep_months'])
+            months, rows = archive_months(before, batch_size=options['batch_size'], stdout=self.stdout)
+        except ValueError as e:
+            raise CommandError(e)
+        self.stdout.write(self.style.SUCCESS(f"Archived {rows} attendance rows from {months} months before {before:%Y-%m}"))
@@ -0,0 +1,172 @@
+import asyncio
+import itertools
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import async_to_sync
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+from django.db.models import Count
+from django.test import AsyncClient, Client, override_settings
+
+from api.utils import sms_service
+from api.utils.auth import generate_token
+from .benchmark_endpoints import git_commit, percentile
+
+ASGI_URLCONF = 'payrole.asgi_urls'
+
+
+def endpoints():
+    # (name, method, path, body or body(i)); the endpoints that have native
+    # async views under ASGI.
+    return [
+        ('auth.request_otp', 'post', '/api/auth/request-otp/', lambda i: {'phone_number': f'+9197{i:08d}'}),
+        ('auth.profile', 'get', '/api/auth/profile/', None),
+        ('workers.assignment_list', 'get', '/api/worker/assignments/', None),
+        ('workers.attendance_list', 'get', '/api/worker/attendance/', None),
+        ('workers.payment_list', 'get', '/api/worker/payments/', None),
+    ]
+
+
+def summarize(timings, statuses, wall):
+    timings.sort()
+    return {
+        'statuses': {str(code): count for code, count in sorted(statuses.items())},
+        'p50_ms': round(percentile(timings, 50) * 1000, 3),
+        'p95_ms': round(percentile(timings, 95) * 1000, 3),
+        'p99_ms': round(percentile(timings, 99) * 1000, 3),
+        'mean_ms': round(sum(timings) / len(timings) * 1000, 3),
+        'throughput_rps': round(len(timings) / wall, 1),
+    }
+
+
+class Command(BaseCommand):
+    help = (
+        "Load the endpoints that have native async views, in-process and concurrently: "
+        "through the ASGI handler with the async views, and through the WSGI path on a "
+        "pool of worker threads. Reports latency percentiles and throughput for both as JSON."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', help='Phone number of the employer to act as. Defaults to the largest')
+        parser.add_argument('--requests', type=int, default=500, help='Requests per endpoint and mode')
+        parser.add_argument('--concurrency', type=int, default=50, help='Requests in flight under ASGI')
+        parser.add_argument('--threads', type=int, default=8, help='WSGI worker threads')
+        parser.add_argument('--only', action='append', help='Endpoint name prefix; repeatable')
+        parser.add_argument('--output', help='Write the JSON report to this file instead of stdout')
+
+    def handle(self, *args, **options):
+        if min(options['requests'], options['concurrency'], options['threads']) < 1:
+            raise CommandError("--requests, --concurrency and --threads must be at least 1")
+        users = get_user_model().objects.annotate(assignments=Count('workerassignment'))
+        if options['user']:
+            user = users.filter(phone_number=options['user']).first()
+        else:
+            user = users.order_by('-assignments').first()
+        if user is None or not user.assignments:
+            raise CommandError("No employer with assignments found; run seed_data first")
+
+        headers = {'Authorization': f'Bearer {generate_token(user)}'}
+        # Numbers keep OTP phones and client IPs unique across runs and modes.
+        self.counter = itertools.count(int(time.time()) % 10 ** 5 * 1000)
+        self.lock = threading.Lock()
+
+        # OTP requests must never reach the real SMS gateway.
+        real_dispatcher = sms_service._dispatcher
+        sms_service._dispatcher = sms_service.SMSDispatcher(sms_service.FakeSMSProvider())
+        results = {}
+        try:
+            # Each request poses as its own client behind one proxy, so the
+            # per-IP OTP limits don't throttle the run.
+            with override_settings(OTP_TRUST_X_FORWARDED_FOR=True, OTP_TRUSTED_PROXY_HOPS=1):
+                for name, method, path, body in endpoints():
+                    if options['only'] and not any(name.startswith(prefix) for prefix in options['only']):
+                        continue
+                    target = (method, path, body, headers)
+                    results[name] = {
+                        'method': method.upper(),
+                        'path': path,
+                        'wsgi': self.run_wsgi(target, options),
+                        'asgi': self.run_asgi(target, options),
+                    }
+        finally:
+            sms_service._dispatcher = real_dispatcher
+
+        report = {
+            'commit': git_commit(),
+            'database': connection.vendor,
+            'user': user.phone_number,
+            'requests': options['requests'],
+            'asgi_concurrency': options['concurrency'],
+            'wsgi_threads': options['threads'],
+            'endpoints': results,
+        }
+        output = json.dumps(report, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                f.write(output + '\n')
+            self.stderr.write(f"Wrote {options['output']}")
+        else:
+            self.stdout.write(output)
+
+    def next_request(self, target):
+        method, path, body, headers = target
+        with self.lock:
+            i = next(self.counter)
+        headers = dict(headers, **{'X-Forwarded-For': f'198.19.{i // 250 % 250}.{i % 250 + 1}'})
+        kwargs = {'headers': headers}
+        if body is not None:
+            kwargs.update(data=json.dumps(body(i) if callable(body) else body), content_type='application/json')
+        return method, path, kwargs
+
+    def run_wsgi(self, target, options):
+        remaining = iter(range(options['requests']))
+        timings, statuses = [], {}
+
+        def work():
+            client = Client(raise_request_exception=False)
+            try:
+                while True:
+                    with self.lock:
+                        if next(remaining, None) is None:
+                            return
+                    method, path, kwargs = self.next_request(target)
+                    start = time.perf_counter()
+                    response = getattr(client, method)(path, **kwargs)
+                    elapsed = time.perf_counter() - start
+                    with self.lock:
+                        timings.append(elapsed)
+                        statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+            finally:
+                connections.close_all()
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options['threads']) as pool:
+            for future in [pool.submit(work) for _ in range(options['threads'])]:
+                future.result()
+        return summarize(timings, statuses, time.perf_counter() - start)
+
+    def run_asgi(self, target, options):
+        remaining = iter(range(options['requests']))
+        timings, statuses = [], {}
+
+        async def work():
+            client = AsyncClient(raise_request_exception=False)
+            while next(remaining, None) is not None:
+                method, path, kwargs = self.next_request(target)
+                start = time.perf_counter()
+                response = await getattr(client, method)(path, **kwargs)
+                timings.append(time.perf_counter() - start)
+                statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+        async def run():
+            start = time.perf_counter()
+            await asyncio.gather(*[work() for _ in range(options['concurrency'])])
+            return time.perf_counter() - start
+
+        with override_settings(ROOT_URLCONF=ASGI_URLCONF):
+            wall = async_to_sync(run)()
+        return summarize(timings, statuses, wall)
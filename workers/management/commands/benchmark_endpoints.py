@@ -0,0 +1,217 @@
+import json
+import subprocess
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Count
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from api.utils import sms_service
+from api.utils.auth import generate_token
+from workers.models import Worker, WorkerAssignment, Attendance, Payment
+
+
+class Rollback(Exception):
+    pass
+
+
+def percentile(samples, pct):
+    # Nearest-rank percentile of a sorted list.
+    index = max(int(round(pct / 100 * len(samples) + 0.5)) - 1, 0)
+    return samples[min(index, len(samples) - 1)]
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=settings.BASE_DIR,
+            capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def endpoints(fixture):
+    # (name, method, path, body or body(i)). Writes run in a
+    # transaction that is rolled back after every request. random-user is
+    # left out: it only proxies an external API.
+    worker, assignment = fixture['worker'], fixture['assignment']
+    attendance, payment = fixture['attendance'], fixture['payment']
+    month = fixture['today'].strftime('%Y-%m')
+    return [
+        ('auth.request_otp', 'post', '/api/auth/request-otp/', lambda i: {'phone_number': f'+9199{i:08d}'}),
+        ('auth.verify_otp', 'post', '/api/auth/verify-otp/', None),
+        ('auth.complete_profile', 'post', '/api/auth/complete-profile/', {'full_name': 'Benchmark Employer'}),
+        ('auth.profile', 'get', '/api/auth/profile/', None),
+        ('workers.dashboard', 'get', '/api/worker/dashboard/', None),
+        ('workers.export_payments_csv', 'get', '/api/worker/exports/payments/?file_type=csv', None),
+        ('workers.export_attendance_xlsx', 'get', '/api/worker/exports/attendance/?file_type=xlsx', None),
+        ('workers.export_loans_csv', 'get', '/api/worker/exports/loans/', None),
+        ('workers.sync', 'get', '/api/worker/sync/', None),
+        ('workers.worker_list', 'get', '/api/worker/workers/', None),
+        ('workers.worker_search', 'get', f'/api/worker/workers/?search={worker.full_name.split()[0]}', None),
+        ('workers.worker_detail', 'get', f'/api/worker/workers/{worker.pk}/', None),
+        ('workers.worker_create', 'post', '/api/worker/workers/', lambda i: {
+            'full_name': f'Benchmark Worker {i}', 'phone_number': f'96{i:08d}', 'emergency_contact': f'95{i:08d}',
+            'id_type': 'AADHAR', 'id_number': f'{i:012d}', 'address': 'Benchmark Road', 'gender': 'F'
+        }),
+        ('workers.worker_add_loan', 'post', f'/api/worker/workers/{worker.pk}/add_loan/', {'amount': '500'}),
+        ('workers.assignment_list', 'get', '/api/worker/assignments/', None),
+        ('workers.assignment_detail', 'get', f'/api/worker/assignments/{assignment.pk}/', None),
+        ('workers.assignment_update', 'patch', f'/api/worker/assignments/{assignment.pk}/', {'duties': 'Cooking'}),
+        ('workers.attendance_list', 'get', '/api/worker/attendance/', None),
+        ('workers.attendance_by_date', 'get', f'/api/worker/attendance/?date={attendance.date}', None),
+        ('workers.attendance_detail', 'get', f'/api/worker/attendance/{attendance.pk}/', None),
+        ('workers.attendance_update', 'patch', f'/api/worker/attendance/{attendance.pk}/', {'status': 'ABSENT'}),
+        ('workers.attendance_summary', 'get', f'/api/worker/attendance/summary/?month={month}', None),
+        ('workers.attendance_bulk_create', 'post', '/api/worker/attendance/bulk_create/', [
+            {'assignment': str(assignment.pk), 'date': str(fixture['today'] - timedelta(days=d)), 'status': 'PRESENT'}
+            for d in range(30)
+        ]),
+        ('workers.payment_list', 'get', '/api/worker/payments/', None),
+        ('workers.payment_detail', 'get', f'/api/worker/payments/{payment.pk}/', None),
+        ('workers.payment_update', 'patch', f'/api/worker/payments/{payment.pk}/', {'notes': 'Checked'}),
+        ('workers.payment_bulk', 'post', '/api/worker/payments/bulk/', [
+            {'assignment': str(assignment.pk), 'amount': '1000.00', 'payment_mode': 'UPI'} for _ in range(20)
+        ]),
+        ('workers.payroll_run_dry', 'post', '/api/worker/payments/payroll-run/', {'month': month, 'dry_run': True}),
+    ]
+
+
+class Command(BaseCommand):
+    help = (
+        "Drive every API endpoint in-process against the current database and report "
+        "p50/p95/p99 latency, throughput and query counts as JSON."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', help='Phone number of the employer to act as. Defaults to the largest')
+        parser.add_argument('--iterations', type=int, default=50)
+        parser.add_argument('--warmup', type=int, default=5)
+        parser.add_argument('--only', action='append', help='Endpoint name prefix; repeatable')
+        parser.add_argument('--output', help='Write the JSON report to this file instead of stdout')
+
+    def handle(self, *args, **options):
+        if options['iterations'] < 1:
+            raise CommandError("--iterations must be at least 1")
+        User = get_user_model()
+        users = User.objects.annotate(assignments=Count('workerassignment'))
+        if options['user']:
+            user = users.filter(phone_number=options['user']).first()
+        else:
+            user = users.order_by('-assignments').first()
+        if user is None or not user.assignments:
+            raise CommandError("No employer with assignments found; run seed_data first")
+
+        assignment = WorkerAssignment.objects.filter(user=user).select_related('worker').first()
+        fixture = {
+            'today': timezone.localdate(),
+            'assignment': assignment,
+            'worker': assignment.worker,
+            'attendance': Attendance.objects.filter(assignment=assignment).order_by('-date').first(),
+            'payment': Payment.objects.filter(assignment=assignment).order_by('-payment_date').first(),
+        }
+        if fixture['attendance'] is None or fixture['payment'] is None:
+            raise CommandError("The employer needs attendance and payments; run seed_data first")
+
+        # OTP requests must never reach the real SMS gateway.
+        real_dispatcher = sms_service._dispatcher
+        sms_service._dispatcher = sms_service.SMSDispatcher(sms_service.FakeSMSProvider())
+        try:
+            with override_settings(SMS_DISPATCH_SYNC=True):
+                results = self.run_all(user, fixture, options)
+        finally:
+            sms_service._dispatcher = real_dispatcher
+
+        report = {
+            'commit': git_commit(),
+            'database': connection.vendor,
+            'user': user.phone_number,
+            'iterations': options['iterations'],
+            'counts': {
+                'workers': Worker.objects.count(),
+                'assignments': WorkerAssignment.objects.count(),
+                'attendance': Attendance.objects.count(),
+                'payments': Payment.objects.count(),
+            },
+            'endpoints': results,
+        }
+        output = json.dumps(report, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                f.write(output + '\n')
+            self.stderr.write(f"Wrote {options['output']}")
+        else:
+            self.stdout.write(output)
+
+    def run_all(self, user, fixture, options):
+        auth = {'HTTP_AUTHORIZATION': f'Bearer {generate_token(user)}'}
+        results = {}
+        for name, method, path, body in endpoints(fixture):
+            if options['only'] and not any(name.startswith(prefix) for prefix in options['only']):
+                continue
+            results[name] = self.run_endpoint(name, method, path, body, auth, options)
+        return results
+
+    def request(self, client, name, method, path, body, auth, i):
+        # Returns (status_code, seconds, queries) for one request.
+        headers = dict(auth, REMOTE_ADDR=f'198.18.{i // 250 % 250}.{i % 250 + 1}')
+        if name == 'auth.verify_otp':
+            phone = f'+9198{i:08d}'
+            client.post('/api/auth/request-otp/', {'phone_number': phone}, content_type='application/json', **headers)
+            body = {'phone_number': phone, 'otp': sms_service.FakeSMSProvider.outbox[-1][1]}
+        elif callable(body):
+            body = body(i)
+
+        kwargs = dict(headers)
+        if body is not None:
+            kwargs.update(data=json.dumps(body), content_type='application/json')
+        with CaptureQueriesContext(connection) as queries:
+            start = time.perf_counter()
+            response = getattr(client, method)(path, **kwargs)
+            if response.streaming:
+                for _ in response.streaming_content:
+                    pass
+            elapsed = time.perf_counter() - start
+        return response.status_code, elapsed, len(queries)
+
+    def run_endpoint(self, name, method, path, body, auth, options):
+        client = Client(raise_request_exception=False)
+        timings, query_counts, statuses = [], [], {}
+        # Request numbers keep generated phones and client IPs unique across
+        # runs, so OTP rate limits are not hit.
+        base = int(time.time()) % 10 ** 6 * 100
+        total = options['warmup'] + options['iterations']
+        for n in range(total):
+            try:
+                with transaction.atomic():
+                    status_code, elapsed, queries = self.request(
+                        client, name, method, path, body, auth, base + n
+                    )
+                    raise Rollback
+            except Rollback:
+                pass
+            if n < options['warmup']:
+                continue
+            timings.append(elapsed)
+            query_counts.append(queries)
+            statuses[status_code] = statuses.get(status_code, 0) + 1
+
+        timings.sort()
+        return {
+            'method': method.upper(),
+            'path': path,
+            'statuses': {str(code): count for code, count in sorted(statuses.items())},
+            'p50_ms': round(percentile(timings, 50) * 1000, 3),
+            'p95_ms': round(percentile(timings, 95) * 1000, 3),
+            'p99_ms': round(percentile(timings, 99) * 1000, 3),
+            'mean_ms': round(sum(timings) / len(timings) * 1000, 3),
+            'throughput_rps': round(len(timings) / sum(timings), 1),
+            'queries': {'min': min(query_counts), 'max': max(query_counts)},
+        }
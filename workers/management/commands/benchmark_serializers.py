@@ -0,0 +1,98 @@
+import json
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Count
+from django.test import RequestFactory
+from rest_framework.request import Request
+
+from workers.utils import values_serializer
+from workers.views import AttendanceViewSet, PaymentViewSet, WorkerAssignmentViewSet
+from .benchmark_endpoints import git_commit, percentile
+
+VIEWSETS = {
+    'assignments': WorkerAssignmentViewSet,
+    'attendance': AttendanceViewSet,
+    'payments': PaymentViewSet,
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Time serializing list pages through the DRF serializers (model instances) and "
+        "through the compiled values() plans the list endpoints use, query included. "
+        "Checks both produce the same rows and reports timings and the speedup as JSON."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', help='Phone number of the employer to act as. Defaults to the largest')
+        parser.add_argument('--rows', type=int, default=500, help='Rows per page')
+        parser.add_argument('--iterations', type=int, default=50)
+        parser.add_argument('--output', help='Write the JSON report to this file instead of stdout')
+
+    def handle(self, *args, **options):
+        if min(options['rows'], options['iterations']) < 1:
+            raise CommandError("--rows and --iterations must be at least 1")
+        users = get_user_model().objects.annotate(assignments=Count('workerassignment'))
+        if options['user']:
+            user = users.filter(phone_number=options['user']).first()
+        else:
+            user = users.order_by('-assignments').first()
+        if user is None or not user.assignments:
+            raise CommandError("No employer with assignments found; run seed_data first")
+
+        request = Request(RequestFactory().get('/'))
+        request.user = user
+        results = {}
+        for name, viewset_class in VIEWSETS.items():
+            viewset = viewset_class(request=request, format_kwarg=None, action='list', args=(), kwargs={})
+            serializer = viewset.get_serializer()
+            plan = values_serializer.plan_for(serializer)
+            ordering = viewset.pagination_class.ordering
+            rows = options['rows']
+
+            def drf():
+                page = viewset.filter_queryset(viewset.get_queryset()).order_by(*ordering)[:rows]
+                return viewset.get_serializer(page, many=True).data
+
+            def values():
+                return plan.serialize(viewset.values_queryset(plan).order_by(*ordering)[:rows], serializer)
+
+            expected, actual = drf(), values()
+            results[name] = {
+                'rows': len(expected),
+                'identical': list(expected) == actual,
+                'drf': self.time(drf, options['iterations']),
+                'values': self.time(values, options['iterations']),
+            }
+            results[name]['speedup'] = round(results[name]['drf']['p50_ms'] / results[name]['values']['p50_ms'], 2)
+
+        report = {
+            'commit': git_commit(),
+            'database': connection.vendor,
+            'user': user.phone_number,
+            'iterations': options['iterations'],
+            'collections': results,
+        }
+        output = json.dumps(report, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                f.write(output + '\n')
+            self.stderr.write(f"Wrote {options['output']}")
+        else:
+            self.stdout.write(output)
+
+    def time(self, run, iterations):
+        timings = []
+        for _ in range(iterations):
+            start = time.perf_counter()
+            run()
+            timings.append(time.perf_counter() - start)
+        timings.sort()
+        return {
+            'p50_ms': round(percentile(timings, 50) * 1000, 3),
+            'p95_ms': round(percentile(timings, 95) * 1000, 3),
+            'mean_ms': round(sum(timings) / len(timings) * 1000, 3),
+        }
@@ -0,0 +1,30 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import CommandError
+
+from workers.utils.imports import GRID_BATCH_SIZE, import_attendance_grid
+from .import_workers import Command as ImportCommand
+
+
+class Command(ImportCommand):
+    label = 'attendance'
+    help = (
+        "Import an employer's historical attendance from a month-grid CSV or XLSX file: "
+        "columns assignment (id or worker name), optional job_type, month (YYYY-MM) and "
+        "1-31 holding P, A, H or L. Days are upserted on (assignment, date) in batches; "
+        "rerun with --start-row to resume after an interruption."
+    )
+
+    def add_arguments(self, parser):
+        super().add_arguments(parser)
+        parser.add_argument('--user', required=True, help='Phone number of the employer')
+        parser.set_defaults(batch_size=GRID_BATCH_SIZE)
+
+    def prepare(self, options):
+        self.user = get_user_model().objects.filter(phone_number=options['user']).first()
+        if self.user is None:
+            raise CommandError(f"No user with phone number {options['user']}")
+
+    def batches(self, rows, options):
+        return import_attendance_grid(
+            self.user, rows, start_row=options['start_row'], batch_size=options['batch_size']
+        )
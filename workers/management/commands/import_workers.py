@@ -0,0 +1,49 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from workers.utils.imports import BATCH_SIZE, InvalidFile, import_workers, read_table
+
+
+class Command(BaseCommand):
+    label = 'workers'
+    help = (
+        "Import workers from a CSV or XLSX file with a header row. Workers are matched "
+        "on (id_type, id_number) and created or updated in batches, each committed on "
+        "its own; rerun with --start-row to resume after an interruption."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--start-row', type=int, default=0, help='Skip rows up to this one (the header is row 1)')
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE, help='Rows per transaction')
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1:
+            raise CommandError("--batch-size must be at least 1")
+        counts, last_row = {}, None
+        self.prepare(options)
+        try:
+            with open(options['path'], 'rb') as f:
+                batches = self.batches(read_table(f, options['path']), options)
+                for results in batches:
+                    for result in results:
+                        counts[result['status']] = counts.get(result['status'], 0) + 1
+                        if result['status'] == 'error':
+                            errors = '; '.join(
+                                f"{field}: {' '.join(messages)}" for field, messages in result['errors'].items()
+                            )
+                            self.stdout.write(f"Row {result['row']}: {errors}")
+                    last_row = results[-1]['row']
+                    self.stderr.write(f"Committed through row {last_row}")
+        except OSError as e:
+            raise CommandError(e)
+        except InvalidFile as e:
+            resume = f"; resume with --start-row {last_row}" if last_row else ''
+            raise CommandError(f"{e}{resume}")
+        summary = ', '.join(f"{count} {status}" for status, count in sorted(counts.items())) or 'no rows'
+        self.stdout.write(self.style.SUCCESS(f"Imported {self.label}: {summary}"))
+
+    def prepare(self, options):
+        pass
+
+    def batches(self, rows, options):
+        return import_workers(rows, start_row=options['start_row'], batch_size=options['batch_size'])
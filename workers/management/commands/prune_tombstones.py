@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from workers.utils.sync import prune_tombstones
+
+
+class Command(BaseCommand):
+    help = "Delete sync tombstones older than SYNC_TOMBSTONE_DAYS."
+
+    def handle(self, *args, **options):
+        count = prune_tombstones()
+        self.stdout.write(self.style.SUCCESS(f"Pruned {count} tombstones"))
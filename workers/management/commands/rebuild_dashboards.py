@@ -0,0 +1,23 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from workers.utils.dashboard import rebuild
+
+
+class Command(BaseCommand):
+    help = "Recompute the materialized employer dashboard totals."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', action='append', help='User phone number; repeatable. Defaults to all users')
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        user_ids = None
+        if options['user']:
+            user_ids = list(
+                get_user_model().objects.filter(phone_number__in=options['user']).values_list('id', flat=True)
+            )
+        with transaction.atomic():
+            count = rebuild(user_ids, batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {count} employer dashboards"))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from workers.utils.search import rebuild_index
+
+
+class Command(BaseCommand):
+    help = "Rebuild the worker search index from the workers table."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        count = rebuild_index(chunk_size=options['chunk_size'])
+        self.stdout.write(self.style.SUCCESS(f"Indexed {count} workers"))
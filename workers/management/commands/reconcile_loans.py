@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from workers.models import Worker
+from workers.utils.dashboard import refresh_loans_for_workers
+from workers.utils import versioning
+from workers.utils.ledger import loan_drift
+
+
+class Command(BaseCommand):
+    help = "Recompute worker loan balances from LoanAdjustment history and report drift."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--fix', action='store_true', help='Overwrite drifted balances')
+        parser.add_argument('--chunk-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        drifted = []
+        for worker_id, stored, expected in loan_drift(chunk_size=options['chunk_size']):
+            drifted.append(Worker(id=worker_id, loan_balance=expected))
+            self.stdout.write(f"{worker_id}: stored {stored}, expected {expected} (drift {stored - expected})")
+
+        if not drifted:
+            self.stdout.write(self.style.SUCCESS("All loan balances match their history"))
+            return
+
+        if options['fix']:
+            with transaction.atomic():
+                Worker.objects.bulk_update(drifted, ['loan_balance'], batch_size=options['chunk_size'])
+                refresh_loans_for_workers(worker.pk for worker in drifted)
+                versioning.bump([versioning.GLOBAL_SCOPE], ['workers'])
+            self.stdout.write(self.style.SUCCESS(f"Fixed {len(drifted)} loan balances"))
+        else:
+            self.stdout.write(self.style.WARNING(f"{len(drifted)} loan balances drifted; rerun with --fix to repair"))
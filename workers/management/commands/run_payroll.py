@@ -0,0 +1,47 @@
+import json
+
+from django.contrib.auth import get_user_model
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+from django.core.serializers.json import DjangoJSONEncoder
+
+from workers.models import Payment
+from workers.utils.payroll import run_payroll
+
+
+class Command(BaseCommand):
+    help = "Compute and create the month's salary payments for every active assignment of a user."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', required=True, help='User phone number or id')
+        parser.add_argument('--month', required=True, help='Payroll month as YYYY-MM')
+        parser.add_argument('--dry-run', action='store_true', help='Preview without writing anything')
+        parser.add_argument('--payment-date', help='Defaults to the last day of the month')
+        parser.add_argument('--payment-mode', default='CASH', choices=[c for c, _ in Payment.PAYMENT_MODES])
+        parser.add_argument('--status', default='PENDING', choices=[c for c, _ in Payment.STATUS_CHOICES])
+        parser.add_argument('--no-loan-deductions', action='store_true')
+
+    def handle(self, *args, **options):
+        User = get_user_model()
+        lookup = options['user']
+        user = User.objects.filter(phone_number=lookup).first()
+        if user is None:
+            try:
+                user = User.objects.get(id=lookup)
+            except (User.DoesNotExist, ValidationError):
+                raise CommandError(f"User '{lookup}' not found")
+
+        try:
+            result = run_payroll(
+                user,
+                options['month'],
+                dry_run=options['dry_run'],
+                payment_date=options['payment_date'],
+                payment_mode=options['payment_mode'],
+                status=options['status'],
+                deduct_loans=not options['no_loan_deductions'],
+            )
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        self.stdout.write(json.dumps(result, cls=DjangoJSONEncoder, indent=2))
@@ -0,0 +1,172 @@
+import random
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+from itertools import islice
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from workers.models import Worker, WorkerAssignment, Attendance, Payment, LoanAdjustment
+from workers.utils import dashboard, versioning
+from workers.utils.search import rebuild_index
+
+FIRST_NAMES = ['Lakshmi', 'Ramesh', 'Sita', 'Arjun', 'Priya', 'Suresh', 'Anita', 'Vijay', 'Meena', 'Ravi']
+LAST_NAMES = ['Devi', 'Kumar', 'Reddy', 'Sharma', 'Naidu', 'Rao', 'Patel', 'Singh', 'Das', 'Iyer']
+CITIES = [('Hyderabad', 'Telangana'), ('Bengaluru', 'Karnataka'), ('Chennai', 'Tamil Nadu'), ('Pune', 'Maharashtra')]
+ATTENDANCE_WEIGHTS = {'PRESENT': 85, 'ABSENT': 5, 'HALF_DAY': 5, 'LEAVE': 5}
+SALARIES = [Decimal('6000.00'), Decimal('9000.00'), Decimal('12000.00'), Decimal('15000.00')]
+MONTHLY_DEDUCTION = Decimal('1000.00')
+
+
+def at(day, hour):
+    return timezone.make_aware(datetime.combine(day, time(hour)))
+
+
+def chunked(iterable, size):
+    iterator = iter(iterable)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+def month_starts(start, end):
+    current = start.replace(day=1)
+    while current <= end:
+        if current >= start:
+            yield current
+        current = (current + timedelta(days=32)).replace(day=1)
+
+
+class Command(BaseCommand):
+    help = "Seed synthetic employers, workers, attendance, payments and loans with bulk inserts."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=10)
+        parser.add_argument('--workers-per-user', type=int, default=5)
+        parser.add_argument('--years', type=int, default=1, help='Years of daily attendance and monthly payments')
+        parser.add_argument('--loans-per-worker', type=int, default=2)
+        parser.add_argument('--start', type=int, default=0, help='Offset for generated phone numbers')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--batch-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        batch_size = options['batch_size']
+        today = timezone.localdate()
+        first_day = today - timedelta(days=365 * options['years'])
+        statuses, weights = zip(*ATTENDANCE_WEIGHTS.items())
+        User = get_user_model()
+
+        with transaction.atomic():
+            phones = [f'+9170{options["start"] + i:08d}' for i in range(options['users'])]
+            User.objects.bulk_create(
+                [User(phone_number=phone, full_name=f'Employer {i}') for i, phone in enumerate(phones)],
+                batch_size=batch_size,
+                ignore_conflicts=True
+            )
+            users = list(User.objects.filter(phone_number__in=phones))
+
+            workers, assignments = [], []
+            for user in users:
+                for _ in range(options['workers_per_user']):
+                    n = len(workers) + options['start'] * options['workers_per_user']
+                    city, state = rng.choice(CITIES)
+                    worker = Worker(
+                        full_name=f'{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}',
+                        phone_number=f'98{n:08d}',
+                        emergency_contact=f'97{n:08d}',
+                        id_type='AADHAR',
+                        id_number=f'{n:012d}',
+                        address=f'{rng.randint(1, 999)} Main Road',
+                        city=city,
+                        state=state,
+                        gender=rng.choice('MF')
+                    )
+                    workers.append(worker)
+                    assignments.append(WorkerAssignment(
+                        worker=worker,
+                        user=user,
+                        job_type=rng.choice(WorkerAssignment.JOB_TYPES)[0],
+                        monthly_salary=rng.choice(SALARIES),
+                        shift_start=time(8),
+                        shift_end=time(12),
+                        start_date=first_day
+                    ))
+
+            # Payments on the first of each month, with loans repaid from
+            # them at a fixed monthly deduction.
+            payments, adjustments = [], []
+            for assignment in assignments:
+                worker = assignment.worker
+                balance = Decimal('0.00')
+                loan_days = sorted(
+                    first_day + timedelta(days=rng.randrange(max((today - first_day).days, 1)))
+                    for _ in range(options['loans_per_worker'])
+                )
+                months = list(month_starts(first_day + timedelta(days=1), today))
+                for month in months + [None]:
+                    while loan_days and (month is None or loan_days[0] < month):
+                        amount = Decimal(rng.randrange(1000, 10001, 500))
+                        adjustments.append(LoanAdjustment(
+                            worker=worker, user=assignment.user, loan_amount=amount, notes='Seeded loan', created_at=at(loan_days[0], 9)
+                        ))
+                        balance += amount
+                        loan_days.pop(0)
+                    if month is None:
+                        break
+                    deduction = min(balance, MONTHLY_DEDUCTION)
+                    payment = Payment(
+                        assignment=assignment,
+                        amount=assignment.monthly_salary,
+                        actual_paid_amount=assignment.monthly_salary - deduction,
+                        payment_date=month,
+                        payroll_month=month,
+                        payment_mode=rng.choice(Payment.PAYMENT_MODES)[0],
+                        status='COMPLETED'
+                    )
+                    payments.append(payment)
+                    if deduction:
+                        adjustments.append(LoanAdjustment(
+                            worker=worker, user=assignment.user, payment=payment, deduction_amount=deduction,
+                            notes='Seeded deduction', created_at=at(month, 10)
+                        ))
+                        balance -= deduction
+                worker.loan_balance = balance
+
+            Worker.objects.bulk_create(workers, batch_size=batch_size)
+            WorkerAssignment.objects.bulk_create(assignments, batch_size=batch_size)
+            Payment.objects.bulk_create(payments, batch_size=batch_size)
+            # auto_now_add stamps every row with the insert time; restore the
+            # history order the loan ledger is folded in.
+            history = {adjustment.pk: adjustment.created_at for adjustment in adjustments}
+            LoanAdjustment.objects.bulk_create(adjustments, batch_size=batch_size)
+            for adjustment in adjustments:
+                adjustment.created_at = history[adjustment.pk]
+            LoanAdjustment.objects.bulk_update(adjustments, ['created_at'], batch_size=batch_size)
+
+            attendance = (
+                Attendance(
+                    assignment=assignment,
+                    date=first_day + timedelta(days=d),
+                    status=rng.choices(statuses, weights)[0]
+                )
+                for assignment in assignments
+                for d in range((today - first_day).days)
+            )
+            attendance_count = 0
+            for chunk in chunked(attendance, batch_size):
+                Attendance.objects.bulk_create(chunk, batch_size=batch_size)
+                attendance_count += len(chunk)
+
+            # Bulk inserts send no signals: rebuild what the handlers maintain.
+            rebuild_index()
+            user_ids = [user.pk for user in users]
+            dashboard.rebuild(user_ids)
+            versioning.bump([versioning.GLOBAL_SCOPE], ['workers'])
+            versioning.bump(user_ids, versioning.USER_COLLECTIONS)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Seeded {len(users)} users, {len(workers)} workers, {attendance_count} attendance rows, "
+            f"{len(payments)} payments and {len(adjustments)} loan adjustments"
+        ))
@@ -0,0 +1,31 @@
+# Generated by Django 5.1.5 on 2026-10-18 12:27
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('workers', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='attendance',
+            index=models.Index(fields=['date', 'id'], name='workers_att_date_945034_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='payment',
+            index=models.Index(fields=['created_at', 'id'], name='workers_pay_created_13eadf_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='worker',
+            index=models.Index(fields=['created_at', 'id'], name='workers_wor_created_9486e0_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='workerassignment',
+            index=models.Index(fields=['user', 'created_at', 'id'], name='workers_wor_user_id_2a10fc_idx'),
+        ),
+    ]
@@ -0,0 +1,74 @@
+import re
+
+from django.db import migrations
+
+# Frozen copies of the index layout in workers/utils/search.py, so this
+# migration keeps building the same index whatever that module becomes.
+SQLITE_TABLE = 'workers_worker_search'
+POSTGRES_INDEXES = {
+    'workers_worker_name_trgm': 'full_name gin_trgm_ops',
+    'workers_worker_id_number_trgm': 'id_number gin_trgm_ops',
+    'workers_worker_phone_digits_trgm': "(regexp_replace(phone_number, '\\D', '', 'g')) gin_trgm_ops",
+}
+
+
+def phone_terms(value):
+    digits = re.sub(r'\D', '', value or '')
+    terms = [digits]
+    if len(digits) > 10:
+        terms.append(digits[-10:])
+    return ' '.join(t for t in terms if t)
+
+
+def sqlite_row(worker):
+    return (
+        worker.id.int >> 65,
+        worker.id.hex,
+        worker.full_name,
+        phone_terms(worker.phone_number) + ' ' + phone_terms(worker.emergency_contact),
+        worker.id_number,
+    )
+
+
+def create_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        schema_editor.execute(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {SQLITE_TABLE} USING fts5("
+            "worker_id UNINDEXED, full_name, phone_digits, id_number, "
+            "tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3 4')"
+        )
+        Worker = apps.get_model('workers', 'Worker')
+        rows = [sqlite_row(worker) for worker in Worker.objects.all().iterator(chunk_size=2000)]
+        with schema_editor.connection.cursor() as cursor:
+            cursor.executemany(
+                f"INSERT OR REPLACE INTO {SQLITE_TABLE} "
+                "(rowid, worker_id, full_name, phone_digits, id_number) VALUES (%s, %s, %s, %s, %s)",
+                rows
+            )
+    elif vendor == 'postgresql':
+        schema_editor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+        for name, expression in POSTGRES_INDEXES.items():
+            schema_editor.execute(
+                f"CREATE INDEX IF NOT EXISTS {name} ON workers_worker USING gin ({expression})"
+            )
+
+
+def drop_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        schema_editor.execute(f"DROP TABLE IF EXISTS {SQLITE_TABLE}")
+    elif vendor == 'postgresql':
+        for name in POSTGRES_INDEXES:
+            schema_editor.execute(f"DROP INDEX IF EXISTS {name}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('workers', '0002_keyset_pagination_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
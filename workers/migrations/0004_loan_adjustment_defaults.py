@@ -0,0 +1,23 @@
+# Generated by Django 5.1.5 on 2026-10-18 12:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('workers', '0003_worker_search_index'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='loanadjustment',
+            name='deduction_amount',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=10),
+        ),
+        migrations.AlterField(
+            model_name='loanadjustment',
+            name='loan_amount',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=10),
+        ),
+    ]
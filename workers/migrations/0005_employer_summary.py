@@ -0,0 +1,28 @@
+# Generated by Django 5.1.5 on 2026-10-18 12:31
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0003_user_token_version'),
+        ('workers', '0004_loan_adjustment_defaults'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EmployerSummary',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('active_workers', models.PositiveIntegerField(default=0)),
+                ('monthly_payroll', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('month', models.DateField()),
+                ('paid_this_month', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('outstanding_loans', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.5 on 2026-10-18 12:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('workers', '0005_employer_summary'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='worker',
+            name='photo_variants',
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+    ]
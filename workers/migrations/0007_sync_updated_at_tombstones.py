@@ -0,0 +1,79 @@
+# Generated by Django 5.1.5 on 2026-10-18 12:39
+
+import django.db.models.deletion
+import django.utils.timezone
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+
+
+def backfill_updated_at(apps, schema_editor):
+    # Existing rows enter the sync change order at their creation time.
+    for name in ('WorkerAssignment', 'Attendance', 'Payment', 'LoanAdjustment'):
+        apps.get_model('workers', name).objects.update(updated_at=models.F('created_at'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('workers', '0006_worker_photo_variants'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Tombstone',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('kind', models.CharField(choices=[('assignments', 'Worker Assignment'), ('attendance', 'Attendance'), ('payments', 'Payment'), ('loan_adjustments', 'Loan Adjustment')], max_length=20)),
+                ('object_id', models.UUIDField()),
+                ('deleted_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='attendance',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name='loanadjustment',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name='payment',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name='workerassignment',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.RunPython(backfill_updated_at, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='attendance',
+            index=models.Index(fields=['updated_at', 'id'], name='workers_att_updated_5a312b_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='loanadjustment',
+            index=models.Index(fields=['updated_at', 'id'], name='workers_loa_updated_f2fdde_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='payment',
+            index=models.Index(fields=['updated_at', 'id'], name='workers_pay_updated_d6b8f3_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='workerassignment',
+            index=models.Index(fields=['user', 'updated_at', 'id'], name='workers_wor_user_id_830cb6_idx'),
+        ),
+        migrations.AddField(
+            model_name='tombstone',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='tombstone',
+            index=models.Index(fields=['user', 'deleted_at', 'id'], name='workers_tom_user_id_8c82c2_idx'),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.1.5 on 2026-10-18 12:45
+
+import django.db.models.deletion
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('workers', '0007_sync_updated_at_tombstones'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AttendanceMonthRollup',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('month', models.DateField()),
+                ('days', models.CharField(max_length=31)),
+                ('present', models.PositiveSmallIntegerField(default=0)),
+                ('absent', models.PositiveSmallIntegerField(default=0)),
+                ('half_day', models.PositiveSmallIntegerField(default=0)),
+                ('leave', models.PositiveSmallIntegerField(default=0)),
+                ('archived_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('assignment', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, to='workers.workerassignment')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['month', 'assignment'], name='workers_att_month_4d1327_idx')],
+                'unique_together': {('assignment', 'month')},
+            },
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 5.1.5 on 2026-10-18 13:19
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+
+
+def backfill_user(apps, schema_editor):
+    # Deductions belong to their payment's employer; loans given before the
+    # field existed are only attributable when the worker had one employer.
+    LoanAdjustment = apps.get_model('workers', 'LoanAdjustment')
+    WorkerAssignment = apps.get_model('workers', 'WorkerAssignment')
+    Payment = apps.get_model('workers', 'Payment')
+    LoanAdjustment.objects.filter(payment__isnull=False).update(
+        user=Subquery(Payment.objects.filter(pk=OuterRef('payment')).values('assignment__user')[:1])
+    )
+    sole = (
+        WorkerAssignment.objects.values('worker')
+        .annotate(employers=Count('user', distinct=True))
+        .filter(employers=1)
+        .values('worker')
+    )
+    LoanAdjustment.objects.filter(user__isnull=True, worker__in=sole).update(
+        user=Subquery(WorkerAssignment.objects.filter(worker=OuterRef('worker')).values('user')[:1])
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('workers', '0008_attendance_month_rollup'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='loanadjustment',
+            name='user',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.RunPython(backfill_user, migrations.RunPython.noop),
+    ]
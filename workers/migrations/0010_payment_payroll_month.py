@@ -0,0 +1,40 @@
+# Generated by Django 5.1.5 on 2026-10-18 13:30
+
+import re
+from datetime import date
+
+from django.db import migrations, models
+
+PAYROLL_NOTE = re.compile(r'^Payroll (\d{4})-(\d{2})$')
+
+
+def backfill_payroll_month(apps, schema_editor):
+    # Payroll runs noted their month as "Payroll YYYY-MM".
+    Payment = apps.get_model('workers', 'Payment')
+    batch = []
+    for payment in Payment.objects.filter(notes__startswith='Payroll ').only('id', 'notes').iterator(chunk_size=2000):
+        match = PAYROLL_NOTE.match(payment.notes)
+        if match:
+            payment.payroll_month = date(int(match[1]), int(match[2]), 1)
+            batch.append(payment)
+    Payment.objects.bulk_update(batch, ['payroll_month'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('workers', '0009_loan_adjustment_user'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='payment',
+            name='payroll_month',
+            field=models.DateField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='payment',
+            index=models.Index(fields=['assignment', 'payroll_month'], name='workers_pay_assignm_5e4ecf_idx'),
+        ),
+        migrations.RunPython(backfill_payroll_month, migrations.RunPython.noop),
+    ]
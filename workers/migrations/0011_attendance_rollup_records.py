@@ -0,0 +1,40 @@
+# Generated by Django 5.1.5 on 2026-10-18 13:32
+
+import uuid
+from datetime import timedelta
+
+from django.db import migrations, models
+
+
+def backfill_records(apps, schema_editor):
+    # The original ids of rows archived before records existed are gone;
+    # record the ids the API has been serving for them instead.
+    AttendanceMonthRollup = apps.get_model('workers', 'AttendanceMonthRollup')
+    batch = []
+    for rollup in AttendanceMonthRollup.objects.iterator(chunk_size=2000):
+        rollup.records = {
+            str(index + 1): [
+                str(uuid.uuid5(rollup.id, (rollup.month + timedelta(days=index)).isoformat())),
+                rollup.archived_at.isoformat(),
+                rollup.updated_at.isoformat(),
+            ]
+            for index, code in enumerate(rollup.days) if code != '-'
+        }
+        batch.append(rollup)
+    AttendanceMonthRollup.objects.bulk_update(batch, ['records'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('workers', '0010_payment_payroll_month'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='attendancemonthrollup',
+            name='records',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+        migrations.RunPython(backfill_records, migrations.RunPython.noop),
+    ]
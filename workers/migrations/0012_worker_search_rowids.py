@@ -0,0 +1,74 @@
+import re
+
+from django.db import migrations
+
+# Frozen copies of the index layout in workers/utils/search.py, so this
+# migration keeps building the same index whatever that module becomes.
+SQLITE_TABLE = 'workers_worker_search'
+SQLITE_ROWIDS = 'workers_worker_search_rowid'
+
+
+def phone_terms(value):
+    digits = re.sub(r'\D', '', value or '')
+    terms = [digits]
+    if len(digits) > 10:
+        terms.append(digits[-10:])
+    return ' '.join(t for t in terms if t)
+
+
+def fill_index(apps, cursor, rowid):
+    Worker = apps.get_model('workers', 'Worker')
+    cursor.execute(f"DELETE FROM {SQLITE_TABLE}")
+    cursor.executemany(
+        f"INSERT OR REPLACE INTO {SQLITE_TABLE} "
+        "(rowid, worker_id, full_name, phone_digits, id_number) VALUES (%s, %s, %s, %s, %s)",
+        [
+            (
+                rowid(worker),
+                worker.id.hex,
+                worker.full_name,
+                phone_terms(worker.phone_number) + ' ' + phone_terms(worker.emergency_contact),
+                worker.id_number,
+            )
+            for worker in Worker.objects.all().iterator(chunk_size=2000)
+        ]
+    )
+
+
+def create_rowids(apps, schema_editor):
+    # Key index rows on the full worker UUID through a rowid table; rowids
+    # taken from the top bits of the UUID could collide.
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute(
+        f"CREATE TABLE IF NOT EXISTS {SQLITE_ROWIDS} "
+        "(id INTEGER PRIMARY KEY, worker_id TEXT NOT NULL UNIQUE)"
+    )
+    Worker = apps.get_model('workers', 'Worker')
+    with schema_editor.connection.cursor() as cursor:
+        cursor.executemany(
+            f"INSERT OR IGNORE INTO {SQLITE_ROWIDS} (worker_id) VALUES (%s)",
+            [(pk.hex,) for pk in Worker.objects.values_list('id', flat=True).iterator(chunk_size=2000)]
+        )
+        cursor.execute(f"SELECT worker_id, id FROM {SQLITE_ROWIDS}")
+        rowids = dict(cursor.fetchall())
+        fill_index(apps, cursor, lambda worker: rowids[worker.id.hex])
+
+
+def drop_rowids(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute(f"DROP TABLE IF EXISTS {SQLITE_ROWIDS}")
+    with schema_editor.connection.cursor() as cursor:
+        fill_index(apps, cursor, lambda worker: worker.id.int >> 65)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('workers', '0011_attendance_rollup_records'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_rowids, drop_rowids),
+    ]
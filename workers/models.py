@@ -1,8 +1,12 @@
 import uuid
+from decimal import Decimal
 
 from django.conf import settings
 from django.contrib.auth.models import AbstractUser
-from django.db import models
+from django.db import models, transaction
+from django.db.models import F, Value
+from django.db.models.functions import Greatest
+from django.utils import timezone
 from django.core.validators import RegexValidator
 
 phone_regex = RegexValidator(
@@ -30,6 +34,7 @@ class Worker(models.Model):
     state = models.CharField(max_length=100, blank=True, null=True)
     gender = models.CharField(max_length=1, choices=GENDER_CHOICES)
     profile_photo = models.ImageField(upload_to='worker_photos/', null=True, blank=True)
+    photo_variants = models.JSONField(default=dict, blank=True, editable=False)  # Filled by utils/images.py
     is_verified = models.BooleanField(default=False)
     loan_balance = models.DecimalField(max_digits=10, decimal_places=2, default=0)
     created_at = models.DateTimeField(auto_now_add=True)
@@ -39,19 +44,30 @@ class Worker(models.Model):
         return f"{self.full_name} ({self.id_type}: {self.id_number})"
 
     def add_loan(self, amount):
-        self.loan_balance += amount
-        self.save()
+        # Single UPDATE computed by the database, so concurrent writers
+        # can't lose each other's changes; only the balance is touched.
+        Worker.objects.filter(pk=self.pk).update(
+            loan_balance=F('loan_balance') + Value(Decimal(str(amount)), output_field=models.DecimalField()),
+            updated_at=timezone.now()
+        )
+        self.refresh_from_db(fields=['loan_balance', 'updated_at'])
 
     def adjust_loan(self, amount):
-        self.loan_balance -= amount
-        self.loan_balance = max(0, self.loan_balance)  # Ensure it doesn't go negative
-        self.save()
+        Worker.objects.filter(pk=self.pk).update(
+            loan_balance=Greatest(  # Ensure it doesn't go negative
+                F('loan_balance') - Value(Decimal(str(amount)), output_field=models.DecimalField()),
+                Value(Decimal(0), output_field=models.DecimalField())
+            ),
+            updated_at=timezone.now()
+        )
+        self.refresh_from_db(fields=['loan_balance', 'updated_at'])
 
     class Meta:
         indexes = [
             models.Index(fields=['phone_number']),
             models.Index(fields=['id_type', 'id_number']),
-            models.Index(fields=['city', 'state'])
+            models.Index(fields=['city', 'state']),
+            models.Index(fields=['created_at', 'id'])
         ]
 
 
@@ -83,6 +99,7 @@ class WorkerAssignment(models.Model):
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='ACTIVE')
     duties = models.TextField(blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
         return f"{self.worker.full_name} - {self.get_job_type_display()} for {self.user.full_name}"
@@ -90,7 +107,9 @@ class WorkerAssignment(models.Model):
     class Meta:
         indexes = [
             models.Index(fields=['worker', 'user', 'status']),
-            models.Index(fields=['user', 'status'])
+            models.Index(fields=['user', 'status']),
+            models.Index(fields=['user', 'created_at', 'id']),
+            models.Index(fields=['user', 'updated_at', 'id'])
         ]
 
 
@@ -110,6 +129,7 @@ class Attendance(models.Model):
     status = models.CharField(max_length=10, choices=STATUS_CHOICES)
     notes = models.TextField(blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
         return f"{self.assignment.worker.full_name} - {self.date} - {self.get_status_display()}"
@@ -118,7 +138,41 @@ class Attendance(models.Model):
         unique_together = ['assignment', 'date']
         indexes = [
             models.Index(fields=['assignment', 'date']),
-            models.Index(fields=['date', 'status'])
+            models.Index(fields=['date', 'status']),
+            models.Index(fields=['date', 'id']),
+            models.Index(fields=['updated_at', 'id'])
+        ]
+
+
+class AttendanceMonthRollup(models.Model):
+    # Archived attendance for one assignment-month: `days` holds a status
+    # code per day of the month ('-' for no archived record), and `records`
+    # maps each archived day of the month to its row's [id, created_at,
+    # updated_at], so the rows keep their identity. Written by
+    # `archive_attendance`; rows with check-in/out times or notes stay in
+    # Attendance.
+    CODES = {'PRESENT': 'P', 'ABSENT': 'A', 'HALF_DAY': 'H', 'LEAVE': 'L'}
+    EMPTY = '-'
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    assignment = models.ForeignKey(WorkerAssignment, on_delete=models.PROTECT)
+    month = models.DateField()  # First day of the month
+    days = models.CharField(max_length=31)
+    records = models.JSONField(default=dict, blank=True)
+    present = models.PositiveSmallIntegerField(default=0)
+    absent = models.PositiveSmallIntegerField(default=0)
+    half_day = models.PositiveSmallIntegerField(default=0)
+    leave = models.PositiveSmallIntegerField(default=0)
+    archived_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.assignment_id} - {self.month:%Y-%m}: {self.days}"
+
+    class Meta:
+        unique_together = ['assignment', 'month']
+        indexes = [
+            models.Index(fields=['month', 'assignment'])
         ]
 
 
@@ -141,10 +195,14 @@ class Payment(models.Model):
     amount = models.DecimalField(max_digits=10, decimal_places=2)  # Full salary amount
     actual_paid_amount = models.DecimalField(max_digits=10, decimal_places=2)  # Amount after loan deduction
     payment_date = models.DateField()
+    # First day of the month a payroll run paid; runs skip assignments
+    # already paid for that month, whatever the payment date.
+    payroll_month = models.DateField(null=True, blank=True, editable=False)
     payment_mode = models.CharField(max_length=10, choices=PAYMENT_MODES)
     status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='PENDING')
     notes = models.TextField(blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
         return f"Payment of ₹{self.actual_paid_amount} to {self.assignment.worker.full_name} on {self.payment_date}"
@@ -157,7 +215,10 @@ class Payment(models.Model):
     class Meta:
         indexes = [
             models.Index(fields=['assignment', 'payment_date']),
-            models.Index(fields=['payment_date', 'status'])
+            models.Index(fields=['assignment', 'payroll_month']),
+            models.Index(fields=['payment_date', 'status']),
+            models.Index(fields=['created_at', 'id']),
+            models.Index(fields=['updated_at', 'id'])
         ]
 
 
@@ -165,10 +226,14 @@ class LoanAdjustment(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     payment = models.ForeignKey(Payment, on_delete=models.PROTECT, null=True, blank=True)
     worker = models.ForeignKey(Worker, on_delete=models.PROTECT)
-    loan_amount = models.DecimalField(max_digits=10, decimal_places=2)  # New loan given
-    deduction_amount = models.DecimalField(max_digits=10, decimal_places=2)  # Amount deducted from salary
+    # The employer who gave the loan or made the deduction; a worker can
+    # work for several.
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.PROTECT, null=True, blank=True)
+    loan_amount = models.DecimalField(max_digits=10, decimal_places=2, default=0)  # New loan given
+    deduction_amount = models.DecimalField(max_digits=10, decimal_places=2, default=0)  # Amount deducted from salary
     notes = models.TextField(blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
         if self.loan_amount > 0:
@@ -176,25 +241,67 @@ class LoanAdjustment(models.Model):
         return f"Loan deduction of ₹{self.deduction_amount} from {self.worker.full_name}"
 
     def save(self, *args, **kwargs):
-        is_new = self.pk is None
+        is_new = self._state.adding
 
-        if is_new:
-            # If new loan is given
-            if self.loan_amount > 0:
-                self.worker.add_loan(self.loan_amount)
+        with transaction.atomic():
+            super().save(*args, **kwargs)
 
-            # If deduction from salary
-            if self.deduction_amount > 0:
-                self.worker.adjust_loan(self.deduction_amount)
-                # Update actual paid amount in payment if payment exists
-                if self.payment:
-                    self.payment.actual_paid_amount = self.payment.amount - self.deduction_amount
-                    self.payment.save()
+            if is_new:
+                # If new loan is given
+                if self.loan_amount > 0:
+                    self.worker.add_loan(self.loan_amount)
 
-        super().save(*args, **kwargs)
+                # If deduction from salary
+                if self.deduction_amount > 0:
+                    self.worker.adjust_loan(self.deduction_amount)
+                    # Update actual paid amount in payment if payment exists
+                    if self.payment:
+                        self.payment.actual_paid_amount = self.payment.amount - self.deduction_amount
+                        self.payment.save(update_fields=['actual_paid_amount', 'updated_at'])
 
     class Meta:
         indexes = [
             models.Index(fields=['worker', 'created_at']),
-            models.Index(fields=['payment', 'worker'])
+            models.Index(fields=['payment', 'worker']),
+            models.Index(fields=['updated_at', 'id'])
+        ]
+
+
+class EmployerSummary(models.Model):
+    # Materialized dashboard totals per employer, kept current by the
+    # handlers in workers/signals.py and rebuilt by `rebuild_dashboards`.
+    user = models.OneToOneField(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, primary_key=True)
+    active_workers = models.PositiveIntegerField(default=0)  # Active assignments
+    monthly_payroll = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    month = models.DateField()  # First day of the month paid_this_month covers
+    paid_this_month = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    outstanding_loans = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Dashboard for {self.user}"
+
+
+class Tombstone(models.Model):
+    # Deleted rows, kept so offline clients can drop them on their next
+    # delta sync. Pruned by `prune_tombstones`.
+    KINDS = [
+        ('assignments', 'Worker Assignment'),
+        ('attendance', 'Attendance'),
+        ('payments', 'Payment'),
+        ('loan_adjustments', 'Loan Adjustment')
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
+    kind = models.CharField(max_length=20, choices=KINDS)
+    object_id = models.UUIDField()
+    deleted_at = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return f"Deleted {self.kind} {self.object_id}"
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'deleted_at', 'id'])
         ]
@@ -0,0 +1,131 @@
+# workers/pagination.py
+import uuid
+from datetime import date
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import CursorPagination, Cursor
+
+
+class KeysetCursorPagination(CursorPagination):
+    # Cursor pagination on a (field, id) pair. The cursor carries both values
+    # of the boundary row, so every page is a single index range scan with
+    # no OFFSET and no COUNT(*), and ties on the first field stay stable.
+    ordering = ('-created_at', '-id')
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 500
+
+    def paginate_queryset(self, queryset, request, view=None):
+        queryset = self._page_queryset(queryset, request, view)
+        if queryset is None:
+            return None
+        results = list(queryset[:self.page_size + 1])
+        extra = self.extra_rows(view, self._reverse, self.page_size + 1)
+        if extra:
+            results = sorted(results + extra, key=self._sort_key, reverse=not self._reverse)[:self.page_size + 1]
+        return self._set_page(results)
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        # Async variant for the ASGI views. extra_rows is not consulted:
+        # those views fall back to the sync path when it could add rows.
+        queryset = self._page_queryset(queryset, request, view)
+        if queryset is None:
+            return None
+        return self._set_page([row async for row in queryset[:self.page_size + 1]])
+
+    def _page_queryset(self, queryset, request, view):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self.get_ordering(request, queryset, view)
+        self.cursor = self.decode_cursor(request)
+        self._reverse = reverse = self.cursor.reverse if self.cursor else False
+
+        if reverse:
+            queryset = queryset.order_by(*[self._invert(field) for field in self.ordering])
+        else:
+            queryset = queryset.order_by(*self.ordering)
+
+        if self.cursor and self.cursor.position is not None:
+            try:
+                queryset = queryset.filter(self._keyset_filter(self.cursor.position, reverse))
+            except (ValueError, ValidationError):
+                raise NotFound(self.invalid_cursor_message)
+        return queryset
+
+    def _set_page(self, results):
+        self.page = results[:self.page_size]
+        has_following = len(results) > self.page_size
+
+        if self._reverse:
+            self.page = list(reversed(self.page))
+            self.has_next = True
+            self.has_previous = has_following
+        else:
+            self.has_next = has_following
+            self.has_previous = self.cursor is not None
+
+        return self.page
+
+    def extra_rows(self, view, reverse, limit):
+        # Rows from outside the queryset to merge into the page, in page
+        # order and after the cursor.
+        return []
+
+    def _sort_key(self, instance):
+        # Both orderings here are descending, so pages sort by this key in
+        # reverse (and ascending for a previous-page cursor).
+        return tuple(getattr(instance, field.lstrip('-')) for field in self.ordering[:2])
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        position = self._get_position_from_instance(self.page[-1], self.ordering)
+        return self.encode_cursor(Cursor(offset=0, reverse=False, position=position))
+
+    def get_previous_link(self):
+        if not self.has_previous or not self.page:
+            return None
+        position = self._get_position_from_instance(self.page[0], self.ordering)
+        return self.encode_cursor(Cursor(offset=0, reverse=True, position=position))
+
+    def _get_position_from_instance(self, instance, ordering):
+        values = []
+        for field in ordering[:2]:
+            value = getattr(instance, field.lstrip('-'))
+            values.append(value.isoformat() if hasattr(value, 'isoformat') else str(value))
+        return '|'.join(values)
+
+    def _keyset_filter(self, position, reverse):
+        value, pk = position.rsplit('|', 1)
+        field, tiebreak = [f.lstrip('-') for f in self.ordering[:2]]
+        descending = self.ordering[0].startswith('-') != reverse
+        op = 'lt' if descending else 'gt'
+        return Q(**{f'{field}__{op}': value}) | Q(**{field: value, f'{tiebreak}__{op}': pk})
+
+    @staticmethod
+    def _invert(field):
+        return field[1:] if field.startswith('-') else f'-{field}'
+
+
+class AttendanceCursorPagination(KeysetCursorPagination):
+    ordering = ('-date', '-id')
+
+    def extra_rows(self, view, reverse, limit):
+        # Archived days from the monthly rollups (see utils/rollups.py).
+        archived_rows = getattr(view, 'archived_rows', None)
+        if archived_rows is None:
+            return []
+        position = None
+        if self.cursor and self.cursor.position is not None:
+            try:
+                value, pk = self.cursor.position.rsplit('|', 1)
+                position = (date.fromisoformat(value), uuid.UUID(pk))
+            except ValueError:
+                raise NotFound(self.invalid_cursor_message)
+        return archived_rows(position, reverse, limit)
@@ -1,15 +1,85 @@
 # serializers.py
+from decimal import Decimal
+
+from django.utils import timezone
 from rest_framework import serializers
 from .models import Worker, WorkerAssignment, Attendance, Payment, LoanAdjustment
+from .utils.images import variant_urls
+from .utils.payroll import parse_month
+
+
+def _param_set(request, name):
+    value = request.query_params.get(name) if request is not None else None
+    return {f.strip() for f in value.split(',') if f.strip()} if value else None
+
+
+class SparseFieldsMixin:
+    # `?fields=a,b` keeps only those fields and `?omit=c` drops fields from
+    # GET responses. `query_paths()` maps the remaining fields to the model
+    # columns and joins they read, so views can narrow the SQL to match.
+    # Meta.sparse_sources lists the columns of fields whose source is '*'.
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        request = self.context.get('request')
+        if request is None or request.method != 'GET':
+            return
+        keep = _param_set(request, 'fields')
+        omit = _param_set(request, 'omit') or set()
+        for name in list(self.fields):
+            if (keep is not None and name not in keep) or name in omit:
+                self.fields.pop(name)
 
+    def query_paths(self):
+        # Returns (only_paths, select_related_paths), or None when a field
+        # reads something that isn't a plain column.
+        model = self.Meta.model
+        sparse_sources = getattr(self.Meta, 'sparse_sources', {})
+        only, related = {model._meta.pk.name}, set()
+        for name, field in self.fields.items():
+            if field.write_only:
+                continue
+            if field.source == '*':
+                if name not in sparse_sources:
+                    return None
+                only.update(sparse_sources[name])
+                continue
+            current, path = model, []
+            for position, attr in enumerate(field.source_attrs):
+                if attr.startswith('get_') and attr.endswith('_display'):
+                    attr = attr[len('get_'):-len('_display')]
+                try:
+                    model_field = current._meta.get_field(attr)
+                except Exception:
+                    return None
+                if not model_field.concrete:
+                    return None
+                path.append(model_field.name)
+                if not model_field.is_relation or position == len(field.source_attrs) - 1:
+                    break
+                related.add('__'.join(path))
+                current = model_field.related_model
+            only.add('__'.join(path))
+        return only | related, related
+
+
+class WorkerSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    profile_photo_variants = serializers.SerializerMethodField()
 
-class WorkerSerializer(serializers.ModelSerializer):
     class Meta:
         model = Worker
-        fields = '__all__'
+        exclude = ('photo_variants',)
         read_only_fields = ('id', 'created_at', 'updated_at', 'loan_balance')
+        sparse_sources = {'profile_photo_variants': ['photo_variants']}
 
-class WorkerAssignmentSerializer(serializers.ModelSerializer):
+    def get_profile_photo_variants(self, obj):
+        # Resized JPEG/WebP copies, available once the photo is processed.
+        request = self.context.get('request')
+        urls = variant_urls(obj)
+        if request is not None:
+            urls = {key: request.build_absolute_uri(url) for key, url in urls.items()}
+        return urls
+
+class WorkerAssignmentSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     worker_name = serializers.CharField(source='worker.full_name', read_only=True)
     job_type_display = serializers.CharField(source='get_job_type_display', read_only=True)
 
@@ -19,7 +89,7 @@ class WorkerAssignmentSerializer(serializers.ModelSerializer):
         read_only_fields = ('id', 'created_at')
 
 
-class AttendanceSerializer(serializers.ModelSerializer):
+class AttendanceSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     worker_name = serializers.CharField(source='assignment.worker.full_name', read_only=True)
     job_type = serializers.CharField(source='assignment.get_job_type_display', read_only=True)
 
@@ -29,7 +99,16 @@ class AttendanceSerializer(serializers.ModelSerializer):
         read_only_fields = ('id', 'created_at')
 
 
-class PaymentSerializer(serializers.ModelSerializer):
+class AttendanceBulkItemSerializer(serializers.Serializer):
+    assignment = serializers.UUIDField()
+    date = serializers.DateField()
+    check_in = serializers.TimeField(required=False, allow_null=True)
+    check_out = serializers.TimeField(required=False, allow_null=True)
+    status = serializers.ChoiceField(choices=Attendance.STATUS_CHOICES)
+    notes = serializers.CharField(required=False, allow_blank=True, default='')
+
+
+class PaymentSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     worker_name = serializers.CharField(source='assignment.worker.full_name', read_only=True)
 
     class Meta:
@@ -38,10 +117,46 @@ class PaymentSerializer(serializers.ModelSerializer):
         read_only_fields = ('id', 'created_at')
 
 
-class LoanAdjustmentSerializer(serializers.ModelSerializer):
+class LoanAdjustmentSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     worker_name = serializers.CharField(source='worker.full_name', read_only=True)
 
     class Meta:
         model = LoanAdjustment
         fields = '__all__'
-        read_only_fields = ('id', 'created_at')
\ No newline at end of file
+        read_only_fields = ('id', 'user', 'created_at')
+
+
+class AddLoanSerializer(serializers.Serializer):
+    amount = serializers.DecimalField(max_digits=10, decimal_places=2, min_value=Decimal('0.01'))
+    notes = serializers.CharField(required=False, allow_blank=True, default='')
+
+
+class PayrollRunSerializer(serializers.Serializer):
+    month = serializers.RegexField(r'^\d{4}-(0[1-9]|1[0-2])$')
+    dry_run = serializers.BooleanField(default=False)
+    payment_date = serializers.DateField(required=False)
+    payment_mode = serializers.ChoiceField(choices=Payment.PAYMENT_MODES, default='CASH')
+    status = serializers.ChoiceField(choices=Payment.STATUS_CHOICES, default='PENDING')
+    deduct_loans = serializers.BooleanField(default=True)
+
+    def validate(self, attrs):
+        month_start, month_end = parse_month(attrs['month'])
+        payment_date = attrs.get('payment_date')
+        if payment_date is not None and not month_start <= payment_date <= month_end:
+            raise serializers.ValidationError({'payment_date': ['Must fall within the payroll month.']})
+        return attrs
+
+
+class BulkPaymentItemSerializer(serializers.Serializer):
+    assignment = serializers.UUIDField()
+    amount = serializers.DecimalField(max_digits=10, decimal_places=2, min_value=Decimal('0.01'))
+    deduction = serializers.DecimalField(max_digits=10, decimal_places=2, min_value=Decimal('0'), default=Decimal('0'))
+    payment_mode = serializers.ChoiceField(choices=Payment.PAYMENT_MODES, default='CASH')
+    payment_date = serializers.DateField(default=timezone.localdate)
+    status = serializers.ChoiceField(choices=Payment.STATUS_CHOICES, default='PENDING')
+    notes = serializers.CharField(required=False, allow_blank=True, default='')
+
+    def validate(self, data):
+        if data['deduction'] > data['amount']:
+            raise serializers.ValidationError({'deduction': ['Deduction cannot exceed the amount.']})
+        return data
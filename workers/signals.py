@@ -0,0 +1,207 @@
+# workers/signals.py
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.dispatch import receiver
+
+from .models import Worker, WorkerAssignment, Attendance, Payment, LoanAdjustment
+from .utils import dashboard, rollups, search, sync, versioning
+from .utils.attendance import invalidate_summaries
+from .utils.images import schedule_photo_processing
+
+
+def assignment_user_id(instance):
+    # Employer of an attendance row or payment, looked up once per instance
+    # however many handlers need it.
+    cached = getattr(instance, '_assignment_user', None)
+    if cached is None or cached[0] != instance.assignment_id:
+        user_id = (
+            WorkerAssignment.objects.filter(pk=instance.assignment_id).values_list('user_id', flat=True).first()
+        )
+        cached = instance._assignment_user = (instance.assignment_id, user_id)
+    return cached[1]
+
+
+@receiver(post_save, sender=Worker)
+def index_worker(sender, instance, **kwargs):
+    search.index_workers([instance])
+
+
+@receiver(post_save, sender=Worker)
+def process_worker_photo(sender, instance, **kwargs):
+    schedule_photo_processing(instance)
+
+
+@receiver(post_delete, sender=Worker)
+def unindex_worker(sender, instance, **kwargs):
+    search.remove_workers([instance.pk])
+
+
+@receiver(pre_save, sender=Attendance)
+def remember_attendance_month(sender, instance, **kwargs):
+    # An edit can move a row to another month; both summaries go stale.
+    instance._previous_date = None
+    if not instance._state.adding:
+        instance._previous_date = (
+            Attendance.objects.filter(pk=instance.pk).values_list('date', flat=True).first()
+        )
+
+
+@receiver(post_save, sender=Attendance)
+@receiver(post_delete, sender=Attendance)
+def invalidate_attendance_summary(sender, instance, **kwargs):
+    user_id = assignment_user_id(instance)
+    dates = [d for d in (instance.date, getattr(instance, '_previous_date', None)) if d]
+    invalidate_summaries(user_id, dates)
+
+
+@receiver(post_save, sender=Attendance)
+def release_archived_day(sender, instance, **kwargs):
+    rollups.release_days([(instance.assignment_id, instance.date)])
+
+
+@receiver(pre_save, sender=WorkerAssignment)
+def remember_assignment(sender, instance, **kwargs):
+    instance._previous = None
+    if not instance._state.adding:
+        instance._previous = (
+            WorkerAssignment.objects.filter(pk=instance.pk)
+            .values('user_id', 'worker_id', 'status', 'monthly_salary').first()
+        )
+
+
+@receiver(post_save, sender=WorkerAssignment)
+@receiver(post_delete, sender=WorkerAssignment)
+def update_dashboard_for_assignment(sender, instance, **kwargs):
+    deleted = 'created' not in kwargs
+    previous = getattr(instance, '_previous', None)
+    if deleted:
+        previous = {
+            'user_id': instance.user_id,
+            'worker_id': instance.worker_id,
+            'status': instance.status,
+            'monthly_salary': instance.monthly_salary,
+        }
+        count, payroll = 0, dashboard.ZERO
+    else:
+        count, payroll = dashboard.payroll_contribution(instance.status, instance.monthly_salary)
+
+    old_count, old_payroll = 0, dashboard.ZERO
+    if previous:
+        old_count, old_payroll = dashboard.payroll_contribution(previous['status'], previous['monthly_salary'])
+        if previous['user_id'] != instance.user_id:
+            dashboard.apply_delta(previous['user_id'], -old_count, -old_payroll)
+            old_count, old_payroll = 0, dashboard.ZERO
+    dashboard.apply_delta(instance.user_id, count - old_count, payroll - old_payroll)
+
+    if deleted or previous is None or any(
+        previous[field] != getattr(instance, field) for field in ('user_id', 'worker_id', 'status')
+    ):
+        dashboard.refresh_loans([instance.user_id, previous and previous['user_id']])
+
+
+@receiver(pre_save, sender=Payment)
+def remember_payment(sender, instance, **kwargs):
+    instance._previous_paid = dashboard.ZERO
+    if not instance._state.adding:
+        previous = (
+            Payment.objects.filter(pk=instance.pk)
+            .values('status', 'actual_paid_amount', 'payment_date').first()
+        )
+        if previous:
+            instance._previous_paid = dashboard.paid_contribution(**previous)
+
+
+@receiver(post_save, sender=Payment)
+@receiver(post_delete, sender=Payment)
+def update_dashboard_for_payment(sender, instance, **kwargs):
+    current = dashboard.paid_contribution(instance.status, instance.actual_paid_amount, instance.payment_date)
+    if 'created' in kwargs:
+        delta = current - getattr(instance, '_previous_paid', dashboard.ZERO)
+    else:
+        delta = -current
+    if delta:
+        user_id = assignment_user_id(instance)
+        dashboard.apply_delta(user_id, paid_this_month=delta)
+
+
+@receiver(post_save, sender=LoanAdjustment)
+def update_dashboard_for_loan(sender, instance, created, **kwargs):
+    if created:
+        dashboard.refresh_loans_for_workers([instance.worker_id])
+
+
+@receiver(post_save, sender=Worker)
+@receiver(post_delete, sender=Worker)
+def bump_worker_versions(sender, instance, **kwargs):
+    # Worker names appear in every employer's assignment, attendance and
+    # payment lists.
+    user_ids = set(
+        WorkerAssignment.objects.filter(worker=instance.pk).values_list('user_id', flat=True).distinct()
+    )
+    versioning.bump([versioning.GLOBAL_SCOPE], ['workers'])
+    versioning.bump(user_ids, versioning.USER_COLLECTIONS)
+
+
+@receiver(post_save, sender=WorkerAssignment)
+@receiver(post_delete, sender=WorkerAssignment)
+def bump_assignment_versions(sender, instance, **kwargs):
+    previous = getattr(instance, '_previous', None)
+    versioning.bump({instance.user_id, previous and previous['user_id']}, versioning.USER_COLLECTIONS)
+
+
+@receiver(post_save, sender=Attendance)
+@receiver(post_delete, sender=Attendance)
+def bump_attendance_version(sender, instance, **kwargs):
+    user_id = assignment_user_id(instance)
+    versioning.bump([user_id], ['attendance'])
+
+
+@receiver(post_save, sender=Payment)
+@receiver(post_delete, sender=Payment)
+def bump_payment_version(sender, instance, **kwargs):
+    user_id = assignment_user_id(instance)
+    versioning.bump([user_id], ['payments'])
+
+
+@receiver(post_save, sender=LoanAdjustment)
+def bump_loan_versions(sender, instance, **kwargs):
+    # The adjustment changes the worker's loan_balance with a queryset
+    # update, which sends no Worker signal.
+    versioning.bump([versioning.GLOBAL_SCOPE], ['workers'])
+
+
+@receiver(post_save, sender=WorkerAssignment)
+def record_reassignment(sender, instance, **kwargs):
+    # Moving an assignment to another employer deletes it from the old
+    # employer's point of view.
+    previous = getattr(instance, '_previous', None)
+    if previous and previous['user_id'] != instance.user_id:
+        sync.record_deletions([previous['user_id']], 'assignments', instance.pk)
+
+
+@receiver(post_delete, sender=WorkerAssignment)
+def record_assignment_deletion(sender, instance, **kwargs):
+    sync.record_deletions([instance.user_id], 'assignments', instance.pk)
+
+
+@receiver(post_save, sender=WorkerAssignment)
+@receiver(post_save, sender=Attendance)
+@receiver(post_save, sender=Payment)
+@receiver(post_save, sender=LoanAdjustment)
+def restamp_late_commit(sender, instance, **kwargs):
+    sync.restamp_on_commit(sender, [instance.pk])
+
+
+@receiver(post_delete, sender=Attendance)
+def record_attendance_deletion(sender, instance, **kwargs):
+    sync.record_deletions([assignment_user_id(instance)], 'attendance', instance.pk)
+
+
+@receiver(post_delete, sender=Payment)
+def record_payment_deletion(sender, instance, **kwargs):
+    sync.record_deletions([assignment_user_id(instance)], 'payments', instance.pk)
+
+
+@receiver(post_delete, sender=LoanAdjustment)
+def record_loan_adjustment_deletion(sender, instance, **kwargs):
+    user_ids = WorkerAssignment.objects.filter(worker=instance.worker_id).values_list('user_id', flat=True)
+    sync.record_deletions(user_ids, 'loan_adjustments', instance.pk)
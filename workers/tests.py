@@ -1,3 +1,1328 @@
-from django.test import TestCase
+import json
+import os
+import tempfile
+import threading
+import uuid
+import zipfile
+from datetime import date, time, timedelta
+from decimal import Decimal
+from io import BytesIO, StringIO
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
+from django.test import AsyncClient, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from django.utils.http import parse_http_date
+from PIL import Image
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIClient, APIRequestFactory
+
+from api.models import User
+from api.utils.auth import generate_token
+from .models import Worker, WorkerAssignment, Attendance, AttendanceMonthRollup, Payment, LoanAdjustment, Tombstone
+from .serializers import AttendanceSerializer, PaymentSerializer, WorkerAssignmentSerializer, WorkerSerializer
+from .utils import response_cache, values_serializer
+from .utils.attendance import upsert_attendance
+from .utils.export import EXPORTS, stream_csv, stream_xlsx
+from .utils.rollups import has_rollups
+from .utils.search import _like_escape
+from .utils.sync import decode_token, encode_token
+
+
+def create_worker(**fields):
+    return Worker.objects.create(**{
+        'full_name': 'Lakshmi Devi', 'phone_number': '9876543210', 'emergency_contact': '9123456780',
+        'id_type': 'AADHAR', 'id_number': '123412341234', 'address': 'Somewhere', 'gender': 'F',
+        **fields
+    })
+
+
+def create_assignment(worker, user, **fields):
+    return WorkerAssignment.objects.create(**{
+        'worker': worker, 'user': user, 'job_type': 'MAID', 'monthly_salary': Decimal('9000.00'),
+        'shift_start': time(8), 'shift_end': time(12), 'start_date': date(2024, 1, 1),
+        **fields
+    })
+
+
+class EmployerTestCase(TestCase):
+    # An employer and one worker, with a client signed in as the employer.
+    worker_fields = {}
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(phone_number='+919000000001', full_name='Employer')
+        cls.worker = create_worker(**cls.worker_fields)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+
+class QueryBudgetTests(TestCase):
+    WORKERS = 25
+    DAYS = 20
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(phone_number='+919000000001', full_name='Employer')
+        other = User.objects.create(phone_number='+919000000002', full_name='Other')
+
+        workers = Worker.objects.bulk_create([
+            Worker(
+                full_name=f'Worker {i}',
+                phone_number=f'98{i:08d}',
+                emergency_contact=f'97{i:08d}',
+                id_type='AADHAR',
+                id_number=f'{i:012d}',
+                address='Somewhere',
+                gender='F'
+            )
+            for i in range(cls.WORKERS)
+        ])
+        assignments = WorkerAssignment.objects.bulk_create([
+            WorkerAssignment(
+                worker=worker,
+                user=cls.user if i % 5 else other,
+                job_type='MAID',
+                monthly_salary=Decimal('9000.00'),
+                shift_start=time(8),
+                shift_end=time(12),
+                start_date=date(2024, 1, 1)
+            )
+            for i, worker in enumerate(workers)
+        ])
+        Attendance.objects.bulk_create([
+            Attendance(assignment=assignment, date=date(2025, 1, 1) + timedelta(days=d), status='PRESENT')
+            for assignment in assignments
+            for d in range(cls.DAYS)
+        ])
+        Payment.objects.bulk_create([
+            Payment(
+                assignment=assignment,
+                amount=Decimal('9000.00'),
+                actual_paid_amount=Decimal('9000.00'),
+                payment_date=date(2025, month, 28),
+                payment_mode='UPI'
+            )
+            for assignment in assignments
+            for month in range(1, 4)
+        ])
+        cls.assignment = assignments[1]
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        # Budgets are for a warm cache; the first list of a user checks once
+        # whether it has archived attendance.
+        has_rollups(self.user.pk)
+
+    def assertQueryBudget(self, url, budget):
+        with self.assertNumQueries(budget):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def test_worker_list(self):
+        self.assertQueryBudget('/api/worker/workers/', 1)
+
+    def test_worker_detail(self):
+        self.assertQueryBudget(f'/api/worker/workers/{self.assignment.worker_id}/', 1)
+
+    def test_assignment_list(self):
+        self.assertQueryBudget('/api/worker/assignments/', 1)
+
+    def test_assignment_detail(self):
+        self.assertQueryBudget(f'/api/worker/assignments/{self.assignment.id}/', 1)
+
+    def test_attendance_list(self):
+        self.assertQueryBudget('/api/worker/attendance/', 1)
+
+    def test_attendance_list_by_date(self):
+        self.assertQueryBudget('/api/worker/attendance/?date=2025-01-05', 1)
+
+    def test_attendance_detail(self):
+        attendance = Attendance.objects.filter(assignment=self.assignment).first()
+        self.assertQueryBudget(f'/api/worker/attendance/{attendance.id}/', 1)
+
+    def test_payment_list(self):
+        self.assertQueryBudget('/api/worker/payments/', 1)
+
+    def test_payment_detail(self):
+        payment = Payment.objects.filter(assignment=self.assignment).first()
+        self.assertQueryBudget(f'/api/worker/payments/{payment.id}/', 1)
+
+    def test_attendance_cursor_walks_every_row_once(self):
+        expected = Attendance.objects.filter(assignment__user=self.user).count()
+        seen = []
+        url = '/api/worker/attendance/?page_size=7'
+        while url:
+            with self.assertNumQueries(1):
+                response = self.client.get(url)
+            seen.extend(row['id'] for row in response.data['results'])
+            url = response.data['next']
+        self.assertEqual(len(seen), expected)
+        self.assertEqual(len(set(seen)), expected)
+
+    def test_cursor_previous_link_returns_prior_page(self):
+        first = self.client.get('/api/worker/payments/?page_size=10').data
+        second = self.client.get(first['next']).data
+        back = self.client.get(second['previous']).data
+        self.assertEqual(
+            [row['id'] for row in back['results']],
+            [row['id'] for row in first['results']]
+        )
+        self.assertNotIn('count', first)
+
+    def test_sparse_fields_narrow_response_and_sql(self):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.assertQueryBudget('/api/worker/attendance/?fields=id,date,worker_name', 1)
+        self.assertEqual(set(response.data['results'][0]), {'id', 'date', 'worker_name'})
+        sql = ctx.captured_queries[0]['sql']
+        self.assertIn('full_name', sql)
+        self.assertNotIn('check_in', sql)
+        self.assertNotIn('id_number', sql)
+
+    def test_omit_drops_fields_and_join(self):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.assertQueryBudget('/api/worker/payments/?omit=worker_name,notes', 1)
+        row = response.data['results'][0]
+        self.assertNotIn('worker_name', row)
+        self.assertIn('actual_paid_amount', row)
+        self.assertNotIn('"workers_worker"', ctx.captured_queries[0]['sql'])
+
+    def test_sparse_fields_on_detail(self):
+        response = self.assertQueryBudget(
+            f'/api/worker/workers/{self.assignment.worker_id}/?fields=full_name,profile_photo_variants', 1
+        )
+        self.assertEqual(set(response.data), {'full_name', 'profile_photo_variants'})
+
+
+class WorkerSearchTests(EmployerTestCase):
+    worker_fields = {'phone_number': '+919876543210'}
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.ravi = create_worker(
+            full_name='Ravi Kumar', phone_number='9988776655', id_type='PAN', id_number='ABCDE1234F', gender='M'
+        )
+
+    def search(self, query, **params):
+        response = self.client.get('/api/worker/workers/', {'search': query, **params})
+        self.assertEqual(response.status_code, 200)
+        return [row['full_name'] for row in response.data['results']]
+
+    def test_name_prefix(self):
+        self.assertEqual(self.search('laks'), ['Lakshmi Devi'])
+        self.assertEqual(self.search('ravi ku'), ['Ravi Kumar'])
+
+    def test_phone_digits_are_normalized(self):
+        self.assertEqual(self.search('+91 98765-43'), ['Lakshmi Devi'])
+        self.assertEqual(self.search('98765'), ['Lakshmi Devi'])
+
+    def test_id_number_and_limit(self):
+        self.assertEqual(self.search('abcde'), ['Ravi Kumar'])
+        self.assertEqual(len(self.search('912345', limit=1)), 1)
+
+    def test_index_follows_updates_and_deletes(self):
+        self.ravi.full_name = 'Ramesh Kumar'
+        self.ravi.save()
+        self.assertEqual(self.search('ravi'), [])
+        self.assertEqual(self.search('ramesh'), ['Ramesh Kumar'])
+        self.ravi.delete()
+        self.assertEqual(self.search('kumar'), [])
+
+    def test_ids_sharing_their_high_bits_get_separate_rows(self):
+        base = self.worker.id.int >> 65 << 65
+        twins = [
+            create_worker(id=uuid.UUID(int=base + low), full_name=f'Twin {low}', id_number=f'TWIN{low}')
+            for low in (1, 2)
+        ]
+        self.assertEqual(sorted(self.search('twin')), ['Twin 1', 'Twin 2'])
+        twins[0].delete()
+        self.assertEqual(self.search('twin'), ['Twin 2'])
+        self.assertEqual(self.search('laks'), ['Lakshmi Devi'])
+
+    def test_like_wildcards_are_escaped(self):
+        self.assertEqual(_like_escape('50%_a\\b'), '50\\%\\_a\\\\b')
+
+
+class LoanLedgerTests(EmployerTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.assignment = create_assignment(cls.worker, cls.user)
+
+    def test_loan_and_deduction_update_balance_in_place(self):
+        response = self.client.post(f'/api/worker/workers/{self.worker.id}/add_loan/', {'amount': 5000}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.worker.refresh_from_db()
+        self.assertEqual(self.worker.loan_balance, Decimal('5000.00'))
+
+        payment = Payment.objects.create(
+            assignment=self.assignment, amount=Decimal('9000.00'), payment_date=date(2025, 1, 31), payment_mode='CASH'
+        )
+        LoanAdjustment.objects.create(worker=self.worker, payment=payment, deduction_amount=Decimal('6000.00'))
+        self.worker.refresh_from_db()
+        payment.refresh_from_db()
+        self.assertEqual(self.worker.loan_balance, Decimal('0.00'))
+        self.assertEqual(payment.actual_paid_amount, Decimal('3000.00'))
+
+    def test_add_loan_rejects_non_positive_amounts(self):
+        for amount in (0, -500, 'abc', '0.001', '123456789012.5', 'NaN', 'Infinity'):
+            response = self.client.post(
+                f'/api/worker/workers/{self.worker.id}/add_loan/', {'amount': amount}, format='json'
+            )
+            self.assertEqual(response.status_code, 400)
+        self.assertFalse(LoanAdjustment.objects.exists())
+        self.worker.refresh_from_db()
+        self.assertEqual(self.worker.loan_balance, Decimal('0.00'))
+
+    def test_reconcile_reports_and_fixes_drift(self):
+        LoanAdjustment.objects.create(worker=self.worker, loan_amount=Decimal('1000.00'))
+        LoanAdjustment.objects.create(worker=self.worker, deduction_amount=Decimal('1500.00'))
+        LoanAdjustment.objects.create(worker=self.worker, loan_amount=Decimal('200.00'))
+        Worker.objects.filter(pk=self.worker.pk).update(loan_balance=Decimal('999.00'))
+
+        out = StringIO()
+        call_command('reconcile_loans', stdout=out)
+        self.assertIn('expected 200.00', out.getvalue())
+
+        call_command('reconcile_loans', '--fix', stdout=StringIO())
+        self.worker.refresh_from_db()
+        self.assertEqual(self.worker.loan_balance, Decimal('200.00'))
+
+    def test_bulk_payments_deduct_in_one_statement(self):
+        self.client.post(f'/api/worker/workers/{self.worker.id}/add_loan/', {'amount': 3000}, format='json')
+        entries = [
+            {'assignment': str(self.assignment.id), 'amount': '9000.00', 'deduction': '2000.00', 'payment_mode': 'UPI'},
+            {'assignment': str(self.assignment.id), 'amount': '500.00', 'deduction': '500.00'},
+        ]
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post('/api/worker/payments/bulk/', entries, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['created'], 2)
+        self.assertEqual(response.data['total_net_amount'], Decimal('7000.00'))
+        updates = [q['sql'] for q in queries.captured_queries if q['sql'].startswith('UPDATE "workers_worker"')]
+        self.assertEqual(len(updates), 1)
+
+        self.worker.refresh_from_db()
+        self.assertEqual(self.worker.loan_balance, Decimal('500.00'))
+        self.assertEqual(LoanAdjustment.objects.filter(deduction_amount__gt=0).count(), 2)
+        call_command('reconcile_loans', stdout=StringIO())
+
+    def test_bulk_payments_are_all_or_nothing(self):
+        other = User.objects.create(phone_number='+919000000002', full_name='Other')
+        foreign = create_assignment(
+            self.worker, other, job_type='COOK', monthly_salary=Decimal('5000.00'), shift_start=time(13), shift_end=time(15)
+        )
+        entries = [
+            {'assignment': str(self.assignment.id), 'amount': '9000.00'},
+            {'assignment': str(foreign.id), 'amount': '5000.00'},
+            {'assignment': str(self.assignment.id), 'amount': '100.00', 'deduction': '50.00'},
+            {'assignment': str(self.assignment.id), 'amount': '-1'},
+        ]
+        response = self.client.post('/api/worker/payments/bulk/', entries, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual([r['status'] for r in response.data['results']], ['valid', 'error', 'error', 'error'])
+        self.assertIn('assignment', response.data['results'][1]['errors'])
+        self.assertIn('deduction', response.data['results'][2]['errors'])
+        self.assertIn('amount', response.data['results'][3]['errors'])
+        self.assertFalse(Payment.objects.exists())
+
+
+class PayrollTests(EmployerTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        # 100.00 and 50.00 a day in January.
+        cls.maid = create_assignment(cls.worker, cls.user, monthly_salary=Decimal('3100.00'))
+        cls.cook = create_assignment(
+            cls.worker, cls.user, job_type='COOK', monthly_salary=Decimal('1550.00'),
+            shift_start=time(13), shift_end=time(15), start_date=date(2025, 1, 17)
+        )
+        for day, status in ((2, 'ABSENT'), (3, 'ABSENT'), (4, 'HALF_DAY'), (5, 'LEAVE'), (6, 'PRESENT')):
+            Attendance.objects.create(assignment=cls.maid, date=date(2025, 1, day), status=status)
+
+    def run_payroll(self, **data):
+        return self.client.post('/api/worker/payments/payroll-run/', {'month': '2025-01', **data}, format='json')
+
+    def test_lines_prorate_unpaid_and_partial_days(self):
+        lines = {line['job_type']: line for line in self.run_payroll(dry_run=True).data['lines']}
+        maid, cook = lines['MAID'], lines['COOK']
+        self.assertEqual((maid['absent_days'], maid['half_days'], maid['leave_days']), (2, 1, 1))
+        self.assertEqual(maid['payable_days'], Decimal('28.5'))
+        self.assertEqual(maid['amount'], Decimal('2850.00'))
+        self.assertEqual(cook['employed_days'], 15)
+        self.assertEqual(cook['amount'], Decimal('750.00'))
+
+    def test_dry_run_writes_nothing(self):
+        LoanAdjustment.objects.create(worker=self.worker, loan_amount=Decimal('1000.00'))
+        response = self.run_payroll(dry_run=True)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['payments_created'], 0)
+        self.assertEqual(response.data['total_amount'], Decimal('3600.00'))
+        self.assertEqual(response.data['total_deductions'], Decimal('1000.00'))
+        self.assertFalse(Payment.objects.exists())
+        self.assertEqual(LoanAdjustment.objects.count(), 1)
+        self.worker.refresh_from_db()
+        self.assertEqual(self.worker.loan_balance, Decimal('1000.00'))
+
+    def test_deductions_are_capped_at_the_loan_balance(self):
+        LoanAdjustment.objects.create(worker=self.worker, loan_amount=Decimal('3000.00'))
+        response = self.run_payroll()
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['payments_created'], 2)
+        # One balance across both assignments: the first line takes 2850.00,
+        # the second the remaining 150.00.
+        self.assertEqual(
+            [(line['loan_deduction'], line['net_amount']) for line in response.data['lines']],
+            [(Decimal('2850.00'), Decimal('0.00')), (Decimal('150.00'), Decimal('600.00'))]
+        )
+        self.assertEqual(response.data['total_deductions'], Decimal('3000.00'))
+        self.worker.refresh_from_db()
+        self.assertEqual(self.worker.loan_balance, Decimal('0.00'))
+        self.assertEqual(
+            sorted(Payment.objects.values_list('amount', 'actual_paid_amount')),
+            [(Decimal('750.00'), Decimal('600.00')), (Decimal('2850.00'), Decimal('0.00'))]
+        )
+        self.assertEqual(
+            LoanAdjustment.objects.filter(payment__isnull=False, user=self.user).count(), 2
+        )
+
+    def test_repeated_run_skips_paid_assignments(self):
+        self.assertEqual(self.run_payroll().status_code, 201)
+        response = self.run_payroll()
+        self.assertEqual(response.data['payments_created'], 0)
+        self.assertEqual([line['skipped'] for line in response.data['lines']], ['already_paid', 'already_paid'])
+        self.assertEqual(response.data['total_amount'], Decimal('0.00'))
+        self.assertEqual(Payment.objects.count(), 2)
+
+    def test_reruns_key_on_the_payroll_month(self):
+        # An ad-hoc payment during the month does not count as its payroll.
+        Payment.objects.create(
+            assignment=self.maid, amount=Decimal('500.00'), payment_date=date(2025, 1, 10), payment_mode='CASH'
+        )
+        response = self.run_payroll(payment_date='2025-01-31')
+        self.assertEqual(response.data['payments_created'], 2)
+        self.assertEqual(self.run_payroll(payment_date='2025-01-02').data['payments_created'], 0)
+        self.assertEqual(Payment.objects.filter(payroll_month=date(2025, 1, 1)).count(), 2)
+
+    def test_payment_date_must_fall_in_the_month(self):
+        response = self.run_payroll(payment_date='2025-02-05')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('payment_date', response.data)
+        self.assertFalse(Payment.objects.exists())
+
+    def test_invalid_month(self):
+        self.assertEqual(self.run_payroll(month='2025-13').status_code, 400)
+
+
+class AttendanceSummaryTests(EmployerTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.assignment = create_assignment(cls.worker, cls.user)
+        for day, status in enumerate(['PRESENT', 'PRESENT', 'ABSENT', 'HALF_DAY', 'LEAVE'], start=1):
+            Attendance.objects.create(assignment=cls.assignment, date=date(2025, 1, day), status=status)
+        Attendance.objects.create(assignment=cls.assignment, date=date(2025, 2, 1), status='PRESENT')
+
+    def setUp(self):
+        cache.clear()
+        super().setUp()
+
+    def summary(self, month='2025-01'):
+        response = self.client.get('/api/worker/attendance/summary/', {'month': month})
+        self.assertEqual(response.status_code, 200)
+        return response.data['assignments']
+
+    def test_counts_and_cache(self):
+        with self.assertNumQueries(1):
+            rows = self.summary()
+        self.assertEqual(
+            {k: rows[0][k] for k in ('present', 'absent', 'half_day', 'leave', 'total')},
+            {'present': 2, 'absent': 1, 'half_day': 1, 'leave': 1, 'total': 5}
+        )
+        with self.assertNumQueries(0):
+            self.summary()
+
+    def test_attendance_writes_invalidate_month(self):
+        self.summary()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post('/api/worker/attendance/bulk_create/', [
+                {'assignment': str(self.assignment.id), 'date': '2025-01-03', 'status': 'PRESENT'},
+            ], format='json')
+        self.assertEqual(self.summary()[0]['present'], 3)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Attendance.objects.get(date=date(2025, 1, 1)).delete()
+        self.assertEqual(self.summary()[0]['present'], 2)
+
+    def test_invalid_month(self):
+        response = self.client.get('/api/worker/attendance/summary/', {'month': 'January'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_bulk_create_mixed_batch(self):
+        other = User.objects.create(phone_number='+919000000002', full_name='Other')
+        foreign = create_assignment(
+            self.assignment.worker, other, job_type='COOK', monthly_salary=Decimal('5000.00'), shift_start=time(13), shift_end=time(15)
+        )
+        assignment = str(self.assignment.id)
+        response = self.client.post('/api/worker/attendance/bulk_create/', [
+            {'assignment': assignment, 'date': '2025-01-06', 'status': 'PRESENT'},
+            {'assignment': assignment, 'date': '2025-01-03', 'status': 'PRESENT', 'check_in': '08:05'},
+            {'assignment': assignment, 'date': '2025-01-07', 'status': 'ABSENT'},
+            {'assignment': str(foreign.id), 'date': '2025-01-07', 'status': 'PRESENT'},
+            {'assignment': assignment, 'date': '2025-01-08', 'status': 'SICK'},
+            {'assignment': assignment, 'date': '2025-01-07', 'status': 'LEAVE', 'notes': 'Resubmitted'},
+        ], format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [result['status'] for result in response.data['results']],
+            ['created', 'updated', 'superseded', 'error', 'error', 'created']
+        )
+        self.assertEqual(
+            {key: response.data[key] for key in ('created', 'updated', 'superseded', 'error')},
+            {'created': 2, 'updated': 1, 'superseded': 1, 'error': 2}
+        )
+        self.assertIn('assignment', response.data['results'][3]['errors'])
+        self.assertIn('status', response.data['results'][4]['errors'])
+
+        updated = Attendance.objects.get(assignment=self.assignment, date=date(2025, 1, 3))
+        self.assertEqual(response.data['results'][1]['id'], updated.id)
+        self.assertEqual((updated.status, updated.check_in), ('PRESENT', time(8, 5)))
+        resubmitted = Attendance.objects.get(assignment=self.assignment, date=date(2025, 1, 7))
+        self.assertEqual((resubmitted.status, resubmitted.notes), ('LEAVE', 'Resubmitted'))
+        self.assertFalse(Attendance.objects.filter(assignment=foreign).exists())
+        self.assertEqual(Attendance.objects.filter(assignment=self.assignment).count(), 8)
+
+    def test_bulk_create_rejects_all_invalid_batches(self):
+        response = self.client.post('/api/worker/attendance/bulk_create/', [
+            {'assignment': str(self.assignment.id), 'date': 'yesterday', 'status': 'PRESENT'},
+        ], format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['error'], 1)
+        response = self.client.post('/api/worker/attendance/bulk_create/', {'date': '2025-01-01'}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+
+class DashboardTests(EmployerTestCase):
+    def dashboard(self):
+        response = self.client.get('/api/worker/dashboard/')
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def test_totals_follow_writes_and_match_rebuild(self):
+        today = timezone.localdate()
+        with self.captureOnCommitCallbacks(execute=True):
+            assignment = create_assignment(self.worker, self.user)
+            create_assignment(
+                self.worker, self.user, job_type='COOK', monthly_salary=Decimal('6000.00'),
+                shift_start=time(13), shift_end=time(15)
+            )
+            LoanAdjustment.objects.create(worker=self.worker, loan_amount=Decimal('2000.00'))
+            payment = Payment.objects.create(
+                assignment=assignment, amount=Decimal('9000.00'), payment_date=today,
+                payment_mode='UPI', status='COMPLETED'
+            )
+            LoanAdjustment.objects.create(worker=self.worker, payment=payment, deduction_amount=Decimal('500.00'))
+
+        with self.assertNumQueries(1):
+            data = self.dashboard()
+        self.assertEqual(data['active_workers'], 2)
+        self.assertEqual(data['monthly_payroll'], Decimal('15000.00'))
+        self.assertEqual(data['amount_paid'], Decimal('8500.00'))
+        self.assertEqual(data['payroll_due'], Decimal('6500.00'))
+        self.assertEqual(data['outstanding_loans'], Decimal('1500.00'))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            assignment.status = 'TERMINATED'
+            assignment.save()
+        data = self.dashboard()
+        self.assertEqual(data['active_workers'], 1)
+        self.assertEqual(data['monthly_payroll'], Decimal('6000.00'))
+
+        call_command('rebuild_dashboards', stdout=StringIO())
+        self.assertEqual(self.dashboard(), {**data, 'updated_at': self.dashboard()['updated_at']})
+
+
+class ExportTests(EmployerTestCase):
+    worker_fields = {'full_name': 'Lakshmi, "Lucky" Devi'}
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        assignment = create_assignment(cls.worker, cls.user)
+        for month in range(1, 13):
+            Payment.objects.create(
+                assignment=assignment, amount=Decimal('9000.00'), payment_date=date(2024, month, 28),
+                payment_mode='UPI'
+            )
+
+    def test_csv_export_streams_rows(self):
+        response = self.client.get('/api/worker/exports/payments/', {'year': 2024})
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(len(lines), 13)
+        self.assertEqual(lines[1], '2024-01-28,"Lakshmi, ""Lucky"" Devi",House Maid,9000.00,9000.00,UPI,PENDING,')
+
+    def test_xlsx_export_is_a_valid_workbook(self):
+        response = self.client.get('/api/worker/exports/payments/', {'year': 2024, 'file_type': 'xlsx'})
+        self.assertEqual(response.status_code, 200)
+        archive = zipfile.ZipFile(BytesIO(b''.join(response.streaming_content)))
+        sheet = archive.read('xl/worksheets/sheet1.xml').decode()
+        self.assertEqual(sheet.count('<row>'), 13)
+        self.assertIn('Lakshmi, "Lucky" Devi', sheet)
+
+    def test_attendance_export_includes_archived_months(self):
+        assignment = WorkerAssignment.objects.get()
+        for day, status in ((3, 'ABSENT'), (1, 'PRESENT'), (2, 'LEAVE')):
+            Attendance.objects.create(assignment=assignment, date=date(2024, 1, day), status=status)
+        Attendance.objects.create(assignment=assignment, date=date(2024, 1, 4), status='PRESENT', notes='Late')
+        Attendance.objects.create(assignment=assignment, date=date(2024, 2, 1), status='HALF_DAY')
+        call_command('archive_attendance', keep_months=0, stdout=StringIO())
+        self.assertEqual(Attendance.objects.count(), 1)
+
+        response = self.client.get('/api/worker/exports/attendance/', {'year': 2024})
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual([line.split(',')[0] for line in lines[1:]], [
+            '2024-01-01', '2024-01-02', '2024-01-03', '2024-01-04', '2024-02-01'
+        ])
+        self.assertTrue(lines[2].endswith('House Maid,LEAVE,,,'))
+        self.assertTrue(lines[4].endswith('PRESENT,,,Late'))
+
+    def test_loan_export_is_limited_to_own_adjustments(self):
+        other = User.objects.create(phone_number='+919000000002', full_name='Other')
+        create_assignment(
+            self.worker, other, job_type='COOK', monthly_salary=Decimal('5000.00'), shift_start=time(13), shift_end=time(15)
+        )
+        self.client.post(f'/api/worker/workers/{self.worker.id}/add_loan/', {'amount': 1000, 'notes': 'Mine'}, format='json')
+        other_client = APIClient()
+        other_client.force_authenticate(other)
+        other_client.post(f'/api/worker/workers/{self.worker.id}/add_loan/', {'amount': 700, 'notes': 'Theirs'}, format='json')
+        self.assertEqual(LoanAdjustment.objects.filter(user=other).count(), 1)
+
+        response = self.client.get('/api/worker/exports/loans/', {'year': timezone.localdate().year})
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(len(lines), 2)
+        self.assertTrue(lines[1].endswith('1000.00,0.00,,Mine'))
+        changes = self.client.get('/api/worker/sync/').data['changes']
+        self.assertEqual([c['data']['notes'] for c in changes if c['type'] == 'loan_adjustments'], ['Mine'])
+
+    def test_formulas_are_exported_as_text(self):
+        Payment.objects.update(notes='=HYPERLINK("http://evil.example","x")')
+        Worker.objects.update(full_name='@SUM(1+1)')
+        lines = b''.join(stream_csv(*EXPORTS['payments'](self.user, date(2024, 1, 1), date(2024, 1, 31))))
+        self.assertEqual(
+            lines.decode().splitlines()[1],
+            '2024-01-28,\'@SUM(1+1),House Maid,9000.00,9000.00,UPI,PENDING,"\'=HYPERLINK(""http://evil.example"",""x"")"'
+        )
+        content = b''.join(stream_xlsx(['Amount', 'Notes'], [(Decimal('-5.00'), '-5'), (Decimal('5.00'), '+1')]))
+        sheet = zipfile.ZipFile(BytesIO(content)).read('xl/worksheets/sheet1.xml').decode()
+        self.assertIn('<c><v>-5.00</v></c><c t="inlineStr"><is><t xml:space="preserve">\'-5</t>', sheet)
+        self.assertIn('<t xml:space="preserve">\'+1</t>', sheet)
+
+    def test_unknown_export(self):
+        self.assertEqual(self.client.get('/api/worker/exports/salaries/').status_code, 404)
+
+
+class WorkerPhotoTests(EmployerTestCase):
+    def setUp(self):
+        self.media = tempfile.TemporaryDirectory()
+        self.addCleanup(self.media.cleanup)
+        override = self.settings(MEDIA_ROOT=self.media.name)
+        override.enable()
+        self.addCleanup(override.disable)
+        super().setUp()
+
+    def photo(self):
+        image = Image.new('RGB', (3000, 2000), 'orange')
+        exif = Image.Exif()
+        exif[0x0110] = 'Phone Model'
+        buffer = BytesIO()
+        image.save(buffer, 'JPEG', exif=exif)
+        return SimpleUploadedFile('photo.jpg', buffer.getvalue(), content_type='image/jpeg')
+
+    def test_upload_generates_stripped_variants(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post('/api/worker/workers/', {
+                'full_name': 'Lakshmi Devi', 'phone_number': '9876543210', 'emergency_contact': '9123456780',
+                'id_type': 'AADHAR', 'id_number': '123412341234', 'address': 'Somewhere', 'gender': 'F',
+                'profile_photo': self.photo(),
+            }, format='multipart')
+        self.assertEqual(response.status_code, 201)
+
+        data = self.client.get(f"/api/worker/workers/{response.data['id']}/").data
+        variants = data['profile_photo_variants']
+        self.assertEqual(
+            set(variants),
+            {'original', 'thumb_jpg', 'thumb_webp', 'small_jpg', 'small_webp', 'medium_jpg', 'medium_webp'}
+        )
+        worker = Worker.objects.get(pk=response.data['id'])
+        with Image.open(worker.profile_photo.path) as original:
+            self.assertEqual(max(original.size), 1600)
+            self.assertEqual(len(original.getexif()), 0)
+        with Image.open(os.path.join(self.media.name, worker.photo_variants['thumb_webp'])) as thumb:
+            self.assertEqual(thumb.format, 'WEBP')
+            self.assertEqual(max(thumb.size), 96)
+
+
+class ConditionalGetTests(EmployerTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.assignment = create_assignment(cls.worker, cls.user)
+
+    def setUp(self):
+        cache.clear()
+        super().setUp()
+
+    def test_unchanged_collection_returns_304_without_queries(self):
+        response = self.client.get('/api/worker/assignments/')
+        etag = response['ETag']
+        self.assertTrue(etag.startswith('W/"assignments-'))
+        with self.assertNumQueries(0):
+            response = self.client.get('/api/worker/assignments/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+
+    def test_query_params_change_the_etag(self):
+        first = self.client.get('/api/worker/attendance/')['ETag']
+        second = self.client.get('/api/worker/attendance/?date=2025-01-01')['ETag']
+        self.assertNotEqual(first, second)
+
+    def test_writes_bump_the_version(self):
+        etag = self.client.get('/api/worker/assignments/')['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            self.worker.full_name = 'Lakshmi D.'
+            self.worker.save()
+        response = self.client.get('/api/worker/assignments/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['results'][0]['worker_name'], 'Lakshmi D.')
+
+        etag = self.client.get('/api/worker/payments/')['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post('/api/worker/payments/payroll-run/', {'month': '2025-01'}, format='json')
+        response = self.client.get('/api/worker/payments/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['results']), 1)
+
+    def test_last_modified_revalidation(self):
+        last_modified = self.client.get('/api/worker/assignments/')['Last-Modified']
+        response = self.client.get('/api/worker/assignments/', HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, 304)
+        # A write in the same second still moves Last-Modified past it.
+        with mock.patch('time.time', return_value=parse_http_date(last_modified) + 0.5):
+            with self.captureOnCommitCallbacks(execute=True):
+                self.worker.save()
+        response = self.client.get('/api/worker/assignments/', HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, 200)
+        self.assertGreater(parse_http_date(response['Last-Modified']), parse_http_date(last_modified))
+
+
+@override_settings(RESPONSE_CACHE_TTL=60)
+class ResponseCacheTests(ConditionalGetTests):
+    def test_lists_are_served_from_cache_until_a_write(self):
+        first = self.client.get('/api/worker/assignments/')
+        with self.assertNumQueries(0):
+            cached = self.client.get('/api/worker/assignments/')
+        self.assertEqual(cached.content, first.content)
+        self.assertEqual(cached['ETag'], first['ETag'])
+        # Query params are part of the key.
+        with self.assertNumQueries(1):
+            self.client.get('/api/worker/assignments/?page_size=1')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post('/api/worker/payments/bulk/', [
+                {'assignment': str(self.assignment.id), 'amount': '100.00'}
+            ], format='json')
+        self.assertEqual(len(self.client.get('/api/worker/payments/').data['results']), 1)
+        with self.captureOnCommitCallbacks(execute=True):
+            LoanAdjustment.objects.create(
+                worker=self.worker, payment=Payment.objects.get(), deduction_amount=Decimal('0.00')
+            )
+            self.worker.full_name = 'Lakshmi D.'
+            self.worker.save()
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/worker/payments/')
+        self.assertEqual(response.data['results'][0]['worker_name'], 'Lakshmi D.')
+
+    def test_links_follow_the_requested_host(self):
+        create_assignment(
+            self.worker, self.user, job_type='COOK', monthly_salary=Decimal('5000.00'), shift_start=time(13), shift_end=time(15)
+        )
+        path = '/api/worker/assignments/?page_size=1'
+        response = self.client.get(path, HTTP_HOST='a.example.com')
+        self.assertTrue(response.data['next'].startswith('http://a.example.com/'))
+        response = self.client.get(path, HTTP_HOST='b.example.com', secure=True)
+        self.assertTrue(response.data['next'].startswith('https://b.example.com/'))
+
+    def test_one_request_rebuilds_a_hot_key(self):
+        cache.add('response:test:lock', 1)
+        calls = []
+
+        def build():
+            calls.append(1)
+            return {'results': []}
+
+        threading.Timer(0.1, cache.set, ('response:test', {'results': ['cached']})).start()
+        self.assertEqual(response_cache.fetch('response:test', build), {'results': ['cached']})
+        self.assertEqual(calls, [])
+
+        # A rebuild that outlasts the wait: build without storing.
+        cache.delete('response:test')
+        with mock.patch.object(response_cache, 'WAIT', 0.1):
+            self.assertEqual(response_cache.fetch('response:test', build), {'results': []})
+        self.assertEqual(calls, [1])
+        self.assertIsNone(cache.get('response:test'))
+
+        cache.delete('response:test:lock')
+        response_cache.fetch('response:test', build)
+        self.assertEqual(cache.get('response:test'), {'results': []})
+        self.assertIsNone(cache.get('response:test:lock'))
+
+
+class DeltaSyncTests(EmployerTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        other = User.objects.create(phone_number='+919000000002', full_name='Other')
+        cls.assignment = create_assignment(cls.worker, cls.user)
+        other_assignment = create_assignment(
+            cls.worker, other, job_type='COOK', monthly_salary=Decimal('5000.00'),
+            shift_start=time(13), shift_end=time(15)
+        )
+        for day in range(1, 6):
+            Attendance.objects.create(assignment=cls.assignment, date=date(2025, 1, day), status='PRESENT')
+            Attendance.objects.create(assignment=other_assignment, date=date(2025, 1, day), status='PRESENT')
+
+    def sync(self, since=None, page_size=None):
+        params = {}
+        if since:
+            params['since'] = since
+        if page_size:
+            params['page_size'] = page_size
+        response = self.client.get('/api/worker/sync/', params)
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def test_pages_cover_own_rows_once_in_change_order(self):
+        seen, token, pages = [], None, 0
+        while True:
+            data = self.sync(token, page_size=2)
+            seen.extend((change['type'], change['data']['id']) for change in data['changes'])
+            token, pages = data['next'], pages + 1
+            if not data['has_more']:
+                break
+        self.assertEqual(pages, 3)
+        self.assertEqual(seen[0], ('assignments', str(self.assignment.id)))
+        self.assertEqual(len(set(seen)), 6)
+        self.assertEqual(self.sync(token)['changes'], [])
+
+    def test_updates_and_deletions_since_token(self):
+        token = self.sync()['next']
+        row = Attendance.objects.filter(assignment=self.assignment).first()
+        row.status = 'ABSENT'
+        row.save()
+        deleted = Attendance.objects.filter(assignment=self.assignment).exclude(pk=row.pk).first()
+        deleted_id = deleted.id
+        deleted.delete()
+
+        data = self.sync(token)
+        self.assertEqual(
+            [(c['type'], c['op']) for c in data['changes']],
+            [('attendance', 'upsert'), ('attendance', 'delete')]
+        )
+        self.assertEqual(data['changes'][0]['data']['status'], 'ABSENT')
+        self.assertEqual(data['changes'][1]['id'], str(deleted_id))
+        self.assertEqual(self.sync(data['next'])['changes'], [])
+
+    @override_settings(SYNC_SETTLE_SECONDS=2)
+    def test_rows_of_long_transactions_are_not_skipped(self):
+        start = timezone.now() + timedelta(minutes=1)
+        with mock.patch('django.utils.timezone.now', return_value=start):
+            token = self.sync()['next']
+        row = Attendance.objects.filter(assignment=self.assignment).first()
+        # Stamped 10s before the token was handed out, committed after it.
+        with mock.patch('django.utils.timezone.now', return_value=start + timedelta(seconds=1)):
+            with self.captureOnCommitCallbacks(execute=True):
+                with mock.patch('django.utils.timezone.now', return_value=start - timedelta(seconds=10)):
+                    row.status = 'ABSENT'
+                    row.save()
+                    results = upsert_attendance(self.user, {0: {
+                        'assignment': self.assignment.id, 'date': date(2025, 1, 9), 'status': 'LEAVE'
+                    }})
+        with mock.patch('django.utils.timezone.now', return_value=start + timedelta(seconds=5)):
+            data = self.sync(token)
+        self.assertEqual(
+            {change['data']['id'] for change in data['changes']}, {str(row.id), str(results[0][1])}
+        )
+
+    def test_bad_and_expired_tokens(self):
+        response = self.client.get('/api/worker/sync/', {'since': 'garbage'})
+        self.assertEqual(response.status_code, 400)
+        stale = encode_token((timezone.now() - timedelta(days=365), 0, self.assignment.id))
+        response = self.client.get('/api/worker/sync/', {'since': stale})
+        self.assertEqual(response.status_code, 410)
+        self.assertTrue(response.data['reset'])
+
+    def test_idle_account_token_stays_fresh(self):
+        token = self.sync()['next']
+        later = timezone.now() + timedelta(days=20)
+        with mock.patch('django.utils.timezone.now', return_value=later):
+            token = self.sync(token)['next']
+        with mock.patch('django.utils.timezone.now', return_value=later + timedelta(days=20)):
+            data = self.sync(token)
+        self.assertEqual(data['changes'], [])
+        self.assertEqual(decode_token(data['next'])[0], later + timedelta(days=20))
+
+        row = Attendance.objects.filter(assignment=self.assignment).first()
+        row.status = 'ABSENT'
+        with mock.patch('django.utils.timezone.now', return_value=later + timedelta(days=21)):
+            row.save()
+            data = self.sync(data['next'])
+        self.assertEqual([c['data']['id'] for c in data['changes']], [str(row.id)])
+
+
+class SeedAndBenchmarkTests(TestCase):
+    def test_seeded_data_is_consistent_and_benchmarkable(self):
+        call_command('seed_data', users=2, workers_per_user=2, years=1, stdout=StringIO())
+        self.assertEqual(WorkerAssignment.objects.count(), 4)
+        self.assertGreater(Attendance.objects.count(), 4 * 360)
+        out = StringIO()
+        call_command('reconcile_loans', stdout=out)
+        self.assertIn('match', out.getvalue())
+
+        out = StringIO()
+        call_command(
+            'benchmark_endpoints', iterations=2, warmup=0,
+            only=['workers.dashboard', 'workers.worker_add_loan', 'auth.verify_otp'], stdout=out
+        )
+        report = json.loads(out.getvalue())
+        self.assertEqual(set(report['endpoints']), {'workers.dashboard', 'workers.worker_add_loan', 'auth.verify_otp'})
+        for result in report['endpoints'].values():
+            self.assertEqual(set(result['statuses']), {'200'})
+            self.assertLessEqual(result['p50_ms'], result['p99_ms'])
+        # Benchmark writes are rolled back.
+        self.assertFalse(LoanAdjustment.objects.filter(loan_amount=500).exists())
+
+
+class AttendanceArchiveTests(EmployerTestCase):
+    STATUSES = ['PRESENT', 'PRESENT', 'ABSENT', 'HALF_DAY', 'LEAVE', 'PRESENT', 'ABSENT', 'PRESENT']
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.assignment = create_assignment(cls.worker, cls.user)
+        for day, status in enumerate(cls.STATUSES, start=1):
+            Attendance.objects.create(assignment=cls.assignment, date=date(2025, 1, day), status=status)
+        Attendance.objects.create(
+            assignment=cls.assignment, date=date(2025, 1, 20), status='PRESENT', notes='Came late'
+        )
+        Attendance.objects.create(assignment=cls.assignment, date=timezone.localdate(), status='PRESENT')
+
+    def setUp(self):
+        cache.clear()
+        super().setUp()
+
+    def archive(self):
+        call_command('archive_attendance', keep_months=0, stdout=StringIO())
+
+    def walk(self, url='/api/worker/attendance/?page_size=3'):
+        rows = []
+        while url:
+            data = self.client.get(url).data
+            rows.extend(data['results'])
+            url = data['next']
+        return rows
+
+    def summary(self):
+        cache.clear()
+        return self.client.get('/api/worker/attendance/summary/', {'month': '2025-01'}).data['assignments']
+
+    def test_archive_keeps_reads_unchanged(self):
+        before_rows, before_summary = self.walk(), self.summary()
+        self.archive()
+
+        rollup = AttendanceMonthRollup.objects.get(assignment=self.assignment, month=date(2025, 1, 1))
+        self.assertEqual(rollup.days[:9], 'PPAHLPAP-')
+        self.assertEqual((rollup.present, rollup.absent, rollup.half_day, rollup.leave), (4, 2, 1, 1))
+        # Annotated and current-month rows stay live.
+        self.assertEqual(Attendance.objects.count(), 2)
+
+        after_rows = self.walk()
+        self.assertEqual(
+            [(row['date'], row['status']) for row in after_rows],
+            [(row['date'], row['status']) for row in before_rows]
+        )
+        self.assertEqual(len({row['id'] for row in after_rows}), len(after_rows))
+        self.assertEqual(self.summary(), before_summary)
+
+        by_date = self.client.get('/api/worker/attendance/', {'date': '2025-01-03'}).data['results']
+        self.assertEqual([(row['status'], row['worker_name']) for row in by_date], [('ABSENT', 'Lakshmi Devi')])
+
+        payroll = self.client.post(
+            '/api/worker/payments/payroll-run/', {'month': '2025-01', 'dry_run': True}, format='json'
+        ).data
+        self.assertEqual(payroll['lines'][0]['absent_days'], 2)
+
+    def test_live_write_takes_over_archived_day(self):
+        archived_id = Attendance.objects.get(date=date(2025, 1, 3)).id
+        self.archive()
+        response = self.client.post('/api/worker/attendance/bulk_create/', [
+            {'assignment': str(self.assignment.id), 'date': '2025-01-03', 'status': 'PRESENT'}
+        ], format='json')
+        self.assertEqual(response.data['created'], 1)
+        rollup = AttendanceMonthRollup.objects.get(assignment=self.assignment)
+        self.assertEqual(rollup.days[2], '-')
+        self.assertEqual(rollup.absent, 1)
+        # The archived row is gone for synced clients.
+        self.assertTrue(Tombstone.objects.filter(object_id=archived_id).exists())
+
+        row = self.summary()[0]
+        self.assertEqual((row['present'], row['absent'], row['total']), (6, 1, 9))
+        dates = [row['date'] for row in self.walk()]
+        self.assertEqual(dates.count('2025-01-03'), 1)
+
+    def test_archived_rows_keep_their_ids(self):
+        before = {row['id']: row for row in self.walk()}
+        original = Attendance.objects.get(date=date(2025, 1, 3))
+        deleted = Attendance.objects.get(date=date(2025, 1, 4)).id
+        with self.captureOnCommitCallbacks(execute=True):
+            self.archive()
+        after = {row['id']: row for row in self.walk()}
+        self.assertEqual(after, before)
+
+        url = f'/api/worker/attendance/{original.id}/'
+        self.assertEqual(self.client.get(url).data['status'], 'ABSENT')
+        response = self.client.patch(url, {'status': 'LEAVE'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        restored = Attendance.objects.get(pk=original.id)
+        self.assertEqual((restored.status, restored.created_at), ('LEAVE', original.created_at))
+        rollup = AttendanceMonthRollup.objects.get(assignment=self.assignment)
+        self.assertEqual((rollup.days[2], rollup.absent), ('-', 1))
+        self.assertFalse(Tombstone.objects.exists())
+
+        self.assertEqual(self.client.delete(f'/api/worker/attendance/{deleted}/').status_code, 204)
+        self.assertEqual(self.client.get(f'/api/worker/attendance/{deleted}/').status_code, 404)
+        self.assertTrue(Tombstone.objects.filter(object_id=deleted).exists())
+        self.assertEqual(AttendanceMonthRollup.objects.get(assignment=self.assignment).days[3], '-')
+
+    def test_sync_carries_archived_rows(self):
+        ids = set(Attendance.objects.values_list('id', flat=True))
+        token = self.client.get('/api/worker/sync/').data['next']
+        with self.captureOnCommitCallbacks(execute=True):
+            self.archive()
+        changes = self.client.get('/api/worker/sync/', {'since': token}).data['changes']
+        self.assertEqual({change['op'] for change in changes}, {'upsert'})
+        self.assertEqual(len(changes), 8)
+        self.assertTrue({change['data']['id'] for change in changes} <= {str(pk) for pk in ids})
+
+        changes = self.client.get('/api/worker/sync/').data['changes']
+        synced = {change['data']['id'] for change in changes if change['type'] == 'attendance'}
+        self.assertEqual(synced, {str(pk) for pk in ids})
+
+    def test_pages_skip_no_days_past_released_rollups(self):
+        for month in range(9, 13):
+            Attendance.objects.create(assignment=self.assignment, date=date(2024, month, 5), status='PRESENT')
+        Attendance.objects.create(assignment=self.assignment, date=date(2024, 8, 5), status='LEAVE', notes='Sick')
+        expected = [row['date'] for row in self.walk()]
+        with self.captureOnCommitCallbacks(execute=True):
+            self.archive()
+        # December's only day is rewritten live and then deleted, leaving
+        # an empty rollup.
+        self.client.post('/api/worker/attendance/bulk_create/', [
+            {'assignment': str(self.assignment.id), 'date': '2024-12-05', 'status': 'ABSENT'}
+        ], format='json')
+        Attendance.objects.get(date=date(2024, 12, 5)).delete()
+        self.assertEqual(AttendanceMonthRollup.objects.get(month=date(2024, 12, 1)).days.strip('-'), '')
+        expected.remove('2024-12-05')
+        for page_size in (1, 2, 3, 5):
+            self.assertEqual(
+                [row['date'] for row in self.walk(f'/api/worker/attendance/?page_size={page_size}')], expected
+            )
+
+
+@override_settings(PERF_SERVER_TIMING=True)
+class AsyncListViewTests(EmployerTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.assignment = create_assignment(cls.worker, cls.user)
+        for day in range(1, 8):
+            Attendance.objects.create(assignment=cls.assignment, date=date(2025, 1, day), status='PRESENT')
+        for month in range(1, 4):
+            Payment.objects.create(
+                assignment=cls.assignment, amount=Decimal('9000.00'),
+                payment_date=date(2025, month, 28), payment_mode='UPI'
+            )
+
+    def setUp(self):
+        cache.clear()
+        self.token = f'Bearer {generate_token(self.user)}'
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=self.token)
+
+    def fetch(self, url, method='get', data=None, **headers):
+        kwargs = {'headers': {'Authorization': self.token, **headers}}
+        if data is not None:
+            kwargs.update(data=json.dumps(data), content_type='application/json')
+        with override_settings(ROOT_URLCONF='payrole.asgi_urls'):
+            return async_to_sync(getattr(AsyncClient(), method))(url, **kwargs)
+
+    def test_lists_match_drf_views(self):
+        urls = [
+            '/api/worker/assignments/',
+            '/api/worker/attendance/?page_size=3',
+            '/api/worker/attendance/?date=2025-01-02',
+            '/api/worker/payments/',
+        ]
+        urls.append(self.client.get(urls[1]).data['next'])
+        for url in urls:
+            expected = self.client.get(url)
+            response = self.fetch(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.content, expected.content)
+            self.assertEqual(response['ETag'], expected['ETag'])
+            self.assertIn('desc="1 queries"', response['Server-Timing'])
+
+    def test_not_modified_and_fallbacks(self):
+        etag = self.client.get('/api/worker/payments/')['ETag']
+        response = self.fetch('/api/worker/payments/', If_None_Match=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertNotIn('db;', response['Server-Timing'])
+
+        response = self.fetch('/api/worker/payments/?fields=id')
+        self.assertEqual(set(response.json()['results'][0]), {'id'})
+        self.assertEqual(self.fetch('/api/worker/payments/?cursor=nonsense').status_code, 404)
+
+        response = self.fetch('/api/worker/payments/', method='post', data={
+            'assignment': str(self.assignment.id), 'amount': '500.00', 'actual_paid_amount': '500.00',
+            'payment_date': '2025-04-28', 'payment_mode': 'CASH'
+        })
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(len(self.fetch('/api/worker/payments/').json()['results']), 4)
+
+    def test_archived_attendance_uses_sync_path(self):
+        call_command('archive_attendance', keep_months=0, stdout=StringIO())
+        expected = self.client.get('/api/worker/attendance/')
+        self.assertEqual(len(expected.data['results']), 7)
+        self.assertEqual(self.fetch('/api/worker/attendance/').content, expected.content)
+
+
+class ValuesSerializerTests(EmployerTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        maid = create_assignment(cls.worker, cls.user, monthly_salary=Decimal('9000.50'), shift_end=time(12, 30))
+        create_assignment(
+            cls.worker, cls.user, job_type='COOK', monthly_salary=Decimal('7000'),
+            shift_start=time(17), shift_end=time(19), start_date=date(2023, 1, 1),
+            end_date=date(2023, 12, 31), status='TERMINATED', duties='Dinner'
+        )
+        Attendance.objects.create(assignment=maid, date=date(2025, 1, 1), status='PRESENT',
+                                  check_in=time(8, 5), check_out=time(12), notes='On time')
+        Attendance.objects.create(assignment=maid, date=date(2025, 1, 2), status='HALF_DAY')
+        Payment.objects.create(assignment=maid, amount=Decimal('9000.50'), actual_paid_amount=Decimal('8000'),
+                               payment_date=date(2025, 1, 31), payment_mode='UPI')
+
+    def setUp(self):
+        cache.clear()
+        super().setUp()
+
+    def test_list_pages_match_the_serializers(self):
+        cases = [
+            ('/api/worker/assignments/', WorkerAssignmentSerializer,
+             WorkerAssignment.objects.order_by('-created_at', '-id')),
+            ('/api/worker/attendance/', AttendanceSerializer, Attendance.objects.order_by('-date', '-id')),
+            ('/api/worker/payments/', PaymentSerializer, Payment.objects.order_by('-created_at', '-id')),
+            ('/api/worker/payments/?fields=id,worker_name,amount', PaymentSerializer,
+             Payment.objects.order_by('-created_at', '-id')),
+        ]
+        for url, serializer_class, queryset in cases:
+            request = APIRequestFactory().get(url)
+            expected = serializer_class(queryset, many=True, context={'request': Request(request)}).data
+            response = self.client.get(url)
+            self.assertEqual(response.data['results'], expected)
+            self.assertEqual(json.loads(response.content)['results'], json.loads(JSONRenderer().render(expected)))
+
+    def test_unsupported_serializers_use_the_regular_list(self):
+        self.assertIsNone(values_serializer.plan_for(WorkerSerializer()))
+        self.assertIsNotNone(values_serializer.plan_for(AttendanceSerializer()))
+        response = self.client.get('/api/worker/workers/')
+        self.assertEqual(response.data['results'][0]['profile_photo_variants'], {})
+        response = self.client.get('/api/worker/workers/?fields=full_name,gender')
+        self.assertEqual(response.data['results'], [{'full_name': 'Lakshmi Devi', 'gender': 'F'}])
+
+    def test_benchmark_reports_identical_rows(self):
+        out = StringIO()
+        call_command('benchmark_serializers', iterations=2, stdout=out)
+        report = json.loads(out.getvalue())
+        self.assertEqual(set(report['collections']), {'assignments', 'attendance', 'payments'})
+        for result in report['collections'].values():
+            self.assertTrue(result['identical'])
+
+
+class WorkerImportTests(EmployerTestCase):
+    HEADER = ['Full Name', 'Phone Number', 'Emergency Contact', 'ID Type', 'ID Number', 'Address', 'DOB', 'Gender']
+
+    def upload(self, name, content, **data):
+        response = self.client.post(
+            '/api/worker/workers/import/', {'file': SimpleUploadedFile(name, content), **data}, format='multipart'
+        )
+        return response, json.loads(b''.join(response.streaming_content)) if response.streaming else None
+
+    def test_csv_import_creates_updates_and_reports_rows(self):
+        rows = [
+            self.HEADER,
+            ['Lakshmi D.', '9876543210', '9123456780', 'AADHAR', '123412341234', 'Somewhere', '', 'Female'],
+            ['Ravi Kumar', '+919812345678', '9123456780', 'PAN', 'ABCDE1234F', 'Elsewhere', '1990-05-01', 'm'],
+            ['', '', '', '', '', '', '', ''],
+            ['Bad Phone', 'call me', '9123456780', 'PAN', 'ZZZZZ0000Z', 'Nowhere', '', 'M'],
+            ['Ravi K.', '+919812345678', '9123456780', 'PAN', 'ABCDE1234F', 'Elsewhere', '1990-05-01', 'M'],
+        ]
+        content = '\n'.join(','.join(row) for row in rows).encode('utf-8-sig')
+        with self.captureOnCommitCallbacks(execute=True):
+            response, report = self.upload('workers.csv', content)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([(r['row'], r['status']) for r in report['results']], [
+            (2, 'updated'), (3, 'created'), (5, 'error'), (6, 'updated')
+        ])
+        self.assertIn('phone_number', report['results'][2]['errors'])
+        self.assertEqual(report['counts'], {'updated': 2, 'created': 1, 'error': 1})
+        self.assertEqual(report['last_row'], 6)
+
+        self.worker.refresh_from_db()
+        self.assertEqual(self.worker.full_name, 'Lakshmi D.')
+        ravi = Worker.objects.get(id_type='PAN', id_number='ABCDE1234F')
+        self.assertEqual((ravi.full_name, ravi.gender, ravi.dob), ('Ravi K.', 'M', date(1990, 5, 1)))
+        self.assertEqual(report['results'][1]['id'], str(ravi.id))
+        search = self.client.get('/api/worker/workers/', {'search': 'Ravi'})
+        self.assertEqual([w['id'] for w in search.data['results']], [str(ravi.id)])
+
+        # Resuming after row 4 reapplies only the rows after it.
+        response, report = self.upload('workers.csv', content, start_row=4)
+        self.assertEqual(report['counts'], {'error': 1, 'unchanged': 1})
+        self.assertEqual(Worker.objects.count(), 2)
+
+    def test_xlsx_import_resumes_from_start_row(self):
+        rows = [
+            [f'Worker {i}', 9800000000 + i, 9123456780, 'AADHAR', f'{i:012d}', 'Somewhere', 33000 + i, 'F']
+            for i in range(10)
+        ]
+        content = b''.join(stream_xlsx(self.HEADER, rows))
+        with tempfile.NamedTemporaryFile(suffix='.xlsx') as f:
+            f.write(content)
+            f.flush()
+            out, err = StringIO(), StringIO()
+            call_command('import_workers', f.name, start_row=5, batch_size=3, stdout=out, stderr=err)
+        self.assertIn('Imported workers: 6 created', out.getvalue())
+        self.assertIn('Committed through row 11', err.getvalue())
+        self.assertFalse(Worker.objects.filter(full_name='Worker 3').exists())
+        worker = Worker.objects.get(full_name='Worker 4')
+        self.assertEqual((worker.phone_number, worker.dob), ('9800000004', date(1990, 5, 11)))
+
+        response, report = self.upload('workers.xlsx', content)
+        self.assertEqual(report['counts'], {'created': 4, 'unchanged': 6})
+
+    def test_bad_files_are_rejected(self):
+        response, _ = self.upload('workers.csv', b'full_name,phone_number\nA,9876543210\n')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('id_number', response.data['error'])
+        response, _ = self.upload('workers.xlsx', b'not a workbook')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.client.post('/api/worker/workers/import/').status_code, 400)
+
+
+class AttendanceImportTests(EmployerTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        other = User.objects.create(phone_number='+919000000002', full_name='Other')
+        cls.maid = create_assignment(cls.worker, cls.user)
+        cls.cook = create_assignment(cls.worker, cls.user, job_type='COOK')
+        cls.foreign = create_assignment(cls.worker, other)
+        Attendance.objects.create(assignment=cls.maid, date=date(2024, 2, 1), status='ABSENT')
+
+    def setUp(self):
+        cache.clear()
+        super().setUp()
+
+    def grid(self, rows):
+        header = ['Assignment', 'Job Type', 'Month', *range(1, 32)]
+        return b''.join(stream_csv(header, rows))
+
+    def upload(self, content, **data):
+        response = self.client.post(
+            '/api/worker/attendance/import/',
+            {'file': SimpleUploadedFile('attendance.csv', content), **data}, format='multipart'
+        )
+        return response, json.loads(b''.join(response.streaming_content)) if response.streaming else None
+
+    def test_grid_rows_upsert_days(self):
+        content = self.grid([
+            ['lakshmi devi', 'House Maid', '2024-02', 'P', 'h', 'L', 'A', *[''] * 24, 'P'],
+            [str(self.cook.id), '', '2024-02-01', *['P'] * 29],
+            ['Lakshmi Devi', '', '2024-02', 'P'],
+            [str(self.foreign.id), '', '2024-02', 'P'],
+            ['Lakshmi Devi', 'MAID', '2024-13', 'P'],
+            ['Lakshmi Devi', 'MAID', '2024-03', 'X'],
+            ['Lakshmi Devi', 'MAID', '2024-02', '', 'P'],
+        ])
+        with self.captureOnCommitCallbacks(execute=True):
+            response, report = self.upload(content)
+        self.assertEqual(response.status_code, 200)
+        results = report['results']
+        self.assertEqual([r['status'] for r in results], ['imported', 'imported'] + ['error'] * 4 + ['imported'])
+        self.assertEqual((results[0]['created'], results[0]['updated'], results[0]['superseded']), (3, 1, 1))
+        self.assertEqual(results[1]['created'], 29)
+        self.assertIn('job_type', results[2]['errors']['assignment'][0])
+        self.assertEqual(results[3]['errors'], {'assignment': ['Assignment not found.']})
+        self.assertIn('month', results[4]['errors'])
+        self.assertEqual(set(results[5]['errors']), {'days'})
+        self.assertEqual(results[6]['created'] + results[6]['updated'], 1)
+        self.assertEqual(report['counts'], {'imported': 3, 'error': 4})
+
+        statuses = dict(Attendance.objects.filter(assignment=self.maid).values_list('date', 'status'))
+        self.assertEqual(len(statuses), 5)
+        self.assertEqual(statuses[date(2024, 2, 1)], 'PRESENT')
+        self.assertEqual(statuses[date(2024, 2, 2)], 'PRESENT')
+        self.assertEqual(statuses[date(2024, 2, 4)], 'ABSENT')
+        summary = self.client.get('/api/worker/attendance/summary/', {'month': '2024-02'}).data
+        self.assertEqual(sum(row['total'] for row in summary['assignments']), 34)
+
+    def test_reimport_keeps_times_and_notes(self):
+        Attendance.objects.filter(assignment=self.maid, date=date(2024, 2, 1)).update(
+            check_in=time(8, 5), check_out=time(12), notes='Left early'
+        )
+        response, report = self.upload(self.grid([['Lakshmi Devi', 'MAID', '2024-02', 'H']]))
+        self.assertEqual(report['results'][0]['updated'], 1)
+        day = Attendance.objects.get(assignment=self.maid, date=date(2024, 2, 1))
+        self.assertEqual(
+            (day.status, day.check_in, day.check_out, day.notes), ('HALF_DAY', time(8, 5), time(12), 'Left early')
+        )
+
+    def test_command_imports_xlsx_and_resumes(self):
+        header = ['Assignment', 'Job Type', 'Month', *range(1, 32)]
+        rows = [['Lakshmi Devi', 'COOK', f'2023-{month:02d}', *['P'] * 28] for month in range(1, 13)]
+        with tempfile.NamedTemporaryFile(suffix='.xlsx') as f:
+            f.write(b''.join(stream_xlsx(header, rows)))
+            f.flush()
+            out = StringIO()
+            call_command('import_attendance', f.name, user=self.user.phone_number, start_row=7,
+                         batch_size=4, stdout=out, stderr=StringIO())
+            self.assertIn('Imported attendance: 6 imported', out.getvalue())
+            self.assertEqual(Attendance.objects.filter(assignment=self.cook).count(), 6 * 28)
+            call_command('import_attendance', f.name, user=self.user.phone_number, stdout=out, stderr=StringIO())
+        self.assertEqual(Attendance.objects.filter(assignment=self.cook).count(), 12 * 28)
+        with self.assertRaises(CommandError):
+            call_command('import_attendance', '/nonexistent.csv', user=self.user.phone_number, stdout=out)
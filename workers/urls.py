@@ -12,5 +12,8 @@ router.register(r'payments', views.PaymentViewSet, basename='payment')
 app_name = 'workers'
 
 urlpatterns = [
+    path('dashboard/', views.DashboardView.as_view(), name='dashboard'),
+    path('exports/<str:kind>/', views.ExportView.as_view(), name='export'),
+    path('sync/', views.SyncView.as_view(), name='sync'),
     path('', include(router.urls)),
 ]
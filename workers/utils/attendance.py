@@ -0,0 +1,140 @@
+# attendance.py
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, F, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
+
+from ..models import WorkerAssignment, Attendance, AttendanceMonthRollup
+from . import rollups, sync, versioning
+from .payroll import parse_month
+
+UPSERT_FIELDS = ['check_in', 'check_out', 'status', 'notes', 'updated_at']
+BATCH_SIZE = 500
+SUMMARY_TIMEOUT = 60 * 60 * 24
+
+
+def summary_cache_key(user_id, month):
+    return f'attendance-summary:{user_id}:{month}'
+
+
+def attendance_summary(user, month):
+    # Per-assignment status counts for a month from one conditional
+    # aggregate, cached per user and month until attendance changes.
+    month_start, month_end = parse_month(month)
+    key = summary_cache_key(user.pk, month_start.strftime('%Y-%m'))
+    summary = cache.get(key)
+    if summary is not None:
+        return summary
+
+    # Archived days come from the month's rollup, in the same query.
+    in_month = Q(attendance__date__range=(month_start, month_end))
+    rollup = AttendanceMonthRollup.objects.filter(assignment=OuterRef('pk'), month=month_start).annotate(
+        days_total=F('present') + F('absent') + F('half_day') + F('leave')
+    )
+
+    def days(field, status=None):
+        live = in_month & Q(attendance__status=status) if status else in_month
+        return Count('attendance', filter=live) + Coalesce(Subquery(rollup.values(field)[:1]), 0)
+
+    rows = (
+        WorkerAssignment.objects
+        .filter(user=user)
+        .annotate(
+            present=days('present', 'PRESENT'),
+            absent=days('absent', 'ABSENT'),
+            half_day=days('half_day', 'HALF_DAY'),
+            leave=days('leave', 'LEAVE'),
+            total=days('days_total'),
+        )
+        .filter(total__gt=0)
+        .values('id', 'worker__full_name', 'job_type', 'present', 'absent', 'half_day', 'leave', 'total')
+        .order_by('worker__full_name', 'id')
+    )
+    summary = {
+        'month': month_start.strftime('%Y-%m'),
+        'assignments': [
+            {
+                'assignment': row['id'],
+                'worker_name': row['worker__full_name'],
+                'job_type': row['job_type'],
+                'present': row['present'],
+                'absent': row['absent'],
+                'half_day': row['half_day'],
+                'leave': row['leave'],
+                'total': row['total'],
+            }
+            for row in rows
+        ],
+    }
+    cache.set(key, summary, timeout=SUMMARY_TIMEOUT)
+    return summary
+
+
+def invalidate_summaries(user_id, dates):
+    # Runs after commit so a concurrent reader can't re-cache stale counts.
+    keys = {summary_cache_key(user_id, str(day)[:7]) for day in dates}
+    if keys:
+        transaction.on_commit(lambda: cache.delete_many(list(keys)))
+
+
+def owned_assignment_ids(user, assignment_ids):
+    return set(
+        WorkerAssignment.objects
+        .filter(user=user, id__in=set(assignment_ids))
+        .values_list('id', flat=True)
+    )
+
+
+def upsert_attendance(user, rows, batch_size=BATCH_SIZE, update_fields=UPSERT_FIELDS):
+    # rows: validated dicts keyed by index, for assignments owned by user;
+    # later rows for the same (assignment, date) replace earlier ones, like
+    # a re-submitted day. Existing days get only update_fields rewritten.
+    # Returns {index: ('created' | 'updated', id)}.
+    latest = {}
+    for index, row in rows.items():
+        latest[(row['assignment'], row['date'])] = index
+    if not latest:
+        return {}
+
+    assignment_ids = {key[0] for key in latest}
+    dates = {key[1] for key in latest}
+
+    with transaction.atomic():
+        existing = {
+            (assignment_id, day): pk for assignment_id, day, pk in
+            Attendance.objects
+            .filter(assignment_id__in=assignment_ids, date__in=dates)
+            .values_list('assignment_id', 'date', 'id')
+        }
+
+        objs = []
+        results = {}
+        for key, index in latest.items():
+            row = rows[index]
+            obj = Attendance(
+                assignment_id=row['assignment'],
+                date=row['date'],
+                check_in=row.get('check_in'),
+                check_out=row.get('check_out'),
+                status=row['status'],
+                notes=row.get('notes', '')
+            )
+            if key in existing:
+                obj.id = existing[key]
+                results[index] = ('updated', obj.id)
+            else:
+                results[index] = ('created', obj.id)
+            objs.append(obj)
+
+        rollups.release_days(latest.keys())
+        Attendance.objects.bulk_create(
+            objs,
+            batch_size=batch_size,
+            update_conflicts=True,
+            unique_fields=['assignment', 'date'],
+            update_fields=update_fields
+        )
+        sync.restamp_on_commit(Attendance, [obj.pk for obj in objs])
+        invalidate_summaries(user.pk, dates)
+        versioning.bump([user.pk], ['attendance'])
+    return results
@@ -0,0 +1,151 @@
+# dashboard.py
+import calendar
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Count, F, Sum, Value, DecimalField
+from django.utils import timezone
+
+from ..models import WorkerAssignment, Payment, EmployerSummary
+
+ZERO = Decimal('0.00')
+
+
+def current_month():
+    today = timezone.localdate()
+    start = today.replace(day=1)
+    return start, start.replace(day=calendar.monthrange(start.year, start.month)[1])
+
+
+def payroll_contribution(status, monthly_salary):
+    return (1, monthly_salary) if status == 'ACTIVE' else (0, ZERO)
+
+
+def paid_contribution(status, actual_paid_amount, payment_date):
+    month_start, month_end = current_month()
+    if status == 'COMPLETED' and payment_date and month_start <= payment_date <= month_end:
+        return actual_paid_amount or ZERO
+    return ZERO
+
+
+def _paid_totals(user_ids, month_start, month_end):
+    payments = Payment.objects.filter(status='COMPLETED', payment_date__range=(month_start, month_end))
+    if user_ids is not None:
+        payments = payments.filter(assignment__user__in=user_ids)
+    return {
+        row['assignment__user']: row['paid']
+        for row in payments.values('assignment__user').annotate(paid=Sum('actual_paid_amount'))
+    }
+
+
+def _loan_totals(user_ids):
+    # A worker with several active assignments for one employer counts once.
+    pairs = WorkerAssignment.objects.filter(status='ACTIVE')
+    if user_ids is not None:
+        pairs = pairs.filter(user__in=user_ids)
+    totals = {}
+    for user_id, _, loan_balance in pairs.values_list('user', 'worker', 'worker__loan_balance').distinct():
+        totals[user_id] = totals.get(user_id, ZERO) + loan_balance
+    return totals
+
+
+def compute_summaries(user_ids=None):
+    month_start, month_end = current_month()
+    assignments = WorkerAssignment.objects.filter(status='ACTIVE')
+    if user_ids is not None:
+        assignments = assignments.filter(user__in=user_ids)
+    payroll = {
+        row['user']: row
+        for row in assignments.values('user').annotate(count=Count('id'), total=Sum('monthly_salary'))
+    }
+    paid = _paid_totals(user_ids, month_start, month_end)
+    loans = _loan_totals(user_ids)
+
+    keys = set(payroll) | set(paid) | set(loans) | set(user_ids or ())
+    return [
+        EmployerSummary(
+            user_id=user_id,
+            active_workers=payroll.get(user_id, {}).get('count', 0),
+            monthly_payroll=payroll.get(user_id, {}).get('total') or ZERO,
+            month=month_start,
+            paid_this_month=paid.get(user_id) or ZERO,
+            outstanding_loans=loans.get(user_id) or ZERO,
+        )
+        for user_id in keys
+    ]
+
+
+def rebuild(user_ids=None, batch_size=1000):
+    summaries = compute_summaries(user_ids)
+    EmployerSummary.objects.bulk_create(
+        summaries,
+        batch_size=batch_size,
+        update_conflicts=True,
+        unique_fields=['user'],
+        update_fields=['active_workers', 'monthly_payroll', 'month', 'paid_this_month', 'outstanding_loans', 'updated_at']
+    )
+    return len(summaries)
+
+
+def _amount(value):
+    return Value(Decimal(str(value)), output_field=DecimalField())
+
+
+def apply_delta(user_id, active_workers=0, monthly_payroll=ZERO, paid_this_month=ZERO):
+    if user_id is None or not (active_workers or monthly_payroll or paid_this_month):
+        return
+    updated = EmployerSummary.objects.filter(user_id=user_id, month=current_month()[0]).update(
+        active_workers=F('active_workers') + active_workers,
+        monthly_payroll=F('monthly_payroll') + _amount(monthly_payroll),
+        paid_this_month=F('paid_this_month') + _amount(paid_this_month),
+        updated_at=timezone.now()
+    )
+    if not updated:
+        # Missing row or a new month started: recompute this user.
+        rebuild([user_id])
+
+
+def refresh_loans(user_ids):
+    user_ids = [pk for pk in set(user_ids) if pk is not None]
+    if not user_ids:
+        return
+    loans = _loan_totals(user_ids)
+    now = timezone.now()
+    for user_id in user_ids:
+        if not EmployerSummary.objects.filter(user_id=user_id).update(
+            outstanding_loans=loans.get(user_id, ZERO), updated_at=now
+        ):
+            rebuild([user_id])
+
+
+def refresh_loans_for_workers(worker_ids):
+    # Loan balances are per worker, so every employer with an active
+    # assignment of the worker sees the change. Runs after commit so the
+    # balance UPDATE of the same transaction is visible.
+    worker_ids = list(worker_ids)
+
+    def refresh():
+        refresh_loans(
+            WorkerAssignment.objects
+            .filter(worker__in=worker_ids, status='ACTIVE')
+            .values_list('user', flat=True)
+            .distinct()
+        )
+    transaction.on_commit(refresh)
+
+
+def get_dashboard(user):
+    month_start, _ = current_month()
+    summary = EmployerSummary.objects.filter(user=user).first()
+    if summary is None or summary.month != month_start:
+        rebuild([user.pk])
+        summary = EmployerSummary.objects.get(user=user)
+    return {
+        'active_workers': summary.active_workers,
+        'monthly_payroll': summary.monthly_payroll,
+        'month': summary.month.strftime('%Y-%m'),
+        'amount_paid': summary.paid_this_month,
+        'payroll_due': max(summary.monthly_payroll - summary.paid_this_month, ZERO),
+        'outstanding_loans': summary.outstanding_loans,
+        'updated_at': summary.updated_at,
+    }
@@ -0,0 +1,196 @@
+# export.py
+import csv
+import heapq
+import zipfile
+from datetime import date, datetime, time
+from decimal import Decimal
+from itertools import groupby
+from operator import attrgetter, itemgetter
+from xml.sax.saxutils import escape
+
+from ..models import WorkerAssignment, Attendance, AttendanceMonthRollup, Payment, LoanAdjustment
+from .rollups import expand, month_start
+
+CHUNK_SIZE = 2000
+JOB_TYPES = dict(WorkerAssignment.JOB_TYPES)
+# Spreadsheet apps run text cells starting with these as formulas.
+FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+
+
+class Echo:
+    # Write-only buffer: writers append to it and the generator drains it
+    # after every row, so nothing accumulates between yields.
+    def __init__(self):
+        self.chunks = []
+
+    def write(self, data):
+        self.chunks.append(data if isinstance(data, bytes) else data.encode('utf-8'))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b''.join(self.chunks)
+        self.chunks = []
+        return data
+
+
+def payment_rows(user, start, end):
+    header = ['Payment Date', 'Worker', 'Job Type', 'Amount', 'Paid Amount', 'Mode', 'Status', 'Notes']
+    rows = (
+        Payment.objects
+        .filter(assignment__user=user, payment_date__range=(start, end))
+        .order_by('payment_date', 'id')
+        .values_list(
+            'payment_date', 'assignment__worker__full_name', 'assignment__job_type',
+            'amount', 'actual_paid_amount', 'payment_mode', 'status', 'notes'
+        )
+        .iterator(chunk_size=CHUNK_SIZE)
+    )
+    return header, ((d, name, JOB_TYPES.get(job, job), *rest) for d, name, job, *rest in rows)
+
+
+def attendance_rows(user, start, end):
+    header = ['Date', 'Worker', 'Job Type', 'Status', 'Check In', 'Check Out', 'Notes']
+    live = (
+        Attendance.objects
+        .filter(assignment__user=user, date__range=(start, end))
+        .order_by('date', 'id')
+        .values_list(
+            'date', 'assignment__worker__full_name', 'assignment__job_type',
+            'status', 'check_in', 'check_out', 'notes'
+        )
+        .iterator(chunk_size=CHUNK_SIZE)
+    )
+    rows = heapq.merge(live, archived_attendance_rows(user, start, end), key=itemgetter(0))
+    return header, ((d, name, JOB_TYPES.get(job, job), *rest) for d, name, job, *rest in rows)
+
+
+def archived_attendance_rows(user, start, end):
+    # Days moved to monthly rollups by `archive_attendance`, in date order,
+    # one month in memory at a time.
+    rollups = (
+        AttendanceMonthRollup.objects
+        .filter(assignment__user=user, month__range=(month_start(start), end))
+        .select_related('assignment__worker')
+        .order_by('month', 'id')
+        .iterator(chunk_size=CHUNK_SIZE)
+    )
+    for _, group in groupby(rollups, key=attrgetter('month')):
+        rows = [row for rollup in group for row in expand(rollup) if start <= row.date <= end]
+        rows.sort(key=lambda row: (row.date, row.id))
+        for row in rows:
+            yield row.date, row.assignment.worker.full_name, row.assignment.job_type, row.status, None, None, ''
+
+
+def loan_rows(user, start, end):
+    header = ['Date', 'Worker', 'Loan Amount', 'Deduction Amount', 'Payment', 'Notes']
+    rows = (
+        LoanAdjustment.objects
+        .filter(user=user, created_at__date__range=(start, end))
+        .order_by('created_at', 'id')
+        .values_list('created_at', 'worker__full_name', 'loan_amount', 'deduction_amount', 'payment', 'notes')
+        .iterator(chunk_size=CHUNK_SIZE)
+    )
+    return header, rows
+
+
+EXPORTS = {
+    'payments': payment_rows,
+    'attendance': attendance_rows,
+    'loans': loan_rows,
+}
+
+
+def _text(value):
+    if value is None:
+        return ''
+    if isinstance(value, datetime):
+        return value.strftime('%Y-%m-%d %H:%M:%S')
+    if isinstance(value, (date, time)):
+        return value.isoformat()
+    if isinstance(value, str) and value.startswith(FORMULA_PREFIXES):
+        return "'" + value
+    return str(value)
+
+
+def stream_csv(header, rows):
+    buffer = Echo()
+    writer = csv.writer(buffer)
+    writer.writerow(header)
+    yield buffer.drain()
+    for row in rows:
+        writer.writerow([_text(value) for value in row])
+        yield buffer.drain()
+
+
+XLSX_PARTS = {
+    '[Content_Types].xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        '<Override PartName="/xl/worksheets/sheet1.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        '</Types>'
+    ),
+    '_rels/.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+        'Target="xl/workbook.xml"/>'
+        '</Relationships>'
+    ),
+    'xl/workbook.xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+        'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+        '<sheets><sheet name="{sheet}" sheetId="1" r:id="rId1"/></sheets>'
+        '</workbook>'
+    ),
+    'xl/_rels/workbook.xml.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+        'Target="worksheets/sheet1.xml"/>'
+        '</Relationships>'
+    ),
+}
+
+
+def _xlsx_row(values):
+    cells = []
+    for value in values:
+        if isinstance(value, (int, float, Decimal)) and not isinstance(value, bool):
+            cells.append(f'<c><v>{value}</v></c>')
+        else:
+            cells.append(f'<c t="inlineStr"><is><t xml:space="preserve">{escape(_text(value))}</t></is></c>')
+    return f'<row>{"".join(cells)}</row>'
+
+
+def stream_xlsx(header, rows, sheet='Export'):
+    # A minimal single-sheet workbook written straight into a streaming zip;
+    # zipfile falls back to data descriptors because the buffer can't seek.
+    buffer = Echo()
+    with zipfile.ZipFile(buffer, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+        for name, content in XLSX_PARTS.items():
+            archive.writestr(name, content.replace('{sheet}', escape(sheet)))
+        yield buffer.drain()
+
+        with archive.open('xl/worksheets/sheet1.xml', 'w', force_zip64=True) as part:
+            part.write(
+                b'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                b'<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>'
+            )
+            part.write(_xlsx_row(header).encode('utf-8'))
+            for count, row in enumerate(rows, start=1):
+                part.write(_xlsx_row(row).encode('utf-8'))
+                if count % 500 == 0:
+                    yield buffer.drain()
+            part.write(b'</sheetData></worksheet>')
+    yield buffer.drain()
@@ -0,0 +1,121 @@
+# images.py
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import close_old_connections, transaction
+from PIL import Image, ImageOps
+
+from ..models import Worker
+from . import versioning
+
+logger = logging.getLogger(__name__)
+
+MAX_ORIGINAL_SIZE = 1600
+VARIANT_SIZES = {
+    'thumb': 96,
+    'small': 256,
+    'medium': 640,
+}
+FORMATS = {
+    'jpg': ('JPEG', {'quality': 82, 'optimize': True, 'progressive': True}),
+    'webp': ('WEBP', {'quality': 80, 'method': 4}),
+}
+
+_executor = None
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=getattr(settings, 'WORKER_PHOTO_THREADS', 2),
+            thread_name_prefix='worker-photos'
+        )
+    return _executor
+
+
+def _encode(image, fmt):
+    name, options = FORMATS[fmt]
+    buffer = BytesIO()
+    # Saving without exif= drops EXIF (GPS, device info) from every output.
+    image.save(buffer, name, **options)
+    return ContentFile(buffer.getvalue())
+
+
+def _variant_dir(worker_id):
+    return f'worker_photos/variants/{worker_id}'
+
+
+def process_photo(worker_id):
+    worker = Worker.objects.filter(pk=worker_id).only('id', 'profile_photo', 'photo_variants').first()
+    if worker is None or not worker.profile_photo:
+        return None
+    source = worker.profile_photo.name
+    if worker.photo_variants.get('source') == source:
+        return worker.photo_variants
+
+    with default_storage.open(source, 'rb') as f:
+        image = Image.open(f)
+        image = ImageOps.exif_transpose(image)
+        image = image.convert('RGB')
+    image.thumbnail((MAX_ORIGINAL_SIZE, MAX_ORIGINAL_SIZE), Image.LANCZOS)
+
+    directory = _variant_dir(worker.pk)
+    stem = os.path.splitext(os.path.basename(source))[0]
+    optimized = default_storage.save(f'{directory}/{stem}.jpg', _encode(image, 'jpg'))
+
+    variants = {'source': optimized, 'original': optimized}
+    for label, size in VARIANT_SIZES.items():
+        variant = image.copy()
+        variant.thumbnail((size, size), Image.LANCZOS)
+        for fmt in FORMATS:
+            path = f'{directory}/{stem}_{label}.{fmt}'
+            if default_storage.exists(path):
+                default_storage.delete(path)
+            variants[f'{label}_{fmt}'] = default_storage.save(path, _encode(variant, fmt))
+
+    # Swap in the downscaled, EXIF-free original, unless another upload
+    # replaced the photo while this one was processing.
+    updated = Worker.objects.filter(pk=worker.pk, profile_photo=source).update(
+        profile_photo=optimized,
+        photo_variants=variants
+    )
+    if updated:
+        versioning.bump([versioning.GLOBAL_SCOPE], ['workers'])
+        if optimized != source:
+            default_storage.delete(source)
+    return variants
+
+
+def _run(worker_id):
+    close_old_connections()
+    try:
+        process_photo(worker_id)
+    except Exception:
+        logger.exception("Processing photo of worker %s failed", worker_id)
+    finally:
+        close_old_connections()
+
+
+def schedule_photo_processing(worker):
+    if not worker.profile_photo or worker.photo_variants.get('source') == worker.profile_photo.name:
+        return
+    worker_id = worker.pk
+    if getattr(settings, 'WORKER_PHOTO_ASYNC', True):
+        transaction.on_commit(lambda: get_executor().submit(_run, worker_id))
+    else:
+        transaction.on_commit(lambda: process_photo(worker_id))
+
+
+def variant_urls(worker):
+    variants = worker.photo_variants or {}
+    return {
+        key: default_storage.url(path)
+        for key, path in variants.items()
+        if key != 'source'
+    }
@@ -0,0 +1,426 @@
+# imports.py
+import csv
+import io
+import json
+import posixpath
+import uuid
+import zipfile
+from datetime import date, timedelta
+from decimal import Decimal, InvalidOperation
+from xml.etree import ElementTree
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.utils import timezone
+from rest_framework.utils.encoders import JSONEncoder
+
+from ..models import Worker, WorkerAssignment, AttendanceMonthRollup
+from . import search, versioning
+from .attendance import upsert_attendance
+from .payroll import parse_month
+
+BATCH_SIZE = 500
+GRID_BATCH_SIZE = 50  # Assignment-months, up to 31 days each
+XLSX_NS = '{http://schemas.openxmlformats.org/spreadsheetml/2006/main}'
+RELS_NS = '{http://schemas.openxmlformats.org/package/2006/relationships}'
+DOC_RELS_NS = '{http://schemas.openxmlformats.org/officeDocument/2006/relationships}'
+EXCEL_EPOCH = date(1899, 12, 30)
+
+WORKER_FIELDS = (
+    'full_name', 'phone_number', 'emergency_contact', 'id_type', 'id_number',
+    'address', 'dob', 'city', 'state', 'gender'
+)
+REQUIRED_WORKER_FIELDS = {'full_name', 'phone_number', 'emergency_contact', 'id_type', 'id_number', 'address', 'gender'}
+NULLABLE_WORKER_FIELDS = {'dob', 'city', 'state'}
+GENDERS = {label.lower(): code for code, label in Worker.GENDER_CHOICES}
+
+
+class InvalidFile(ValueError):
+    pass
+
+
+# Readers: each yields one list of cell strings per row, header first, and
+# holds a single row in memory at a time.
+
+def read_table(file, name):
+    raw = getattr(file, 'file', file)  # Uploaded files wrap the real one
+    if name.lower().endswith('.xlsx') or (not name.lower().endswith('.csv') and zipfile.is_zipfile(raw)):
+        raw.seek(0)
+        return read_xlsx(raw)
+    raw.seek(0)
+    return read_csv(raw)
+
+
+def read_csv(file):
+    text = io.TextIOWrapper(file, encoding='utf-8-sig', newline='')
+    try:
+        yield from csv.reader(text)
+    except (UnicodeDecodeError, csv.Error) as e:
+        raise InvalidFile(f'Unreadable CSV: {e}')
+    finally:
+        text.detach()
+
+
+def read_xlsx(file):
+    # The first worksheet, parsed incrementally; only shared strings are
+    # loaded up front. Rows the sheet leaves out come back empty so row
+    # numbers match the spreadsheet's.
+    try:
+        archive = zipfile.ZipFile(file)
+    except zipfile.BadZipFile:
+        raise InvalidFile('Not a valid XLSX workbook.')
+    with archive:
+        try:
+            shared = _shared_strings(archive)
+            part = archive.open(_first_sheet(archive))
+        except (KeyError, ElementTree.ParseError):
+            raise InvalidFile('Not a valid XLSX workbook.')
+        with part:
+            expected, sheet_data = 1, None
+            try:
+                for event, element in ElementTree.iterparse(part, events=('start', 'end')):
+                    if event == 'start':
+                        if element.tag == f'{XLSX_NS}sheetData':
+                            sheet_data = element
+                        continue
+                    if element.tag != f'{XLSX_NS}row':
+                        continue
+                    number = int(element.get('r', expected))
+                    while expected < number:
+                        yield []
+                        expected += 1
+                    yield _xlsx_cells(element, shared)
+                    expected += 1
+                    if sheet_data is not None:
+                        sheet_data.clear()
+            except ElementTree.ParseError:
+                raise InvalidFile('Not a valid XLSX workbook.')
+
+
+def _first_sheet(archive):
+    workbook = ElementTree.fromstring(archive.read('xl/workbook.xml'))
+    sheet = workbook.find(f'{XLSX_NS}sheets/{XLSX_NS}sheet')
+    rels = ElementTree.fromstring(archive.read('xl/_rels/workbook.xml.rels'))
+    for rel in rels.iter(f'{RELS_NS}Relationship'):
+        if sheet is not None and rel.get('Id') == sheet.get(f'{DOC_RELS_NS}id'):
+            target = rel.get('Target')
+            return target.lstrip('/') if target.startswith('/') else posixpath.normpath(f'xl/{target}')
+    raise KeyError('worksheet')
+
+
+def _shared_strings(archive):
+    if 'xl/sharedStrings.xml' not in archive.namelist():
+        return []
+    strings = []
+    with archive.open('xl/sharedStrings.xml') as part:
+        for _, element in ElementTree.iterparse(part):
+            if element.tag == f'{XLSX_NS}si':
+                # Rich text is split into runs; phonetic hints are not text.
+                strings.append(''.join(
+                    t.text or '' for child in element if child.tag != f'{XLSX_NS}rPh'
+                    for t in child.iter(f'{XLSX_NS}t')
+                ))
+                element.clear()
+    return strings
+
+
+def _column(reference):
+    index = 0
+    for char in reference:
+        if not char.isalpha():
+            break
+        index = index * 26 + ord(char.upper()) - ord('A') + 1
+    return index - 1
+
+
+def _number(text):
+    # Phone and ID numbers typed into Excel come back as numbers.
+    try:
+        value = Decimal(text)
+    except InvalidOperation:
+        return text
+    return str(int(value)) if value == value.to_integral_value() else str(value.normalize())
+
+
+def _xlsx_cells(row, shared):
+    values = []
+    for cell in row.iter(f'{XLSX_NS}c'):
+        if cell.get('r'):
+            values.extend([''] * (_column(cell.get('r')) - len(values)))
+        kind = cell.get('t')
+        if kind == 'inlineStr':
+            text = ''.join(t.text or '' for t in cell.iter(f'{XLSX_NS}t'))
+        else:
+            value = cell.find(f'{XLSX_NS}v')
+            text = value.text or '' if value is not None else ''
+            if kind == 's' and text:
+                text = shared[int(text)]
+            elif kind == 'b':
+                text = 'TRUE' if text == '1' else 'FALSE'
+            elif kind in (None, 'n') and text:
+                text = _number(text)
+        values.append(text)
+    return values
+
+
+def parse_date_cell(value):
+    # ISO dates, or Excel's day serials from an unformatted date cell.
+    if value.isdigit() and len(value) <= 6:
+        return EXCEL_EPOCH + timedelta(days=int(value))
+    return value
+
+
+def header_columns(header, fields, required):
+    # Maps header cells to field names ('Full Name' -> full_name); columns
+    # outside fields are ignored.
+    if not header:
+        raise InvalidFile('The file is empty.')
+    columns = [cell.strip().lower().replace(' ', '_') for cell in header]
+    columns = [column if column in fields else None for column in columns]
+    missing = sorted(set(required) - set(columns))
+    if missing:
+        raise InvalidFile(f'Missing columns: {", ".join(missing)}')
+    return columns
+
+
+def numbered_batches(rows, columns, start_row=0, batch_size=BATCH_SIZE):
+    # Data rows as (row number, {field: text}) in batches; the header is
+    # row 1. Rows up to start_row (a previous run's last_row) and blank rows
+    # are skipped.
+    batch = []
+    for number, cells in enumerate(rows, start=2):
+        if number <= start_row or not any(cell.strip() for cell in cells):
+            continue
+        batch.append((number, {
+            column: cell.strip() for column, cell in zip(columns, cells) if column is not None
+        }))
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def stream_report(batches):
+    # JSON report written as batches commit: per-row outcomes, then counts
+    # and last_row, the row to pass as start_row to resume. A file that
+    # turns out unreadable midway ends the report with `aborted`.
+    counts, last_row, aborted = {}, None, None
+    yield b'{"results": ['
+    separator = b''
+    try:
+        for results in batches:
+            for result in results:
+                yield separator + json.dumps(result, cls=JSONEncoder).encode('utf-8')
+                separator = b', '
+                counts[result['status']] = counts.get(result['status'], 0) + 1
+                last_row = result['row']
+    except InvalidFile as e:
+        aborted = str(e)
+    summary = {'counts': counts, 'last_row': last_row}
+    if aborted:
+        summary['aborted'] = aborted
+    yield b'], ' + json.dumps(summary, cls=JSONEncoder).encode('utf-8')[1:]
+
+
+# Workers
+
+def import_workers(rows, start_row=0, batch_size=BATCH_SIZE):
+    # rows: a reader's rows. Returns a generator of per-batch outcome lists;
+    # each batch is committed before it is yielded. The header is checked
+    # here, before the first batch.
+    columns = header_columns(next(rows, None), WORKER_FIELDS, REQUIRED_WORKER_FIELDS)
+    fields = [field for field in WORKER_FIELDS if field in columns]
+    return (
+        import_worker_batch(batch, fields)
+        for batch in numbered_batches(rows, columns, start_row, batch_size)
+    )
+
+
+def worker_from_row(record, fields):
+    values = {}
+    for field in fields:
+        value = record.get(field, '')
+        if field == 'gender':
+            value = GENDERS.get(value.lower(), value.upper())
+        elif field == 'dob' and value:
+            value = parse_date_cell(value)
+        values[field] = None if field in NULLABLE_WORKER_FIELDS and not value else value
+    worker = Worker(**values)
+    # Runs the model's validators, phone_regex on both numbers among them.
+    worker.clean_fields(exclude=[f.name for f in Worker._meta.fields if f.name not in fields])
+    return worker
+
+
+def import_worker_batch(batch, fields):
+    # Workers are matched on (id_type, id_number), one lookup per batch: a
+    # match is updated with the row's values, anything else is created. A
+    # later row for the same worker updates it again.
+    results, valid = {}, []
+    for number, record in batch:
+        try:
+            valid.append((number, worker_from_row(record, fields)))
+        except ValidationError as e:
+            results[number] = {'row': number, 'status': 'error', 'errors': e.message_dict}
+
+    existing = {}
+    if valid:
+        for worker in (
+            Worker.objects
+            .filter(
+                id_type__in={w.id_type for _, w in valid},
+                id_number__in={w.id_number for _, w in valid}
+            )
+            .only(*WORKER_FIELDS)
+            .order_by('created_at', 'id')
+        ):
+            existing.setdefault((worker.id_type, worker.id_number), worker)
+
+    created, updated, changed_fields = {}, {}, set()
+    for number, worker in valid:
+        key = (worker.id_type, worker.id_number)
+        current = existing.get(key)
+        if current is None:
+            existing[key] = created[key] = worker
+            results[number] = {'row': number, 'status': 'created', 'id': worker.id}
+            continue
+        changed = [field for field in fields if getattr(current, field) != getattr(worker, field)]
+        for field in changed:
+            setattr(current, field, getattr(worker, field))
+        if changed and key not in created:
+            updated[key] = current
+            changed_fields.update(changed)
+        results[number] = {'row': number, 'status': 'updated' if changed else 'unchanged', 'id': current.id}
+
+    if created or updated:
+        with transaction.atomic():
+            Worker.objects.bulk_create(created.values(), batch_size=BATCH_SIZE)
+            if updated:
+                now = timezone.now()
+                for worker in updated.values():
+                    worker.updated_at = now
+                Worker.objects.bulk_update(updated.values(), [*changed_fields, 'updated_at'], batch_size=BATCH_SIZE)
+            search.index_workers([*created.values(), *updated.values()])
+            versioning.bump([versioning.GLOBAL_SCOPE], ['workers'])
+            if updated:
+                # Renamed workers show up in their employers' lists.
+                versioning.bump(
+                    WorkerAssignment.objects
+                    .filter(worker__in=[worker.pk for worker in updated.values()])
+                    .values_list('user_id', flat=True).distinct(),
+                    versioning.USER_COLLECTIONS
+                )
+    return [results[number] for number, _ in batch]
+
+
+# Attendance
+
+GRID_DAYS = [str(day) for day in range(1, 32)]
+GRID_FIELDS = ('assignment', 'job_type', 'month', *GRID_DAYS)
+STATUS_CODES = {
+    **{code: status for status, code in AttendanceMonthRollup.CODES.items()},
+    **{status: status for status in AttendanceMonthRollup.CODES},
+}
+
+
+class AssignmentResolver:
+    # The employer's assignments, loaded once per import. A grid row names
+    # one by id or by worker name, with job_type (code or label) to pick
+    # among a worker's assignments.
+    def __init__(self, user):
+        self.by_id, self.by_name = set(), {}
+        for pk, name, job_type in (
+            WorkerAssignment.objects.filter(user=user).values_list('id', 'worker__full_name', 'job_type')
+        ):
+            self.by_id.add(pk)
+            self.by_name.setdefault(name.strip().lower(), []).append((pk, job_type))
+        self.job_types = {label.lower(): code for code, label in WorkerAssignment.JOB_TYPES}
+
+    def resolve(self, value, job_type=''):
+        try:
+            pk = uuid.UUID(value)
+        except ValueError:
+            pass
+        else:
+            if pk in self.by_id:
+                return pk
+            raise ValidationError({'assignment': ['Assignment not found.']})
+        matches = self.by_name.get(value.lower(), [])
+        if job_type:
+            job_type = self.job_types.get(job_type.lower(), job_type.upper())
+            matches = [match for match in matches if match[1] == job_type]
+        if not matches:
+            raise ValidationError({'assignment': ['Assignment not found.']})
+        if len(matches) > 1:
+            raise ValidationError({'assignment': ['The worker has several assignments; add a job_type column.']})
+        return matches[0][0]
+
+
+def import_attendance_grid(user, rows, start_row=0, batch_size=GRID_BATCH_SIZE):
+    # Month grid: one row per assignment and month (YYYY-MM), then columns
+    # 1-31 holding P, A, H or L (or the status name); blank days are left
+    # as they are. Same contract as import_workers.
+    columns = header_columns(next(rows, None), GRID_FIELDS, {'assignment', 'month'})
+    resolver = AssignmentResolver(user)
+    return (
+        import_grid_batch(user, batch, resolver)
+        for batch in numbered_batches(rows, columns, start_row, batch_size)
+    )
+
+
+def grid_days(record, resolver):
+    errors, assignment_id = {}, None
+    try:
+        assignment_id = resolver.resolve(record.get('assignment', ''), record.get('job_type', ''))
+    except ValidationError as e:
+        errors.update(e.message_dict)
+    month = parse_date_cell(record.get('month', ''))
+    if isinstance(month, date):
+        month = month.strftime('%Y-%m')
+    elif len(month) == 10:
+        month = month[:7]  # The first of the month, typed as a date
+    try:
+        month_start, month_end = parse_month(month)
+    except ValueError as e:
+        raise ValidationError({**errors, 'month': [str(e)]})
+
+    days, bad = [], []
+    for day in GRID_DAYS:
+        code = record.get(day, '')
+        if not code:
+            continue
+        status = STATUS_CODES.get(code.upper())
+        if status is None or int(day) > month_end.day:
+            bad.append(f'Day {day}: {"unknown status " + repr(code) if status is None else "not in the month"}.')
+        else:
+            days.append((month_start.replace(day=int(day)), status))
+    if bad:
+        errors['days'] = bad
+    if errors:
+        raise ValidationError(errors)
+    return assignment_id, month_start, days
+
+
+def import_grid_batch(user, batch, resolver):
+    # All the batch's days go through one upsert_attendance call, a single
+    # transaction keyed on (assignment, date).
+    results, upserts = {}, {}
+    for number, record in batch:
+        try:
+            assignment_id, month_start, days = grid_days(record, resolver)
+        except ValidationError as e:
+            results[number] = {'row': number, 'status': 'error', 'errors': e.message_dict}
+            continue
+        results[number] = {
+            'row': number, 'status': 'imported', 'assignment': assignment_id,
+            'month': month_start.strftime('%Y-%m'), 'created': 0, 'updated': 0, 'superseded': 0,
+        }
+        for day, status in days:
+            upserts[(number, day)] = {'assignment': assignment_id, 'date': day, 'status': status}
+
+    # Grids carry only statuses; times and notes on existing days stay.
+    outcomes = upsert_attendance(user, upserts, update_fields=['status', 'updated_at'])
+    for number, day in upserts:
+        outcome = outcomes.get((number, day))
+        results[number][outcome[0] if outcome else 'superseded'] += 1
+    return [results[number] for number, _ in batch]
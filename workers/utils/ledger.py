@@ -0,0 +1,91 @@
+# ledger.py
+from decimal import Decimal
+
+from django.db.models import Case, DecimalField, F, Value, When
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+from ..models import Worker, LoanAdjustment
+from . import versioning
+from .dashboard import refresh_loans_for_workers
+
+ZERO = Decimal('0.00')
+
+
+def _amount(value):
+    return Value(Decimal(str(value)), output_field=DecimalField())
+
+
+def balance_after(balance, loan_amount, deduction_amount):
+    # Same rule the database applies: loans add, deductions never take the
+    # balance below zero.
+    balance += loan_amount
+    if deduction_amount:
+        balance = max(balance - deduction_amount, ZERO)
+    return balance
+
+
+def apply_loan_deltas(deltas):
+    # deltas: {worker_id: (loan_amount, deduction_amount)}. One
+    # UPDATE ... SET loan_balance = CASE ... for the whole batch, computed by
+    # the database so concurrent writers cannot lose each other's updates.
+    if not deltas:
+        return 0
+    whens = []
+    for worker_id, (loan_amount, deduction_amount) in deltas.items():
+        expression = F('loan_balance') + _amount(loan_amount or 0)
+        if deduction_amount:
+            expression = Greatest(expression - _amount(deduction_amount), _amount(0))
+        whens.append(When(pk=worker_id, then=expression))
+    updated = Worker.objects.filter(pk__in=deltas.keys()).update(
+        loan_balance=Case(*whens, default=F('loan_balance'), output_field=DecimalField()),
+        updated_at=timezone.now()
+    )
+    refresh_loans_for_workers(deltas.keys())
+    versioning.bump([versioning.GLOBAL_SCOPE], ['workers'])
+    return updated
+
+
+def deduct_loan_balances(deductions):
+    return apply_loan_deltas({worker_id: (0, amount) for worker_id, amount in deductions.items()})
+
+
+def _expected_balances(chunk_size):
+    # Folds the adjustment history per worker, streaming in worker order.
+    history = (
+        LoanAdjustment.objects
+        .order_by('worker_id', 'created_at', 'id')
+        .values_list('worker_id', 'loan_amount', 'deduction_amount')
+        .iterator(chunk_size=chunk_size)
+    )
+    current, balance = None, ZERO
+    for worker_id, loan_amount, deduction_amount in history:
+        if worker_id != current:
+            if current is not None:
+                yield current, balance
+            current, balance = worker_id, ZERO
+        balance = balance_after(balance, loan_amount, deduction_amount)
+    if current is not None:
+        yield current, balance
+
+
+def loan_drift(chunk_size=2000):
+    # Merge-joins stored balances with balances recomputed from history,
+    # both ordered by worker id, so memory stays bounded.
+    # Yields (worker_id, stored, expected) for every mismatch.
+    expected = _expected_balances(chunk_size)
+    next_expected = next(expected, None)
+    workers = (
+        Worker.objects.order_by('id')
+        .values_list('id', 'loan_balance')
+        .iterator(chunk_size=chunk_size)
+    )
+    for worker_id, stored in workers:
+        while next_expected is not None and next_expected[0] < worker_id:
+            next_expected = next(expected, None)
+        if next_expected is not None and next_expected[0] == worker_id:
+            balance = next_expected[1]
+        else:
+            balance = ZERO
+        if stored != balance:
+            yield worker_id, stored, balance
@@ -0,0 +1,260 @@
+# payroll.py
+import calendar
+from datetime import datetime
+from decimal import Decimal, ROUND_HALF_UP
+
+from django.db import transaction
+from django.db.models import Count, Exists, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
+
+from ..models import Worker, WorkerAssignment, AttendanceMonthRollup, Payment, LoanAdjustment
+from . import dashboard, sync, versioning
+from .ledger import deduct_loan_balances
+
+CENT = Decimal('0.01')
+BATCH_SIZE = 500
+MAX_BULK_PAYMENTS = 1000
+
+
+def parse_month(value):
+    try:
+        month = datetime.strptime(value, '%Y-%m').date()
+    except (TypeError, ValueError):
+        raise ValueError("Month must be in the format 'YYYY-MM'.")
+    return month, month.replace(day=calendar.monthrange(month.year, month.month)[1])
+
+
+def payroll_assignments(user, month_start, month_end):
+    # One query: every assignment overlapping the month, its worker and its
+    # attendance counts for the month (archived days included, from the
+    # month's rollup), plus whether it was already paid.
+    in_month = Q(attendance__date__range=(month_start, month_end))
+    rollup = AttendanceMonthRollup.objects.filter(assignment=OuterRef('pk'), month=month_start)
+
+    def days(status, field):
+        return (
+            Count('attendance', filter=in_month & Q(attendance__status=status))
+            + Coalesce(Subquery(rollup.values(field)[:1]), 0)
+        )
+
+    return (
+        WorkerAssignment.objects
+        .filter(user=user, status='ACTIVE', start_date__lte=month_end)
+        .filter(Q(end_date__isnull=True) | Q(end_date__gte=month_start))
+        .select_related('worker')
+        .annotate(
+            present_days=days('PRESENT', 'present'),
+            half_days=days('HALF_DAY', 'half_day'),
+            leave_days=days('LEAVE', 'leave'),
+            absent_days=days('ABSENT', 'absent'),
+            already_paid=Exists(Payment.objects.filter(assignment=OuterRef('pk'), payroll_month=month_start)),
+        )
+        .order_by('start_date', 'id')
+    )
+
+
+def compute_line(assignment, month_start, month_end):
+    days_in_month = (month_end - month_start).days + 1
+    first_day = max(assignment.start_date, month_start)
+    last_day = min(assignment.end_date or month_end, month_end)
+    employed_days = max((last_day - first_day).days + 1, 0)
+
+    # Days without an attendance record are paid, as are leave days.
+    unpaid_days = Decimal(assignment.absent_days) + Decimal(assignment.half_days) / 2
+    payable_days = max(Decimal(employed_days) - unpaid_days, Decimal(0))
+    amount = (assignment.monthly_salary * payable_days / days_in_month).quantize(CENT, ROUND_HALF_UP)
+
+    return {
+        'assignment': str(assignment.id),
+        'worker': str(assignment.worker_id),
+        'worker_name': assignment.worker.full_name,
+        'job_type': assignment.job_type,
+        'monthly_salary': assignment.monthly_salary,
+        'employed_days': employed_days,
+        'present_days': assignment.present_days,
+        'half_days': assignment.half_days,
+        'leave_days': assignment.leave_days,
+        'absent_days': assignment.absent_days,
+        'payable_days': payable_days,
+        'amount': amount,
+        'loan_deduction': Decimal('0.00'),
+        'net_amount': amount,
+        'skipped': None,
+    }
+
+
+def apply_deductions(lines, balances):
+    # A worker with several assignments has one loan balance, so deductions
+    # draw down a running balance rather than the stored one per line.
+    remaining = dict(balances)
+    for line in lines:
+        if line['skipped']:
+            continue
+        balance = remaining.get(line['worker'], Decimal(0))
+        deduction = min(balance, line['amount'])
+        if deduction > 0:
+            remaining[line['worker']] = balance - deduction
+            line['loan_deduction'] = deduction
+            line['net_amount'] = line['amount'] - deduction
+
+
+def run_payroll(user, month, dry_run=False, payment_date=None, payment_mode='CASH',
+                status='PENDING', deduct_loans=True):
+    month_start, month_end = parse_month(month)
+    payment_date = payment_date or month_end
+    label = month_start.strftime('%Y-%m')
+
+    lines = []
+    assignments = {}
+    for assignment in payroll_assignments(user, month_start, month_end):
+        line = compute_line(assignment, month_start, month_end)
+        if assignment.already_paid:
+            line['skipped'] = 'already_paid'
+        elif line['amount'] <= 0:
+            line['skipped'] = 'nothing_payable'
+        assignments[line['assignment']] = assignment
+        lines.append(line)
+
+    payable = [line for line in lines if not line['skipped']]
+
+    with transaction.atomic():
+        if deduct_loans and payable:
+            worker_ids = {line['worker'] for line in payable}
+            if dry_run:
+                balances = {
+                    str(assignments[line['assignment']].worker_id): assignments[line['assignment']].worker.loan_balance
+                    for line in payable
+                }
+            else:
+                balances = {
+                    str(pk): balance for pk, balance in
+                    Worker.objects.select_for_update()
+                    .filter(pk__in=worker_ids, loan_balance__gt=0)
+                    .values_list('pk', 'loan_balance')
+                }
+            apply_deductions(payable, balances)
+
+        if not dry_run and payable:
+            payments = []
+            adjustments = []
+            deductions = {}
+            for line in payable:
+                payment = Payment(
+                    assignment=assignments[line['assignment']],
+                    amount=line['amount'],
+                    actual_paid_amount=line['net_amount'],
+                    payment_date=payment_date,
+                    payroll_month=month_start,
+                    payment_mode=payment_mode,
+                    status=status,
+                    notes=f"Payroll {label}"
+                )
+                payments.append(payment)
+                line['payment'] = str(payment.id)
+                if line['loan_deduction'] > 0:
+                    adjustments.append(LoanAdjustment(
+                        payment=payment,
+                        worker_id=line['worker'],
+                        user=user,
+                        loan_amount=Decimal(0),
+                        deduction_amount=line['loan_deduction'],
+                        notes=f"Payroll {label} deduction"
+                    ))
+                    deductions[line['worker']] = deductions.get(line['worker'], Decimal(0)) + line['loan_deduction']
+
+            Payment.objects.bulk_create(payments, batch_size=BATCH_SIZE)
+            LoanAdjustment.objects.bulk_create(adjustments, batch_size=BATCH_SIZE)
+            sync.restamp_on_commit(Payment, [payment.pk for payment in payments])
+            sync.restamp_on_commit(LoanAdjustment, [adjustment.pk for adjustment in adjustments])
+            deduct_loan_balances(deductions)
+            dashboard.rebuild([user.pk])
+            versioning.bump([user.pk], ['payments'])
+
+    return {
+        'month': label,
+        'dry_run': dry_run,
+        'payment_date': payment_date,
+        'payments_created': 0 if dry_run else len(payable),
+        'total_amount': sum((line['amount'] for line in payable), Decimal('0.00')),
+        'total_deductions': sum((line['loan_deduction'] for line in payable), Decimal('0.00')),
+        'total_net_amount': sum((line['net_amount'] for line in payable), Decimal('0.00')),
+        'lines': lines,
+    }
+
+
+def disburse(user, entries, errors=None):
+    # entries: validated BulkPaymentItemSerializer data, None where an entry
+    # failed validation (its messages in errors[index]). All-or-nothing:
+    # returns (results, ok) and writes nothing unless every entry is valid.
+    errors = dict(errors or {})
+    owned = dict(
+        WorkerAssignment.objects
+        .filter(user=user, id__in={entry['assignment'] for entry in entries if entry})
+        .values_list('id', 'worker_id')
+    )
+    for index, entry in enumerate(entries):
+        if entry and entry['assignment'] not in owned:
+            errors[index] = {'assignment': ['Assignment not found.']}
+
+    with transaction.atomic():
+        # Deductions draw on each worker's balance, locked until commit.
+        requested = {}
+        for index, entry in enumerate(entries):
+            if index not in errors and entry['deduction'] > 0:
+                requested.setdefault(owned[entry['assignment']], []).append(index)
+        balances = dict(
+            Worker.objects.select_for_update()
+            .filter(pk__in=requested.keys())
+            .values_list('pk', 'loan_balance')
+        )
+        for worker_id, indexes in requested.items():
+            remaining = balances.get(worker_id, Decimal(0))
+            for index in indexes:
+                remaining -= entries[index]['deduction']
+                if remaining < 0:
+                    errors[index] = {'deduction': ['Deduction exceeds the outstanding loan balance.']}
+
+        if errors:
+            return [
+                {'index': index, 'status': 'error', 'errors': errors[index]} if index in errors
+                else {'index': index, 'status': 'valid'}
+                for index in range(len(entries))
+            ], False
+
+        payments, adjustments, deductions, results = [], [], {}, []
+        for index, entry in enumerate(entries):
+            worker_id = owned[entry['assignment']]
+            payment = Payment(
+                assignment_id=entry['assignment'],
+                amount=entry['amount'],
+                actual_paid_amount=entry['amount'] - entry['deduction'],
+                payment_date=entry['payment_date'],
+                payment_mode=entry['payment_mode'],
+                status=entry['status'],
+                notes=entry['notes']
+            )
+            payments.append(payment)
+            if entry['deduction'] > 0:
+                adjustments.append(LoanAdjustment(
+                    payment=payment,
+                    worker_id=worker_id,
+                    user=user,
+                    deduction_amount=entry['deduction'],
+                    notes='Salary deduction'
+                ))
+                deductions[worker_id] = deductions.get(worker_id, Decimal(0)) + entry['deduction']
+            results.append({
+                'index': index,
+                'status': 'created',
+                'payment': str(payment.id),
+                'net_amount': payment.actual_paid_amount,
+            })
+
+        Payment.objects.bulk_create(payments, batch_size=BATCH_SIZE)
+        LoanAdjustment.objects.bulk_create(adjustments, batch_size=BATCH_SIZE)
+        sync.restamp_on_commit(Payment, [payment.pk for payment in payments])
+        sync.restamp_on_commit(LoanAdjustment, [adjustment.pk for adjustment in adjustments])
+        deduct_loan_balances(deductions)
+        dashboard.rebuild([user.pk])
+        versioning.bump([user.pk], ['payments'])
+    return results, True
@@ -0,0 +1,72 @@
+# response_cache.py
+import asyncio
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+LOCK_TIMEOUT = 10   # Seconds a rebuild may hold a key's lock
+WAIT = 2            # Seconds to wait for another request's rebuild
+POLL = 0.05
+
+
+def enabled():
+    return getattr(settings, 'RESPONSE_CACHE_TTL', 0) > 0
+
+
+def cache_key(request, collection, scope, version):
+    # Versioned, so a write orphans every entry of the collection at once
+    # instead of deleting keys; the TTL evicts the orphans. The absolute URI
+    # keys on scheme and host too, as the pagination links embed them.
+    variant = hashlib.sha256(
+        f'{request.user.pk}|{request.build_absolute_uri()}|{request.META.get("HTTP_ACCEPT", "")}'.encode()
+    ).hexdigest()[:32]
+    return f'response:{collection}:{scope}:{version}:{variant}'
+
+
+def fetch(key, build):
+    # build() returns the response data to cache, or None when the response
+    # is not cacheable. On a miss only the request holding the key's lock
+    # rebuilds; the others wait for its entry, up to WAIT, then build their
+    # own without storing it.
+    data = cache.get(key)
+    if data is not None:
+        return data
+    if not cache.add(f'{key}:lock', 1, timeout=LOCK_TIMEOUT):
+        deadline = time.monotonic() + WAIT
+        while time.monotonic() < deadline:
+            time.sleep(POLL)
+            data = cache.get(key)
+            if data is not None:
+                return data
+        return build()
+    try:
+        data = build()
+        if data is not None:
+            cache.set(key, data, timeout=settings.RESPONSE_CACHE_TTL)
+    finally:
+        cache.delete(f'{key}:lock')
+    return data
+
+
+async def afetch(key, build):
+    # fetch for the ASGI views; build is a coroutine function.
+    data = await cache.aget(key)
+    if data is not None:
+        return data
+    if not await cache.aadd(f'{key}:lock', 1, timeout=LOCK_TIMEOUT):
+        deadline = time.monotonic() + WAIT
+        while time.monotonic() < deadline:
+            await asyncio.sleep(POLL)
+            data = await cache.aget(key)
+            if data is not None:
+                return data
+        return await build()
+    try:
+        data = await build()
+        if data is not None:
+            await cache.aset(key, data, timeout=settings.RESPONSE_CACHE_TTL)
+    finally:
+        await cache.adelete(f'{key}:lock')
+    return data
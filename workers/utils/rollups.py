@@ -0,0 +1,294 @@
+# rollups.py
+import uuid
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from ..models import WorkerAssignment, Attendance, AttendanceMonthRollup, Tombstone
+from . import sync, versioning
+
+CODES = AttendanceMonthRollup.CODES
+STATUSES = {code: status for status, code in CODES.items()}
+COUNT_FIELDS = {'PRESENT': 'present', 'ABSENT': 'absent', 'HALF_DAY': 'half_day', 'LEAVE': 'leave'}
+EMPTY = AttendanceMonthRollup.EMPTY
+BATCH_SIZE = 200  # Assignments per archive transaction
+
+
+def month_start(day):
+    return day.replace(day=1)
+
+
+def next_month(day):
+    return (day.replace(day=1) + timedelta(days=32)).replace(day=1)
+
+
+def has_rollups_key(user_id):
+    return f'attendance-rollups:{user_id}'
+
+
+def has_rollups(user_id):
+    # Cached so the attendance list only pays for the rollup query once a
+    # user has archived months.
+    key = has_rollups_key(user_id)
+    value = cache.get(key)
+    if value is None:
+        value = AttendanceMonthRollup.objects.filter(assignment__user_id=user_id).exists()
+        cache.set(key, value, timeout=None)
+    return value
+
+
+async def ahas_rollups(user_id):
+    key = has_rollups_key(user_id)
+    value = await cache.aget(key)
+    if value is None:
+        value = await AttendanceMonthRollup.objects.filter(assignment__user_id=user_id).aexists()
+        await cache.aset(key, value, timeout=None)
+    return value
+
+
+def recount(rollup):
+    for status, field in COUNT_FIELDS.items():
+        setattr(rollup, field, rollup.days.count(CODES[status]))
+
+
+def day_record(rollup, day):
+    # (id, created_at, updated_at) of the row archived for `day`.
+    record = rollup.records.get(str(day.day))
+    if record is None:
+        return uuid.uuid5(rollup.id, day.isoformat()), rollup.archived_at, rollup.updated_at
+    return uuid.UUID(record[0]), parse_datetime(record[1]), parse_datetime(record[2])
+
+
+def expand(rollup):
+    # Unsaved Attendance rows for the archived days, newest first, with the
+    # ids and timestamps they had when archived.
+    rows = []
+    for index in range(len(rollup.days) - 1, -1, -1):
+        code = rollup.days[index]
+        if code == EMPTY:
+            continue
+        day = rollup.month + timedelta(days=index)
+        pk, created_at, updated_at = day_record(rollup, day)
+        rows.append(Attendance(
+            id=pk,
+            assignment=rollup.assignment,
+            date=day,
+            status=STATUSES[code],
+            notes='',
+            created_at=created_at,
+            updated_at=updated_at
+        ))
+    return rows
+
+
+def archived_row(user, pk):
+    # The archived row with id `pk`, unsaved, or None.
+    rollups = (
+        AttendanceMonthRollup.objects
+        .filter(assignment__user=user, records__icontains=str(pk))
+        .select_related('assignment__worker')
+    )
+    for rollup in rollups:
+        for row in expand(rollup):
+            if row.id == pk:
+                return row
+    return None
+
+
+def restore(row):
+    # Moves an archived row back into Attendance under its own id, so it
+    # can be edited or deleted like any other; saving it releases the
+    # archived day.
+    created_at = row.created_at
+    try:
+        with transaction.atomic():
+            row.save(force_insert=True)
+            Attendance.objects.filter(pk=row.pk).update(created_at=created_at)
+            row.created_at = created_at
+    except IntegrityError:
+        # Restored, or the day rewritten, by a concurrent request.
+        return Attendance.objects.filter(pk=row.pk).first()
+    return row
+
+
+def archived_rows(user, day=None, position=None, reverse=False, limit=50):
+    # Up to `limit` archived rows in (-date, -id) order (ascending when
+    # reverse), after the cursor position (date, id).
+    rollups = AttendanceMonthRollup.objects.filter(assignment__user=user).select_related('assignment__worker')
+    if day is not None:
+        rollups = rollups.filter(month=month_start(day))
+    if position is not None:
+        boundary = month_start(position[0])
+        rollups = rollups.filter(**{'month__gte' if reverse else 'month__lte': boundary})
+    # A rollup can yield no rows at all (emptied by release_days, or all
+    # its days before the cursor or off the ?date= day), so rollups are
+    # read month by month until `limit` rows are in hand; the rest of the
+    # last month is needed too, as its rows interleave by date.
+    def wanted(row):
+        if day is not None and row.date != day:
+            return False
+        if position is None:
+            return True
+        return (row.date, row.id) > position if reverse else (row.date, row.id) < position
+
+    rows, month = [], None
+    for rollup in rollups.order_by('month' if reverse else '-month', 'id').iterator(chunk_size=limit):
+        if rollup.month != month:
+            if len(rows) >= limit:
+                break
+            month = rollup.month
+        rows.extend(row for row in expand(rollup) if wanted(row))
+    rows.sort(key=lambda row: (row.date, row.id), reverse=not reverse)
+    return rows[:limit]
+
+
+def release_days(keys):
+    # A live row written for an archived day takes over from the rollup.
+    # keys: iterable of (assignment_id, date).
+    this_month = month_start(timezone.localdate())
+    wanted = {}
+    for assignment_id, day in keys:
+        if day < this_month:
+            wanted.setdefault((assignment_id, month_start(day)), set()).add(day)
+    if not wanted:
+        return 0
+
+    changed, released = [], {}
+    now = timezone.now()
+    with transaction.atomic():
+        rollups = AttendanceMonthRollup.objects.select_for_update().filter(
+            assignment_id__in={key[0] for key in wanted},
+            month__in={key[1] for key in wanted}
+        ).select_related('assignment')
+        for rollup in rollups:
+            days = list(rollup.days)
+            for day in wanted.get((rollup.assignment_id, rollup.month), ()):
+                if days[day.day - 1] != EMPTY:
+                    days[day.day - 1] = EMPTY
+                    released[day_record(rollup, day)[0]] = rollup.assignment.user_id
+                    rollup.records.pop(str(day.day), None)
+            if ''.join(days) != rollup.days:
+                rollup.days = ''.join(days)
+                rollup.updated_at = now
+                recount(rollup)
+                changed.append(rollup)
+        AttendanceMonthRollup.objects.bulk_update(
+            changed, ['days', 'records', 'present', 'absent', 'half_day', 'leave', 'updated_at']
+        )
+        # Synced clients drop the archived row, unless it was restored live
+        # under its own id.
+        restored = set(Attendance.objects.filter(pk__in=released).values_list('pk', flat=True))
+        tombstones = Tombstone.objects.bulk_create([
+            Tombstone(user_id=user_id, kind='attendance', object_id=pk)
+            for pk, user_id in released.items() if pk not in restored
+        ])
+        sync.restamp_on_commit(AttendanceMonthRollup, [rollup.pk for rollup in changed])
+        sync.restamp_on_commit(Tombstone, [tombstone.pk for tombstone in tombstones], 'deleted_at')
+    return len(changed)
+
+
+def _archive_batch(month, assignment_ids):
+    days_in_month = (next_month(month) - month).days
+    # Rows are locked before the rollups, the order live writes take them
+    # in, so none is changed between this read and the delete.
+    rows = list(
+        Attendance.objects
+        .select_for_update()
+        .filter(
+            assignment_id__in=assignment_ids, date__gte=month, date__lt=next_month(month),
+            check_in__isnull=True, check_out__isnull=True, notes=''
+        )
+        .order_by('pk')
+        .values_list('id', 'assignment_id', 'date', 'status', 'created_at', 'updated_at')
+    )
+    existing = {
+        rollup.assignment_id: rollup
+        for rollup in AttendanceMonthRollup.objects.select_for_update().filter(
+            assignment_id__in=assignment_ids, month=month
+        )
+    }
+    archived, days, records = [], {}, {}
+    for pk, assignment_id, day, status, created_at, updated_at in rows:
+        if assignment_id not in days:
+            current = existing.get(assignment_id)
+            days[assignment_id] = list(current.days if current else EMPTY * days_in_month)
+            records[assignment_id] = dict(current.records if current else {})
+        days[assignment_id][day.day - 1] = CODES[status]
+        records[assignment_id][str(day.day)] = [str(pk), created_at.isoformat(), updated_at.isoformat()]
+        archived.append(pk)
+    if not archived:
+        return 0
+
+    created, updated = [], []
+    now = timezone.now()
+    for assignment_id, codes in days.items():
+        rollup = existing.get(assignment_id)
+        if rollup is None:
+            rollup = AttendanceMonthRollup(assignment_id=assignment_id, month=month)
+            created.append(rollup)
+        else:
+            rollup.updated_at = now
+            updated.append(rollup)
+        rollup.days = ''.join(codes)
+        rollup.records = records[assignment_id]
+        recount(rollup)
+    AttendanceMonthRollup.objects.bulk_create(created)
+    AttendanceMonthRollup.objects.bulk_update(
+        updated, ['days', 'records', 'present', 'absent', 'half_day', 'leave', 'updated_at']
+    )
+    sync.restamp_on_commit(AttendanceMonthRollup, [rollup.pk for rollup in created + updated])
+    # A plain DELETE: the rows live on in the rollups under the same ids,
+    # and delta sync re-sends them from there, so the per-row delete signals
+    # (tombstones, summary and version bookkeeping) must not fire.
+    for start in range(0, len(archived), 900):
+        Attendance.objects.filter(pk__in=archived[start:start + 900])._raw_delete(Attendance.objects.db)
+    return len(archived)
+
+
+def archive_months(before, batch_size=BATCH_SIZE, stdout=None):
+    # Moves plain attendance rows of every month before `before` into
+    # rollups, one transaction per batch of assignments.
+    # Returns (months, rows).
+    if before > month_start(timezone.localdate()):
+        raise ValueError('Only closed months can be archived')
+    months = Attendance.objects.filter(date__lt=before).dates('date', 'month')
+    total_rows, archived_months = 0, 0
+    for month in months:
+        assignment_ids = list(
+            Attendance.objects.filter(date__gte=month, date__lt=next_month(month))
+            .order_by('assignment_id').values_list('assignment_id', flat=True).distinct()
+        )
+        month_rows = 0
+        for start in range(0, len(assignment_ids), batch_size):
+            batch = assignment_ids[start:start + batch_size]
+            with transaction.atomic():
+                count = _archive_batch(month, batch)
+                if count:
+                    user_ids = set(
+                        WorkerAssignment.objects.filter(id__in=batch).values_list('user_id', flat=True)
+                    )
+                    # Rows move to the rollups, so cached lists go; the
+                    # counts, and with them the cached summaries, stay the
+                    # same.
+                    versioning.bump(user_ids, ['attendance'])
+                    transaction.on_commit(
+                        lambda ids=user_ids: cache.set_many({has_rollups_key(i): True for i in ids}, timeout=None)
+                    )
+            month_rows += count
+        if month_rows:
+            archived_months += 1
+            total_rows += month_rows
+            if stdout is not None:
+                stdout.write(f"{month:%Y-%m}: archived {month_rows} rows")
+    return archived_months, total_rows
+
+
+def default_cutoff(keep_months):
+    # First day of the month `keep_months` before the current one.
+    cutoff = month_start(timezone.localdate())
+    for _ in range(keep_months):
+        cutoff = month_start(cutoff - timedelta(days=1))
+    return cutoff
@@ -0,0 +1,166 @@
+# search.py
+import re
+import uuid
+
+from django.db import connection
+from django.db.models import Q
+
+from ..models import Worker
+
+SQLITE_TABLE = 'workers_worker_search'
+SQLITE_ROWIDS = 'workers_worker_search_rowid'
+TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+PHONE_LIKE_RE = re.compile(r'^[\d\s()+-]+$')
+DEFAULT_LIMIT = 20
+MAX_LIMIT = 100
+
+
+def normalize_phone(value):
+    return re.sub(r'\D', '', value or '')
+
+
+def phone_terms(value):
+    # Index the full digit string and the local 10-digit number, so both
+    # "+91 98..." and "98..." prefix-match the same worker.
+    digits = normalize_phone(value)
+    terms = [digits]
+    if len(digits) > 10:
+        terms.append(digits[-10:])
+    return ' '.join(t for t in terms if t)
+
+
+def _hex(worker_id):
+    if not isinstance(worker_id, uuid.UUID):
+        worker_id = uuid.UUID(str(worker_id))
+    return worker_id.hex
+
+
+def _sqlite_row(worker):
+    return (
+        worker.full_name,
+        phone_terms(worker.phone_number) + ' ' + phone_terms(worker.emergency_contact),
+        worker.id_number,
+        worker.id.hex,
+    )
+
+
+def index_workers(workers):
+    workers = list(workers)
+    if not workers or connection.vendor != 'sqlite':
+        # Postgres searches the base table through trigram indexes.
+        return
+    # FTS5 rows are keyed by integer rowid. Each worker UUID gets its own
+    # rowid in SQLITE_ROWIDS, so updates and deletes are rowid lookups
+    # instead of table scans, and two workers can never share a row.
+    with connection.cursor() as cursor:
+        cursor.executemany(
+            f"INSERT OR IGNORE INTO {SQLITE_ROWIDS} (worker_id) VALUES (%s)",
+            [(worker.id.hex,) for worker in workers]
+        )
+        cursor.executemany(
+            f"INSERT OR REPLACE INTO {SQLITE_TABLE} (rowid, worker_id, full_name, phone_digits, id_number) "
+            f"SELECT id, worker_id, %s, %s, %s FROM {SQLITE_ROWIDS} WHERE worker_id = %s",
+            [_sqlite_row(worker) for worker in workers]
+        )
+
+
+def remove_workers(worker_ids):
+    worker_ids = [(_hex(pk),) for pk in worker_ids]
+    if not worker_ids or connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        cursor.executemany(
+            f"DELETE FROM {SQLITE_TABLE} WHERE rowid = (SELECT id FROM {SQLITE_ROWIDS} WHERE worker_id = %s)",
+            worker_ids
+        )
+        cursor.executemany(f"DELETE FROM {SQLITE_ROWIDS} WHERE worker_id = %s", worker_ids)
+
+
+def rebuild_index(chunk_size=2000):
+    if connection.vendor != 'sqlite':
+        return 0
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {SQLITE_TABLE}")
+        cursor.execute(f"DELETE FROM {SQLITE_ROWIDS}")
+    count = 0
+    batch = []
+    fields = ('id', 'full_name', 'phone_number', 'emergency_contact', 'id_number')
+    for worker in Worker.objects.only(*fields).iterator(chunk_size=chunk_size):
+        batch.append(worker)
+        if len(batch) >= chunk_size:
+            index_workers(batch)
+            count += len(batch)
+            batch = []
+    index_workers(batch)
+    return count + len(batch)
+
+
+def _match_expression(query):
+    # Phone-like input ("+91 98765-43210") is searched as one digit prefix;
+    # anything else requires every word to prefix-match some column.
+    if PHONE_LIKE_RE.match(query):
+        digits = normalize_phone(query)
+        return f'"{digits}"*' if digits else None
+    terms = [f'"{token}"*' for token in TOKEN_RE.findall(query)]
+    return ' AND '.join(terms) or None
+
+
+def _sqlite_search(query, limit):
+    match = _match_expression(query)
+    if match is None:
+        return []
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"SELECT worker_id FROM {SQLITE_TABLE} WHERE {SQLITE_TABLE} MATCH %s "
+            f"ORDER BY bm25({SQLITE_TABLE}, 0, 10.0, 5.0, 5.0) LIMIT %s",
+            [match, limit]
+        )
+        return [uuid.UUID(row[0]) for row in cursor.fetchall()]
+
+
+def _like_escape(value):
+    # LIKE treats % and _ in the search term as wildcards unless escaped.
+    return value.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+
+def _postgres_search(query, limit):
+    digits = normalize_phone(query)
+    escaped = _like_escape(query)
+    like = f'%{escaped}%'
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT id FROM workers_worker "
+            "WHERE full_name ILIKE %s OR id_number ILIKE %s OR full_name %% %s "
+            "OR (%s <> '' AND regexp_replace(phone_number, '\\D', '', 'g') LIKE %s) "
+            "ORDER BY GREATEST("
+            "similarity(full_name, %s), similarity(id_number, %s), "
+            "CASE WHEN full_name ILIKE %s OR id_number ILIKE %s THEN 1 ELSE 0 END"
+            ") DESC, id LIMIT %s",
+            [like, like, query, digits, f'%{digits}%', query, query,
+             f'{escaped}%', f'{escaped}%', limit]
+        )
+        return [row[0] for row in cursor.fetchall()]
+
+
+def search_worker_ids(query, limit=DEFAULT_LIMIT):
+    query = (query or '').strip()
+    if not query:
+        return []
+    limit = max(1, min(int(limit), MAX_LIMIT))
+    if connection.vendor == 'sqlite':
+        return _sqlite_search(query, limit)
+    if connection.vendor == 'postgresql':
+        return _postgres_search(query, limit)
+    return list(
+        Worker.objects.filter(
+            Q(full_name__icontains=query) |
+            Q(phone_number__icontains=query) |
+            Q(id_number__icontains=query)
+        ).values_list('id', flat=True)[:limit]
+    )
+
+
+def search_workers(query, limit=DEFAULT_LIMIT):
+    ids = search_worker_ids(query, limit)
+    workers = Worker.objects.in_bulk(ids)
+    return [workers[pk] for pk in ids if pk in workers]
@@ -0,0 +1,191 @@
+# sync.py
+import base64
+import heapq
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from ..models import WorkerAssignment, Attendance, AttendanceMonthRollup, Payment, LoanAdjustment, Tombstone
+from ..serializers import (
+    WorkerAssignmentSerializer,
+    AttendanceSerializer,
+    PaymentSerializer,
+    LoanAdjustmentSerializer
+)
+from . import rollups
+
+DEFAULT_PAGE_SIZE = 200
+MAX_PAGE_SIZE = 1000
+
+# Changes are ordered by (timestamp, rank, id); the rank breaks timestamp
+# ties between tables, so the token is a total position in the change log.
+# Archived attendance changes with its monthly rollup, so it is read per
+# rollup, after tombstones: each rollup entry upserts all of its days.
+SOURCES = ['assignments', 'attendance', 'payments', 'loan_adjustments']
+TOMBSTONE_RANK = len(SOURCES)
+ARCHIVE_RANK = TOMBSTONE_RANK + 1
+LAST_ID = uuid.UUID(int=2 ** 128 - 1)
+SERIALIZERS = {
+    'assignments': WorkerAssignmentSerializer,
+    'attendance': AttendanceSerializer,
+    'payments': PaymentSerializer,
+    'loan_adjustments': LoanAdjustmentSerializer,
+}
+
+
+class InvalidToken(ValueError):
+    pass
+
+
+class ExpiredToken(ValueError):
+    pass
+
+
+def encode_token(position):
+    timestamp, rank, pk = position
+    raw = f'{timestamp.isoformat()}|{rank}|{pk}'
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_token(token):
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4)).decode()
+        timestamp, rank, pk = raw.split('|')
+        timestamp, rank, pk = parse_datetime(timestamp), int(rank), uuid.UUID(pk)
+    except (ValueError, UnicodeDecodeError):
+        raise InvalidToken('Invalid sync token')
+    if timestamp is None or not 0 <= rank <= ARCHIVE_RANK:
+        raise InvalidToken('Invalid sync token')
+    return timestamp, rank, pk
+
+
+def tombstone_retention():
+    return timedelta(days=getattr(settings, 'SYNC_TOMBSTONE_DAYS', 30))
+
+
+def settle_window():
+    return timedelta(seconds=getattr(settings, 'SYNC_SETTLE_SECONDS', 2))
+
+
+def restamp_on_commit(model, pks, field='updated_at'):
+    # Changes are read up to the settle window before now, so a row stamped
+    # in a transaction that commits later than that (a payroll run, an
+    # import, an archive batch) would sort behind tokens already handed out
+    # and never sync. Such rows are stamped again once committed. This does
+    # not cover clocks skewed between app servers by more than the window.
+    pks = list(pks)
+    stamped = timezone.now()
+
+    def restamp():
+        now = timezone.now()
+        if now - stamped < settle_window() / 2:
+            return
+        for start in range(0, len(pks), 900):
+            model.objects.filter(pk__in=pks[start:start + 900], **{f'{field}__lte': stamped}).update(**{field: now})
+
+    if pks:
+        transaction.on_commit(restamp)
+
+
+def owned_querysets(user):
+    return {
+        'assignments': WorkerAssignment.objects.filter(user=user).select_related('worker'),
+        'attendance': Attendance.objects.filter(assignment__user=user).select_related('assignment__worker'),
+        'payments': Payment.objects.filter(assignment__user=user).select_related('assignment__worker'),
+        'loan_adjustments': LoanAdjustment.objects.filter(user=user).select_related('worker'),
+    }
+
+
+def _after(queryset, field, rank, since):
+    # Keyset filter for rows of `rank` strictly after the `since` position.
+    if since is None:
+        return queryset
+    timestamp, since_rank, pk = since
+    if rank > since_rank:
+        return queryset.filter(**{f'{field}__gte': timestamp})
+    if rank < since_rank:
+        return queryset.filter(**{f'{field}__gt': timestamp})
+    return queryset.filter(Q(**{f'{field}__gt': timestamp}) | Q(**{field: timestamp, 'pk__gt': pk}))
+
+
+def changes_since(user, token=None, page_size=DEFAULT_PAGE_SIZE):
+    # One page of upserts and deletions after `token`, in change order.
+    # Each table is read with its own index-backed keyset query of at most
+    # page_size + 1 rows, and the results are merged.
+    since = decode_token(token) if token else None
+    now = timezone.now()
+    if since is not None and since[0] < now - tombstone_retention():
+        raise ExpiredToken('Sync token expired; start a full sync')
+    # Rows written in the last moments may belong to transactions that have
+    # not committed yet; leave them for the next sync so none is skipped.
+    # Longer transactions restamp their rows on commit (restamp_on_commit).
+    until = now - settle_window()
+
+    querysets = owned_querysets(user)
+    streams = []
+    for rank, kind in enumerate(SOURCES):
+        queryset = _after(querysets[kind], 'updated_at', rank, since)
+        rows = queryset.filter(updated_at__lte=until).order_by('updated_at', 'pk')[:page_size + 1]
+        streams.append([((obj.updated_at, rank, obj.pk), kind, obj) for obj in rows])
+    if since is not None:
+        # A first sync has nothing to delete.
+        queryset = _after(Tombstone.objects.filter(user=user), 'deleted_at', TOMBSTONE_RANK, since)
+        rows = queryset.filter(deleted_at__lte=until).order_by('deleted_at', 'pk')[:page_size + 1]
+        streams.append([((obj.deleted_at, TOMBSTONE_RANK, obj.pk), 'deleted', obj) for obj in rows])
+    queryset = _after(
+        AttendanceMonthRollup.objects.filter(assignment__user=user).select_related('assignment__worker'),
+        'updated_at', ARCHIVE_RANK, since
+    )
+    rows = queryset.filter(updated_at__lte=until).order_by('updated_at', 'pk')[:page_size + 1]
+    streams.append([((obj.updated_at, ARCHIVE_RANK, obj.pk), 'archived', obj) for obj in rows])
+
+    merged = list(heapq.merge(*streams, key=lambda entry: entry[0]))
+    page, has_more = merged[:page_size], len(merged) > page_size
+    if has_more:
+        return page, has_more, page[-1][0]
+    # Everything up to `until` has been read, so the token moves to the
+    # watermark; an idle account's token then stays fresh across syncs.
+    watermark = (until, ARCHIVE_RANK, LAST_ID)
+    return page, has_more, max(watermark, since) if since is not None else watermark
+
+
+def serialize_changes(page, context):
+    # Serializes each table's rows with one many=True pass, then restores
+    # change order. A rollup entry expands to an upsert per archived day.
+    grouped = {}
+    for index, (position, kind, obj) in enumerate(page):
+        if kind == 'archived':
+            grouped.setdefault('attendance', []).extend((index, row) for row in rollups.expand(obj))
+        elif kind != 'deleted':
+            grouped.setdefault(kind, []).append((index, obj))
+    data = {}
+    for kind, entries in grouped.items():
+        serialized = SERIALIZERS[kind]([obj for _, obj in entries], many=True, context=context).data
+        for (index, _), item in zip(entries, serialized):
+            data.setdefault(index, []).append(item)
+
+    changes = []
+    for index, (position, kind, obj) in enumerate(page):
+        if kind == 'deleted':
+            changes.append({'type': obj.kind, 'op': 'delete', 'id': str(obj.object_id)})
+        else:
+            kind = 'attendance' if kind == 'archived' else kind
+            changes.extend({'type': kind, 'op': 'upsert', 'data': item} for item in data.get(index, ()))
+    return changes
+
+
+def record_deletions(user_ids, kind, object_id):
+    tombstones = Tombstone.objects.bulk_create([
+        Tombstone(user_id=user_id, kind=kind, object_id=object_id)
+        for user_id in set(user_ids) if user_id is not None
+    ])
+    restamp_on_commit(Tombstone, [tombstone.pk for tombstone in tombstones], 'deleted_at')
+
+
+def prune_tombstones():
+    return Tombstone.objects.filter(deleted_at__lt=timezone.now() - tombstone_retention()).delete()[0]
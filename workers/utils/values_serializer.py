@@ -0,0 +1,116 @@
+# values_serializer.py
+from operator import methodcaller
+
+from rest_framework import ISO_8601, serializers
+from rest_framework.settings import api_settings
+
+# (serializer class, field names) -> ValuesPlan, or None when unsupported.
+_plans = {}
+
+
+class ValuesPlan:
+    # Read-only serialization straight from values_list() rows: each field
+    # is a column path and a mapper compiled once from the serializer field,
+    # so a list page skips model instances and per-field attribute lookups.
+    # Produces exactly what the serializer's to_representation does.
+    def __init__(self, fields):
+        self.paths = list(dict.fromkeys(path for _, path, _ in fields))
+        self.fields = [(name, self.paths.index(path), mapper) for name, path, mapper in fields]
+
+    def queryset(self, queryset, extra=()):
+        # Named rows, so the keyset paginator reads the ordering columns
+        # (appended from extra) off them like off instances.
+        return queryset.values_list(*dict.fromkeys([*self.paths, *extra]), named=True)
+
+    def to_representation(self, row):
+        ret = {}
+        for name, index, mapper in self.fields:
+            value = row[index]
+            ret[name] = value if value is None or mapper is None else mapper(value)
+        return ret
+
+    def serialize(self, rows, serializer):
+        # Rows merged in from elsewhere (archived attendance) are instances.
+        return [
+            self.to_representation(row) if isinstance(row, tuple) else serializer.to_representation(row)
+            for row in rows
+        ]
+
+
+def plan_for(serializer):
+    key = (type(serializer), tuple(serializer.fields))
+    if key not in _plans:
+        _plans[key] = compile_plan(serializer)
+    return _plans[key]
+
+
+def compile_plan(serializer):
+    model = serializer.Meta.model
+    fields = []
+    for name, field in serializer.fields.items():
+        if field.write_only:
+            continue
+        entry = _compile_field(model, field)
+        if entry is None:
+            return None
+        fields.append((name, *entry))
+    return ValuesPlan(fields)
+
+
+def _compile_field(model, field):
+    # (path, mapper) for a field that reads one column, possibly across
+    # non-null foreign keys; None for anything else.
+    if field.source == '*' or isinstance(field, (
+        serializers.SerializerMethodField, serializers.FileField,
+        serializers.BaseSerializer, serializers.ManyRelatedField
+    )):
+        return None
+    current, path, choices = model, [], None
+    for position, attr in enumerate(field.source_attrs):
+        last = position == len(field.source_attrs) - 1
+        if last and attr.startswith('get_') and attr.endswith('_display'):
+            attr = attr[len('get_'):-len('_display')]
+            choices = True
+        try:
+            model_field = current._meta.get_field(attr)
+        except Exception:
+            return None
+        if not model_field.concrete:
+            return None
+        path.append(model_field.name)
+        if last:
+            break
+        # DRF skips a field whose path crosses a missing relation, where
+        # values() would give None.
+        if not model_field.many_to_one or model_field.null:
+            return None
+        current = model_field.related_model
+
+    if choices:
+        if not model_field.choices:
+            return None
+        labels = dict(model_field.flatchoices)
+        to_representation = field.to_representation
+        return '__'.join(path), lambda value: to_representation(labels.get(value, value))
+    if model_field.is_relation:
+        if not (isinstance(field, serializers.PrimaryKeyRelatedField) and model_field.many_to_one):
+            return None
+        # The column holds the related pk, which the field outputs as is.
+        return '__'.join(path), field.pk_field.to_representation if field.pk_field else None
+    return '__'.join(path), _mapper(field, model_field)
+
+
+def _mapper(field, model_field):
+    if type(field).to_representation in (
+        serializers.CharField.to_representation, serializers.ChoiceField.to_representation
+    ) and model_field.get_internal_type() in ('CharField', 'TextField'):
+        # Text columns already hold the string these output.
+        return None
+    if type(field) is serializers.UUIDField and field.uuid_format == 'hex_verbose':
+        return str
+    if type(field) in (serializers.DateField, serializers.TimeField):
+        default = api_settings.DATE_FORMAT if type(field) is serializers.DateField else api_settings.TIME_FORMAT
+        output_format = getattr(field, 'format', default)
+        if output_format is not None and output_format.lower() == ISO_8601:
+            return methodcaller('isoformat')
+    return field.to_representation
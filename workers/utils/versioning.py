@@ -0,0 +1,147 @@
+# versioning.py
+import hashlib
+import time
+
+from django.core.cache import cache
+from django.db import transaction
+from django.utils.http import http_date, parse_http_date_safe, quote_etag
+from rest_framework import status
+from rest_framework.response import Response
+
+from . import response_cache
+
+# Workers are shared by all employers, so their collection has one global
+# version; the others are versioned per user.
+GLOBAL_SCOPE = '*'
+USER_COLLECTIONS = ('assignments', 'attendance', 'payments')
+
+
+def version_key(scope, collection):
+    return f'collection-version:{scope}:{collection}'
+
+
+def modified_key(scope, collection):
+    return f'collection-modified:{scope}:{collection}'
+
+
+def _initial_version():
+    # A missing or evicted counter restarts from the clock, so it can never
+    # repeat a version a client already holds an ETag for.
+    return int(time.time() * 1000)
+
+
+def get_version(scope, collection):
+    # One cache round trip; returns (version, last_modified_timestamp).
+    vkey, mkey = version_key(scope, collection), modified_key(scope, collection)
+    values = cache.get_many([vkey, mkey])
+    version = values.get(vkey)
+    if version is None:
+        version = _initial_version()
+        if not cache.add(vkey, version, timeout=None):
+            version = cache.get(vkey, version)
+    modified = values.get(mkey)
+    if modified is None:
+        modified = int(time.time())
+        cache.add(mkey, modified, timeout=None)
+    return version, modified
+
+
+async def aget_version(scope, collection):
+    vkey, mkey = version_key(scope, collection), modified_key(scope, collection)
+    values = await cache.aget_many([vkey, mkey])
+    version = values.get(vkey)
+    if version is None:
+        version = _initial_version()
+        if not await cache.aadd(vkey, version, timeout=None):
+            version = await cache.aget(vkey, version)
+    modified = values.get(mkey)
+    if modified is None:
+        modified = int(time.time())
+        await cache.aadd(mkey, modified, timeout=None)
+    return version, modified
+
+
+def _bump(keys):
+    now = int(time.time())
+    for scope, collection in keys:
+        vkey = version_key(scope, collection)
+        try:
+            cache.incr(vkey)
+        except ValueError:
+            cache.set(vkey, _initial_version(), timeout=None)
+    # Last-Modified moves forward on every write, even within one second, so
+    # a client revalidating with the previous value never gets a stale 304.
+    mkeys = [modified_key(scope, collection) for scope, collection in keys]
+    previous = cache.get_many(mkeys)
+    cache.set_many({key: max(now, previous.get(key, 0) + 1) for key in mkeys}, timeout=None)
+
+
+def bump(scopes, collections):
+    # Bumps after commit, so a reader can't pair the new version with data
+    # from before the write.
+    keys = {(str(scope), collection) for scope in scopes if scope is not None for collection in collections}
+    if keys:
+        transaction.on_commit(lambda: _bump(keys))
+
+
+def collection_etag(request, collection, version):
+    variant = hashlib.md5(
+        f'{request.user.pk}|{request.get_full_path()}|{request.META.get("HTTP_ACCEPT", "")}'.encode()
+    ).hexdigest()[:12]
+    return 'W/' + quote_etag(f'{collection}-{version}-{variant}')
+
+
+def is_not_modified(request, etag, modified):
+    if_none_match = request.META.get('HTTP_IF_NONE_MATCH')
+    if if_none_match is not None:
+        return etag in [tag.strip() for tag in if_none_match.split(',')] or if_none_match.strip() == '*'
+    since = parse_http_date_safe(request.META.get('HTTP_IF_MODIFIED_SINCE', ''))
+    return since is not None and modified <= since
+
+
+def add_validators(response, etag, modified):
+    if response.status_code in (status.HTTP_200_OK, status.HTTP_304_NOT_MODIFIED):
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(modified)
+        response['Cache-Control'] = 'private, no-cache'
+    return response
+
+
+class ConditionalGetMixin:
+    # Weak ETag / Last-Modified for list and retrieve, derived from the
+    # collection version alone, so a 304 costs one cache read and no query
+    # or serialization. List bodies are cached under the same version (see
+    # response_cache.py).
+    version_collection = None
+    version_global = False
+
+    def version_scope(self):
+        return GLOBAL_SCOPE if self.version_global else self.request.user.pk
+
+    def collection_etag(self, request):
+        version, modified = get_version(self.version_scope(), self.version_collection)
+        return collection_etag(request, self.version_collection, version), modified, version
+
+    def conditional_response(self, request, handler, *args, cacheable=False, **kwargs):
+        etag, modified, version = self.collection_etag(request)
+        if is_not_modified(request, etag, modified):
+            response = Response(status=status.HTTP_304_NOT_MODIFIED)
+        elif cacheable and response_cache.enabled():
+            built = []
+
+            def build():
+                built.append(handler(request, *args, **kwargs))
+                return built[0].data if built[0].status_code == status.HTTP_200_OK else None
+
+            key = response_cache.cache_key(request, self.version_collection, self.version_scope(), version)
+            data = response_cache.fetch(key, build)
+            response = built[0] if built else Response(data)
+        else:
+            response = handler(request, *args, **kwargs)
+        return add_validators(response, etag, modified)
+
+    def list(self, request, *args, **kwargs):
+        return self.conditional_response(request, super().list, *args, cacheable=True, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.conditional_response(request, super().retrieve, *args, **kwargs)
@@ -4,85 +4,474 @@ from rest_framework.decorators import action
 from rest_framework.response import Response
 from django.db.models import Sum
 from datetime import datetime, timedelta
+from functools import partial
+from decimal import Decimal
+import uuid
 from rest_framework import viewsets
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
-from django.db.models import Q
+from rest_framework.views import APIView
+from django.http import Http404, StreamingHttpResponse
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+from rest_framework import status
+from api.utils.async_views import AsyncAPIView, Fallback
+from .pagination import KeysetCursorPagination, AttendanceCursorPagination
 from .models import Worker, WorkerAssignment, Attendance, Payment, LoanAdjustment
 from .serializers import (
     WorkerSerializer,
+    AddLoanSerializer,
     WorkerAssignmentSerializer,
     AttendanceSerializer,
+    AttendanceBulkItemSerializer,
     PaymentSerializer,
-    LoanAdjustmentSerializer
+    BulkPaymentItemSerializer,
+    LoanAdjustmentSerializer,
+    PayrollRunSerializer
 )
+from .utils.attendance import attendance_summary, owned_assignment_ids, upsert_attendance
+from .utils.dashboard import get_dashboard
+from .utils.export import EXPORTS, stream_csv, stream_xlsx
+from .utils.imports import InvalidFile, import_attendance_grid, import_workers, read_table, stream_report
+from .utils.payroll import MAX_BULK_PAYMENTS, disburse, run_payroll
+from .utils import response_cache, values_serializer
+from .utils.rollups import ahas_rollups, archived_row, archived_rows, has_rollups, restore
+from .utils.sync import (
+    DEFAULT_PAGE_SIZE as DEFAULT_SYNC_PAGE_SIZE,
+    MAX_PAGE_SIZE as MAX_SYNC_PAGE_SIZE,
+    ExpiredToken,
+    InvalidToken,
+    changes_since,
+    encode_token,
+    serialize_changes
+)
+from .utils.search import DEFAULT_LIMIT as DEFAULT_SEARCH_LIMIT, search_workers
+from .utils.versioning import (
+    ConditionalGetMixin,
+    add_validators,
+    aget_version,
+    collection_etag,
+    is_not_modified
+)
+
+
+class SparseQuerysetMixin:
+    # With ?fields= / ?omit= the serializer drops fields; load only the
+    # columns and joins the remaining ones read.
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        params = self.request.query_params
+        if self.request.method != 'GET' or not (params.get('fields') or params.get('omit')):
+            return queryset
+        paths = self.get_serializer().query_paths()
+        if paths is None:
+            return queryset
+        only, related = paths
+        ordering = getattr(self.pagination_class, 'ordering', ())
+        only |= {field.lstrip('-') for field in ordering}
+        queryset = queryset.select_related(None)
+        if related:
+            queryset = queryset.select_related(*related)
+        return queryset.only(*only)
+
 
+def streamed_import(request, importer):
+    # Multipart `file`, a CSV or XLSX sheet with a header row. The report
+    # streams as batches commit; a cut-off import resumes with start_row
+    # set to the last row reported.
+    upload = request.FILES.get('file')
+    if upload is None:
+        return Response({'error': 'file is required'}, status=status.HTTP_400_BAD_REQUEST)
+    try:
+        start_row = int(request.data.get('start_row', 0))
+    except (TypeError, ValueError):
+        return Response({'error': 'start_row must be an integer'}, status=status.HTTP_400_BAD_REQUEST)
+    try:
+        batches = importer(read_table(upload, upload.name), start_row=start_row)
+    except InvalidFile as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    return StreamingHttpResponse(stream_report(batches), content_type='application/json')
+
+
+class ValuesListMixin:
+    # List pages are read with values_list() and serialized by a plan
+    # compiled from the serializer (utils/values_serializer.py) instead of
+    # through model instances; the output is the same. Serializers the plan
+    # can't express (method or file fields) use the regular list.
+    def list(self, request, *args, **kwargs):
+        serializer = self.get_serializer()
+        plan = values_serializer.plan_for(serializer)
+        if plan is None:
+            return super().list(request, *args, **kwargs)
+        queryset = self.values_queryset(plan)
+        page = self.paginate_queryset(queryset)
+        if page is None:
+            return Response(plan.serialize(queryset, serializer))
+        return self.get_paginated_response(plan.serialize(page, serializer))
+
+    def values_queryset(self, plan):
+        ordering = getattr(self.pagination_class, 'ordering', ())
+        return plan.queryset(
+            self.filter_queryset(self.get_queryset()),
+            [field.lstrip('-') for field in ordering]
+        )
 
-class WorkerViewSet(viewsets.ModelViewSet):
+
+class WorkerViewSet(ConditionalGetMixin, SparseQuerysetMixin, ValuesListMixin, viewsets.ModelViewSet):
+    version_collection = 'workers'
+    version_global = True
     serializer_class = WorkerSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = KeysetCursorPagination
 
     def get_queryset(self):
-        queryset = Worker.objects.all()
-        # Filter by search query
-        search = self.request.query_params.get('search', None)
-        if search:
-            queryset = queryset.filter(
-                Q(full_name__icontains=search) |
-                Q(phone_number__icontains=search) |
-                Q(id_number__icontains=search)
+        return Worker.objects.all()
+
+    def list(self, request, *args, **kwargs):
+        # Search goes through the worker search index and returns the best
+        # `limit` matches by rank instead of paging through the table.
+        if not request.query_params.get('search', None):
+            return super().list(request, *args, **kwargs)
+        return self.conditional_response(request, self.search_list, cacheable=True)
+
+    def search_list(self, request):
+        search = request.query_params['search']
+        try:
+            limit = int(request.query_params.get('limit', DEFAULT_SEARCH_LIMIT))
+        except ValueError:
+            return Response(
+                {'error': 'limit must be an integer'},
+                status=status.HTTP_400_BAD_REQUEST
             )
-        return queryset
+        serializer = self.get_serializer(search_workers(search, limit), many=True)
+        return Response({'next': None, 'previous': None, 'results': serializer.data})
+
+    @action(detail=False, methods=['post'], url_path='import')
+    def import_file(self, request):
+        # A CSV or XLSX sheet of workers, matched on (id_type, id_number)
+        # and created or updated in batches (see utils/imports.py).
+        return streamed_import(request, import_workers)
 
     @action(detail=True, methods=['post'])
     def add_loan(self, request, pk=None):
         worker = self.get_object()
-        amount = request.data.get('amount')
-        notes = request.data.get('notes', '')
+        serializer = AddLoanSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
 
         loan_adjustment = LoanAdjustment.objects.create(
             worker=worker,
-            loan_amount=amount,
-            notes=notes
+            user=request.user,
+            loan_amount=serializer.validated_data['amount'],
+            notes=serializer.validated_data['notes']
         )
         return Response(LoanAdjustmentSerializer(loan_adjustment).data)
 
 
-class WorkerAssignmentViewSet(viewsets.ModelViewSet):
+class WorkerAssignmentViewSet(ConditionalGetMixin, SparseQuerysetMixin, ValuesListMixin, viewsets.ModelViewSet):
+    version_collection = 'assignments'
     serializer_class = WorkerAssignmentSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = KeysetCursorPagination
 
     def get_queryset(self):
-        return WorkerAssignment.objects.filter(user=self.request.user)
+        return WorkerAssignment.objects.filter(
+            user=self.request.user
+        ).select_related('worker')
 
 
-class AttendanceViewSet(viewsets.ModelViewSet):
+class AttendanceViewSet(ConditionalGetMixin, SparseQuerysetMixin, ValuesListMixin, viewsets.ModelViewSet):
+    version_collection = 'attendance'
     serializer_class = AttendanceSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = AttendanceCursorPagination
 
     def get_queryset(self):
         queryset = Attendance.objects.filter(
             assignment__user=self.request.user
-        )
+        ).select_related('assignment__worker')
         date = self.request.query_params.get('date', None)
         if date:
             queryset = queryset.filter(date=date)
         return queryset
 
+    def archived_rows(self, position, reverse, limit):
+        # Days moved to monthly rollups by `archive_attendance`, merged into
+        # the list by AttendanceCursorPagination.
+        if not has_rollups(self.request.user.pk):
+            return []
+        day = self.request.query_params.get('date', None)
+        if day:
+            try:
+                day = parse_date(day)
+            except ValueError:
+                day = None
+            if day is None:
+                return []
+        return archived_rows(self.request.user, day or None, position, reverse, limit)
+
+    def get_object(self):
+        # Archived days keep their ids: they read from the rollup, and are
+        # restored as live rows to be updated or deleted.
+        try:
+            return super().get_object()
+        except Http404:
+            try:
+                pk = uuid.UUID(str(self.kwargs[self.lookup_field]))
+            except ValueError:
+                raise Http404
+            row = archived_row(self.request.user, pk) if has_rollups(self.request.user.pk) else None
+            if row is not None and self.action != 'retrieve':
+                row = restore(row)
+            if row is None:
+                raise
+            self.check_object_permissions(self.request, row)
+            return row
+
+    @action(detail=False, methods=['get'])
+    def summary(self, request):
+        try:
+            return Response(attendance_summary(request.user, request.query_params.get('month')))
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+    @action(detail=False, methods=['post'], url_path='import')
+    def import_file(self, request):
+        # Historical attendance as a month grid, one row per assignment and
+        # month with a P/A/H/L column per day (see utils/imports.py).
+        return streamed_import(request, partial(import_attendance_grid, request.user))
+
     @action(detail=False, methods=['post'])
     def bulk_create(self, request):
-        serializer = self.get_serializer(data=request.data, many=True)
-        serializer.is_valid(raise_exception=True)
-        self.perform_create(serializer)
-        return Response(serializer.data)
+        if not isinstance(request.data, list):
+            return Response(
+                {'error': 'Expected a list of attendance rows'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
 
+        results = [None] * len(request.data)
+        valid = {}
+        for index, item in enumerate(request.data):
+            serializer = AttendanceBulkItemSerializer(data=item)
+            if serializer.is_valid():
+                valid[index] = serializer.validated_data
+            else:
+                results[index] = {'index': index, 'status': 'error', 'errors': serializer.errors}
+
+        owned = owned_assignment_ids(request.user, (row['assignment'] for row in valid.values()))
+        for index, row in list(valid.items()):
+            if row['assignment'] not in owned:
+                results[index] = {
+                    'index': index,
+                    'status': 'error',
+                    'errors': {'assignment': ['Assignment not found.']}
+                }
+                del valid[index]
+
+        for index, (outcome, pk) in upsert_attendance(request.user, valid).items():
+            results[index] = {'index': index, 'status': outcome, 'id': pk}
+        for index in valid:
+            if results[index] is None:
+                results[index] = {'index': index, 'status': 'superseded'}
+
+        counts = {'created': 0, 'updated': 0, 'superseded': 0, 'error': 0}
+        for result in results:
+            counts[result['status']] += 1
+        return Response(
+            {**counts, 'results': results},
+            status=status.HTTP_400_BAD_REQUEST if results and counts['error'] == len(results) else status.HTTP_200_OK
+        )
 
-class PaymentViewSet(viewsets.ModelViewSet):
+
+class PaymentViewSet(ConditionalGetMixin, SparseQuerysetMixin, ValuesListMixin, viewsets.ModelViewSet):
+    version_collection = 'payments'
     serializer_class = PaymentSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = KeysetCursorPagination
 
     def get_queryset(self):
         return Payment.objects.filter(
             assignment__user=self.request.user
-        )
\ No newline at end of file
+        ).select_related('assignment__worker')
+
+    @action(detail=False, methods=['post'], url_path='payroll-run')
+    def payroll_run(self, request):
+        serializer = PayrollRunSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        result = run_payroll(request.user, **serializer.validated_data)
+        return Response(
+            result,
+            status=status.HTTP_200_OK if result['dry_run'] else status.HTTP_201_CREATED
+        )
+
+    @action(detail=False, methods=['post'])
+    def bulk(self, request):
+        if not isinstance(request.data, list) or not request.data:
+            return Response(
+                {'error': 'Expected a list of payments'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if len(request.data) > MAX_BULK_PAYMENTS:
+            return Response(
+                {'error': f'At most {MAX_BULK_PAYMENTS} payments per request'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        entries, errors = [], {}
+        for index, item in enumerate(request.data):
+            serializer = BulkPaymentItemSerializer(data=item)
+            if serializer.is_valid():
+                entries.append(serializer.validated_data)
+            else:
+                entries.append(None)
+                errors[index] = serializer.errors
+
+        results, ok = disburse(request.user, entries, errors)
+        if not ok:
+            return Response(
+                {'error': 'No payments were created', 'results': results},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        return Response({
+            'created': len(results),
+            'total_amount': sum((entry['amount'] for entry in entries), Decimal('0.00')),
+            'total_deductions': sum((entry['deduction'] for entry in entries), Decimal('0.00')),
+            'total_net_amount': sum((result['net_amount'] for result in results), Decimal('0.00')),
+            'results': results,
+        }, status=status.HTTP_201_CREATED)
+
+
+class DashboardView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        return Response(get_dashboard(request.user))
+
+
+class ExportView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    CONTENT_TYPES = {
+        'csv': 'text/csv',
+        'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+    }
+
+    def get(self, request, kind):
+        if kind not in EXPORTS:
+            return Response({'error': 'Unknown export'}, status=status.HTTP_404_NOT_FOUND)
+        file_type = request.query_params.get('file_type', 'csv')
+        if file_type not in self.CONTENT_TYPES:
+            return Response({'error': 'file_type must be csv or xlsx'}, status=status.HTTP_400_BAD_REQUEST)
+
+        # Defaults to the last twelve months; ?year= or ?start=&end= narrow it.
+        try:
+            year = request.query_params.get('year')
+            if year:
+                start, end = datetime(int(year), 1, 1).date(), datetime(int(year), 12, 31).date()
+            else:
+                today = timezone.localdate()
+                start = datetime.strptime(request.query_params['start'], '%Y-%m-%d').date() \
+                    if 'start' in request.query_params else today - timedelta(days=365)
+                end = datetime.strptime(request.query_params['end'], '%Y-%m-%d').date() \
+                    if 'end' in request.query_params else today
+        except ValueError:
+            return Response({'error': 'Invalid year or date range'}, status=status.HTTP_400_BAD_REQUEST)
+
+        header, rows = EXPORTS[kind](request.user, start, end)
+        if file_type == 'xlsx':
+            content = stream_xlsx(header, rows, sheet=kind.title())
+        else:
+            content = stream_csv(header, rows)
+        response = StreamingHttpResponse(content, content_type=self.CONTENT_TYPES[file_type])
+        response['Content-Disposition'] = f'attachment; filename="{kind}-{start}-{end}.{file_type}"'
+        return response
+
+
+class SyncView(APIView):
+    # Delta sync for offline clients: pass the previous response's `next`
+    # as ?since= and repeat while `has_more` is true.
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        try:
+            page_size = min(int(request.query_params.get('page_size', DEFAULT_SYNC_PAGE_SIZE)), MAX_SYNC_PAGE_SIZE)
+        except ValueError:
+            return Response({'error': 'page_size must be an integer'}, status=status.HTTP_400_BAD_REQUEST)
+        if page_size < 1:
+            return Response({'error': 'page_size must be positive'}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            page, has_more, position = changes_since(request.user, request.query_params.get('since'), page_size)
+        except InvalidToken as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        except ExpiredToken as e:
+            return Response({'error': str(e), 'reset': True}, status=status.HTTP_410_GONE)
+
+        return Response({
+            'changes': serialize_changes(page, self.get_renderer_context()),
+            'next': encode_token(position) if position else None,
+            'has_more': has_more,
+        })
+
+
+# Native async list views, routed under ASGI only (payrole/asgi_urls.py).
+
+class AsyncCollectionListView(AsyncAPIView):
+    # The DRF viewset's list with the async ORM and cache: same queryset,
+    # keyset pagination, serializer, ETag and response cache entries.
+    # Sparse fieldsets go to the viewset.
+    fallback_actions = {'get': 'list', 'post': 'create'}
+    allow = 'GET, POST, HEAD, OPTIONS'
+
+    async def get(self, request):
+        if 'fields' in request.query_params or 'omit' in request.query_params:
+            raise Fallback
+        viewset = self.fallback_view(request=request, format_kwarg=None, action='list', args=(), kwargs={})
+        collection = viewset.version_collection
+        version, modified = await aget_version(viewset.version_scope(), collection)
+        etag = collection_etag(request, collection, version)
+        if is_not_modified(request, etag, modified):
+            return add_validators(self.not_modified(), etag, modified)
+
+        if response_cache.enabled():
+            key = response_cache.cache_key(request, collection, viewset.version_scope(), version)
+            data = await response_cache.afetch(key, lambda: self.list_data(request, viewset))
+        else:
+            data = await self.list_data(request, viewset)
+        return add_validators(self.render(data), etag, modified)
+
+    async def list_data(self, request, viewset):
+        await self.check_list(request)
+        paginator = viewset.paginator
+        serializer = viewset.get_serializer()
+        plan = values_serializer.plan_for(serializer)
+        if plan is None:
+            queryset = viewset.filter_queryset(viewset.get_queryset())
+        else:
+            queryset = viewset.values_queryset(plan)
+        page = await paginator.apaginate_queryset(queryset, request, viewset)
+        if plan is None:
+            data = viewset.get_serializer(page, many=True).data
+        else:
+            data = plan.serialize(page, serializer)
+        return paginator.get_paginated_response(data).data
+
+    async def check_list(self, request):
+        pass
+
+
+class AsyncAssignmentListView(AsyncCollectionListView):
+    fallback_view = WorkerAssignmentViewSet
+
+
+class AsyncAttendanceListView(AsyncCollectionListView):
+    fallback_view = AttendanceViewSet
+
+    async def check_list(self, request):
+        # Archived days are merged in by the sync paginator.
+        if await ahas_rollups(request.user.pk):
+            raise Fallback
+
+
+class AsyncPaymentListView(AsyncCollectionListView):
+    fallback_view = PaymentViewSet